@@ -0,0 +1,139 @@
+"""后台分析服务：在独立进程中分析局面，不阻塞界面主循环
+
+界面把局面快照（Position，进程间以紧凑元组传递）交给AnalysisService.submit，
+工作进程先返回各棋子的合法走法集合，再用迭代加深搜索逐层返回最佳走法和分值。
+结果通过队列传回，界面每帧调用poll非阻塞地取出。
+
+每次submit或cancel都会使代数加一：工作进程中的监听线程收到新请求后立即
+停止正在进行的搜索，poll也会丢弃旧代数的结果，因此局面变化后不会看到
+过时的分析。工作进程使用spawn方式启动，不继承界面进程的pygame窗口。
+"""
+import multiprocessing
+import queue
+import threading
+from typing import NamedTuple, Optional
+
+from engine import Searcher
+from tt import TranspositionTable
+
+DEFAULT_MOVETIME = 5.0  # 每个局面最多分析的秒数
+DEFAULT_HASH_MB = 16
+
+
+class AnalysisResult(NamedTuple):
+    generation: int  # 请求的代数
+    depth: int  # 完成的迭代深度，0表示只含合法走法
+    score: Optional[int]  # 行棋方视角的分值
+    best_move: Optional[tuple]
+    pv: list
+    legal_moves: Optional[dict]  # {起点格: 终点格集合}，只在第一条结果中给出
+    done: bool  # 该局面的分析是否已结束
+
+
+def _legal_move_sets(position):
+    moves = {}
+    for from_sq, to_sq, _ in position.legal_moves():
+        moves.setdefault(from_sq, set()).add(to_sq)
+    return moves
+
+
+def _worker_main(requests, results, movetime, hash_mb):
+    """工作进程：监听线程接收请求，主线程执行分析"""
+    searcher = Searcher(TranspositionTable(hash_mb))
+    lock = threading.Lock()
+    wake = threading.Event()
+    pending = [None]  # 尚未处理的最新请求
+
+    def listen():
+        while True:
+            message = requests.get()
+            with lock:
+                pending[0] = message
+            # 新请求到来时中断当前搜索
+            searcher.stop()
+            wake.set()
+            if message[0] == 'exit':
+                return
+
+    threading.Thread(target=listen, daemon=True).start()
+    while True:
+        wake.wait()
+        with lock:
+            message = pending[0]
+            pending[0] = None
+            wake.clear()
+        if message is None or message[0] == 'cancel':
+            continue
+        if message[0] == 'exit':
+            return
+
+        _, generation, position = message
+        results.put(AnalysisResult(generation, 0, None, None, [],
+                                   _legal_move_sets(position), False))
+
+        def report(result):
+            results.put(AnalysisResult(generation, result.depth, result.score,
+                                       result.best_move, result.pv, None, False))
+            # search开始时会清除停止标志，这里再检查一次是否已有新请求
+            if pending[0] is not None:
+                searcher.stop()
+
+        result = searcher.search(position, movetime=movetime, on_iteration=report)
+        results.put(AnalysisResult(generation, result.depth, result.score,
+                                   result.best_move, result.pv, None, True))
+
+
+# 后台分析服务
+class AnalysisService:
+    def __init__(self, movetime=DEFAULT_MOVETIME, hash_mb=DEFAULT_HASH_MB):
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.generation = 0
+        self.busy = False
+        self.process = context.Process(target=_worker_main,
+                                       args=(self.requests, self.results, movetime, hash_mb),
+                                       daemon=True)
+        self.process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, position):
+        """提交局面快照，取消之前的分析，返回本次请求的代数"""
+        self.generation += 1
+        self.busy = True
+        self.requests.put(('analyse', self.generation, position))
+        return self.generation
+
+    def cancel(self):
+        """取消当前分析"""
+        self.generation += 1
+        self.busy = False
+        self.requests.put(('cancel', self.generation))
+
+    def poll(self):
+        """非阻塞地取出当前代数的全部新结果"""
+        found = []
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if result.generation == self.generation:
+                found.append(result)
+                if result.done:
+                    self.busy = False
+        return found
+
+    def close(self):
+        """通知工作进程退出，超时则强制结束"""
+        if self.process.is_alive():
+            self.requests.put(('exit',))
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.busy = False
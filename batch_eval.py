@@ -0,0 +1,172 @@
+"""批量静态评估（NumPy向量化）
+
+局面以两种堆叠数组表示：
+    codes   N×64 int8，每格为棋子编码color * 6 + piece_type，空格为EMPTY(12)，
+            与codec.py中的4位棋子编码一致
+    planes  N×12×64 uint8，第color * 6 + piece_type个平面上有该棋子的格子为1，
+            可直接作为训练用的特征平面
+两种表示可以互相转换，也可以由Position列表或codec.py的32字节编码批量得到。
+
+评估与evaluation.evaluate完全一致（子力价值 + 棋子位置表），
+直接复用evaluation.SQUARE_SCORES，分块计算以限制临时数组的内存。
+
+用法：
+    python batch_eval.py --count 1000000   # 测试吞吐量
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from bitboard import Position, BLACK, KING
+from codec import POSITION_BYTES, MAX_PIECES, encode_many
+from evaluation import SQUARE_SCORES, evaluate
+
+EMPTY = 12
+PLANES = 12
+CHUNK_SIZE = 1 << 15
+
+# SCORE_TABLE[code][sq]：白方视角分值，空格一行为0
+SCORE_TABLE = np.array(SQUARE_SCORES + [[0] * 64], dtype=np.int32)
+# 按[sq * 13 + code]展开，查表时每格的下标为code + sq * 13
+_TABLE_BY_SQUARE = np.ascontiguousarray(SCORE_TABLE.T).ravel()
+_SQUARE_OFFSETS = np.arange(64, dtype=np.int16) * (EMPTY + 1)
+_PLANE_WEIGHTS = SCORE_TABLE[:PLANES].ravel().astype(np.float32)
+
+
+def bitboards_to_planes(bitboards):
+    """N×12的uint64位棋盘数组转为N×12×64的特征平面"""
+    bitboards = np.ascontiguousarray(bitboards, dtype='<u8')
+    bits = np.unpackbits(bitboards.view(np.uint8).reshape(len(bitboards), PLANES, 8),
+                         axis=2, bitorder='little')
+    return bits
+
+
+def planes_to_codes(planes):
+    """N×12×64特征平面转为N×64棋子编码"""
+    planes = np.asarray(planes)
+    codes = planes.argmax(axis=1).astype(np.int8)
+    codes[~planes.any(axis=1)] = EMPTY
+    return codes
+
+
+def codes_to_planes(codes):
+    """N×64棋子编码转为N×12×64特征平面"""
+    codes = np.asarray(codes)
+    return (codes[:, None, :] == np.arange(PLANES, dtype=np.int8)[None, :, None]).astype(np.uint8)
+
+
+def encode_positions(positions):
+    """把Position列表编码为(codes, turns)，turns为各局面的行棋方"""
+    bitboards = np.array([position.bitboards for position in positions], dtype=np.uint64)
+    turns = np.array([position.turn for position in positions], dtype=np.int8)
+    return planes_to_codes(bitboards_to_planes(bitboards.reshape(-1, PLANES))), turns
+
+
+def decode_records(data):
+    """把codec.py的32字节编码（可为多个局面首尾相接）批量转为(codes, turns)
+
+    棋子超过32个、棋子编码无效或某一方不是恰好一个王时抛出ValueError。
+    """
+    records = np.frombuffer(data, dtype=np.uint8)
+    if len(records) % POSITION_BYTES:
+        raise ValueError("数据长度不是%d字节的整数倍" % POSITION_BYTES)
+    records = records.reshape(-1, POSITION_BYTES)
+    count = len(records)
+    codes = np.empty((count, 64), dtype=np.int8)
+    for start in range(0, count, CHUNK_SIZE):
+        chunk = records[start:start + CHUNK_SIZE]
+        occupied = np.unpackbits(chunk[:, :8], axis=1, bitorder='little').astype(bool)
+        if (occupied.sum(axis=1) > MAX_PIECES).any():
+            raise ValueError("占位位图超过%d个棋子" % MAX_PIECES)
+        packed = chunk[:, 8:24]
+        # 棋子编码按格子编号升序排列，每字节低4位在前
+        pieces = np.empty((len(chunk), 32), dtype=np.int8)
+        pieces[:, 0::2] = packed & 0xF
+        pieces[:, 1::2] = packed >> 4
+        ordinal = np.minimum(np.cumsum(occupied, axis=1) - 1, 31)
+        chunk_codes = np.where(occupied, np.take_along_axis(pieces, ordinal, axis=1), EMPTY)
+        if (chunk_codes > EMPTY).any() or ((chunk_codes == EMPTY) & occupied).any():
+            raise ValueError("无效的棋子编码")
+        if ((chunk_codes == KING).sum(axis=1) != 1).any() or \
+                ((chunk_codes == 6 + KING).sum(axis=1) != 1).any():
+            raise ValueError("每方必须恰好有一个王")
+        codes[start:start + CHUNK_SIZE] = chunk_codes
+    return codes, (records[:, 24] & 1).astype(np.int8)
+
+
+def _side_to_move(scores, turns):
+    if turns is None:
+        return scores
+    return np.where(np.asarray(turns) == BLACK, -scores, scores)
+
+
+def evaluate_codes(codes, turns=None):
+    """批量评估N×64棋子编码，返回int32分值
+
+    给出turns时返回行棋方视角（与evaluation.evaluate相同），否则返回白方视角。
+    """
+    codes = np.asarray(codes)
+    scores = np.empty(len(codes), dtype=np.int32)
+    for start in range(0, len(codes), CHUNK_SIZE):
+        indices = codes[start:start + CHUNK_SIZE].astype(np.int16) + _SQUARE_OFFSETS
+        scores[start:start + CHUNK_SIZE] = np.take(_TABLE_BY_SQUARE, indices).sum(axis=1, dtype=np.int32)
+    return _side_to_move(scores, turns)
+
+
+def evaluate_planes(planes, turns=None):
+    """批量评估N×12×64特征平面，返回int32分值（视角同evaluate_codes）"""
+    planes = np.asarray(planes)
+    flat = planes.reshape(len(planes), PLANES * 64)
+    scores = np.empty(len(planes), dtype=np.int32)
+    for start in range(0, len(planes), CHUNK_SIZE):
+        # 分值之和远小于2^24，float32矩阵乘法结果是精确的
+        chunk = flat[start:start + CHUNK_SIZE].astype(np.float32)
+        scores[start:start + CHUNK_SIZE] = np.rint(chunk @ _PLANE_WEIGHTS)
+    return _side_to_move(scores, turns)
+
+
+def _sample_positions(count, seed=0):
+    """随机对局中的局面，用于吞吐量测试"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        for _ in range(rng.randint(10, 80)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.push(rng.choice(moves))
+        positions.append(position.copy())
+    return positions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NumPy批量评估吞吐量测试")
+    parser.add_argument("--count", type=int, default=1000000, help="评估的局面数")
+    parser.add_argument("--distinct", type=int, default=1000, help="其中不同局面的数量")
+    args = parser.parse_args(argv)
+
+    positions = _sample_positions(args.distinct)
+    codes, turns = decode_records(encode_many(positions))
+    expected = np.array([evaluate(position) for position in positions], dtype=np.int32)
+    assert (evaluate_codes(codes, turns) == expected).all()
+
+    repeat = -(-args.count // args.distinct)
+    codes = np.tile(codes, (repeat, 1))[:args.count]
+    turns = np.tile(turns, repeat)[:args.count]
+    planes = codes_to_planes(codes)
+    for name, function, data in (("codes", evaluate_codes, codes),
+                                 ("planes", evaluate_planes, planes)):
+        start = time.perf_counter()
+        scores = function(data, turns)
+        elapsed = time.perf_counter() - start
+        assert (scores[:args.distinct] == expected[:len(scores[:args.distinct])]).all()
+        print("%-6s %9d 局面  %.3fs  %.0f 局面/秒" % (name, len(data), elapsed, len(data) / elapsed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1007 @@
+"""位棋盘（bitboard）局面表示
+
+每种颜色、每种棋子各用一个64位整数表示其占据的格子，另有双方占位掩码。
+格子编号与chess_core保持一致：square = row * 8 + col，
+即第0格为a8（黑方底线左侧），第63格为h1。
+
+走法生成与攻击查询全部通过移位与掩码完成；BoardView提供
+board[row][col]形式的兼容视图，供界面代码读取。
+"""
+from typing import NamedTuple, Optional
+
+from chess_core import BOARD_SIZE, PieceColor, PieceType, Piece
+
+# 颜色与棋子类型的整数编码（与PieceColor/PieceType的value一致）
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+MASK64 = (1 << 64) - 1
+
+# 王车易位权利位
+CASTLE_WHITE_KING = 1
+CASTLE_WHITE_QUEEN = 2
+CASTLE_BLACK_KING = 4
+CASTLE_BLACK_QUEEN = 8
+
+# 列与行掩码
+FILE_A = sum(1 << (row * 8) for row in range(BOARD_SIZE))
+FILE_H = FILE_A << 7
+NOT_FILE_A = MASK64 ^ FILE_A
+NOT_FILE_H = MASK64 ^ FILE_H
+ROW_MASKS = [0xFF << (row * 8) for row in range(BOARD_SIZE)]
+
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+PROMOTION_LETTERS = {KNIGHT: 'n', BISHOP: 'b', ROOK: 'r', QUEEN: 'q'}
+PIECE_LETTERS = 'pnbrqk'  # FEN棋子字母（小写为黑方，大写为白方）
+CASTLING_LETTERS = ((CASTLE_WHITE_KING, 'K'), (CASTLE_WHITE_QUEEN, 'Q'),
+                    (CASTLE_BLACK_KING, 'k'), (CASTLE_BLACK_QUEEN, 'q'))
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# 走子后保留的王车易位权利：王或车离开原位、车被吃时失去对应权利
+CASTLING_MASKS = [0b1111] * 64
+CASTLING_MASKS[60] ^= CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN
+CASTLING_MASKS[63] ^= CASTLE_WHITE_KING
+CASTLING_MASKS[56] ^= CASTLE_WHITE_QUEEN
+CASTLING_MASKS[4] ^= CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN
+CASTLING_MASKS[7] ^= CASTLE_BLACK_KING
+CASTLING_MASKS[0] ^= CASTLE_BLACK_QUEEN
+
+
+def _splitmix64(seed):
+    """SplitMix64伪随机数生成器，保证Zobrist键在不同Python版本间一致"""
+    state = seed
+    while True:
+        state = (state + 0x9E3779B97F4A7C15) & MASK64
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        yield z ^ (z >> 31)
+
+
+# Zobrist随机键：棋子位置、行棋方、易位权利组合、过路兵所在列
+_zobrist_random = _splitmix64(0x43484553)
+ZOBRIST_PIECES = [[next(_zobrist_random) for _ in range(64)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = next(_zobrist_random)
+ZOBRIST_CASTLING = [next(_zobrist_random) for _ in range(16)]
+ZOBRIST_EP_FILES = [next(_zobrist_random) for _ in range(8)]
+del _zobrist_random
+
+
+def square(row, col):
+    """(row, col)坐标转换为格子编号"""
+    return row * 8 + col
+
+
+def square_coords(sq):
+    """格子编号转换为(row, col)坐标"""
+    return sq >> 3, sq & 7
+
+
+def square_name(sq):
+    """格子编号转换为代数记号，例如60 -> 'e1'"""
+    return 'abcdefgh'[sq & 7] + str(8 - (sq >> 3))
+
+
+def parse_square(name):
+    """代数记号转换为格子编号，例如'e1' -> 60"""
+    col = 'abcdefgh'.index(name[0])
+    rank = int(name[1])
+    if not 1 <= rank <= 8:
+        raise ValueError("无效的格子: %r" % name)
+    return square(8 - rank, col)
+
+
+# 走法值类型
+class Move(NamedTuple):
+    """一步走法：起点格、终点格与升变棋子类型（PAWN..KING的整数编码）
+
+    走法生成器为了速度直接返回同结构的普通元组(from, to, promotion)，
+    它们与Move相等，也可以直接传给Position.push。
+    """
+    from_square: int
+    to_square: int
+    promotion: Optional[int] = None
+
+    @classmethod
+    def from_uci(cls, text):
+        """由UCI坐标记号构造走法，例如'e7e8q'"""
+        if len(text) not in (4, 5):
+            raise ValueError("无效的走法: %r" % text)
+        promotion = None
+        if len(text) == 5:
+            letters = {letter: piece_type for piece_type, letter in PROMOTION_LETTERS.items()}
+            if text[4] not in letters:
+                raise ValueError("无效的升变棋子: %r" % text)
+            promotion = letters[text[4]]
+        return cls(parse_square(text[:2]), parse_square(text[2:4]), promotion)
+
+    def uci(self):
+        """UCI坐标记号"""
+        return move_to_uci(self)
+
+    def __str__(self):
+        return move_to_uci(self)
+
+
+def move_to_uci(move):
+    """把(from, to, promotion)走法转换为UCI坐标记号"""
+    from_sq, to_sq, promotion = move
+    text = square_name(from_sq) + square_name(to_sq)
+    if promotion is not None:
+        text += PROMOTION_LETTERS[promotion]
+    return text
+
+
+def iter_squares(bb):
+    """依次产生位棋盘中所有置位的格子编号（从低位到高位）"""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def _leaper_table(offsets):
+    """预计算马、王这类跳跃棋子的攻击表"""
+    table = []
+    for sq in range(64):
+        row, col = square_coords(sq)
+        bb = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE:
+                bb |= 1 << square(r, c)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table([
+    (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+    (1, -2), (1, 2), (2, -1), (2, 1)
+])
+KING_ATTACKS = _leaper_table([
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1), (0, 1),
+    (1, -1), (1, 0), (1, 1)
+])
+
+# 兵的吃子攻击表：PAWN_ATTACKS[color][sq]为该颜色的兵位于sq时攻击的格子
+PAWN_ATTACKS = [
+    _leaper_table([(-1, -1), (-1, 1)]),
+    _leaper_table([(1, -1), (1, 1)]),
+]
+
+
+def _ray_table(dr, dc):
+    """预计算某一方向上从每个格子出发直到棋盘边缘的射线"""
+    table = []
+    for sq in range(64):
+        row, col = square_coords(sq)
+        bb = 0
+        r, c = row + dr, col + dc
+        while 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE:
+            bb |= 1 << square(r, c)
+            r, c = r + dr, c + dc
+        table.append(bb)
+    return table
+
+
+# 射线方向：(射线表, 是否为格子编号递增方向)
+# 递增方向取最低位阻挡子，递减方向取最高位阻挡子
+ROOK_RAYS = [
+    (_ray_table(-1, 0), False), (_ray_table(1, 0), True),
+    (_ray_table(0, -1), False), (_ray_table(0, 1), True),
+]
+BISHOP_RAYS = [
+    (_ray_table(-1, -1), False), (_ray_table(-1, 1), False),
+    (_ray_table(1, -1), True), (_ray_table(1, 1), True),
+]
+
+
+def _between_table():
+    """预计算同一直线或斜线上两格之间（不含两端）的格子"""
+    table = [[0] * 64 for _ in range(64)]
+    for rays in (ROOK_RAYS, BISHOP_RAYS):
+        for ray_table, _ in rays:
+            for sq in range(64):
+                for target in iter_squares(ray_table[sq]):
+                    table[sq][target] = ray_table[sq] ^ ray_table[target] ^ (1 << target)
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def _slider_attacks(sq, occupied, rays):
+    """沿给定射线计算滑动棋子的攻击范围（遇到第一个阻挡子为止）"""
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    """车从sq出发的攻击位棋盘"""
+    return _slider_attacks(sq, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(sq, occupied):
+    """象从sq出发的攻击位棋盘"""
+    return _slider_attacks(sq, occupied, BISHOP_RAYS)
+
+
+def queen_attacks(sq, occupied):
+    """后从sq出发的攻击位棋盘"""
+    return (_slider_attacks(sq, occupied, ROOK_RAYS) |
+            _slider_attacks(sq, occupied, BISHOP_RAYS))
+
+
+def pawn_attacks_bb(pawns, color):
+    """一组兵的吃子攻击范围（移位计算）"""
+    if color == WHITE:
+        return ((pawns & NOT_FILE_A) >> 9) | ((pawns & NOT_FILE_H) >> 7)
+    return (((pawns & NOT_FILE_A) << 7) | ((pawns & NOT_FILE_H) << 9)) & MASK64
+
+
+# 位棋盘局面类
+class Position:
+    __slots__ = ('bitboards', 'occupancy', 'occupied', 'turn',
+                 'castling', 'ep_square', 'halfmove_clock', 'fullmove_number',
+                 'move_stack', 'key')
+
+    def __init__(self):
+        self.bitboards = [0] * 12  # 下标：color * 6 + piece_type
+        self.occupancy = [0, 0]  # 白方、黑方占位
+        self.occupied = 0  # 全部占位
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = None  # 吃过路兵的目标格
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.move_stack = []  # 撤销记录栈，见push/pop
+        self.key = ZOBRIST_CASTLING[0]  # Zobrist键，走子时增量更新
+
+    @classmethod
+    def initial(cls):
+        """标准初始局面"""
+        position = cls()
+        back_rank = [ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK]
+        for col, piece_type in enumerate(back_rank):
+            position.put_piece(square(0, col), BLACK, piece_type)
+            position.put_piece(square(1, col), BLACK, PAWN)
+            position.put_piece(square(6, col), WHITE, PAWN)
+            position.put_piece(square(7, col), WHITE, piece_type)
+        position.castling = (CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN |
+                             CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN)
+        position.key = position.compute_key()
+        return position
+
+    @classmethod
+    def from_fen(cls, fen):
+        """由FEN字符串构建局面，格式错误时抛出ValueError"""
+        fields = fen.split()
+        if len(fields) == 4:
+            fields += ['0', '1']
+        if len(fields) != 6:
+            raise ValueError("FEN字段数量错误: %r" % fen)
+        placement, turn, castling, ep, halfmove, fullmove = fields
+
+        position = cls()
+        rows = placement.split('/')
+        if len(rows) != BOARD_SIZE:
+            raise ValueError("FEN行数错误: %r" % fen)
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in PIECE_LETTERS and col < BOARD_SIZE:
+                    color = WHITE if char.isupper() else BLACK
+                    position.put_piece(square(row, col), color, PIECE_LETTERS.index(char.lower()))
+                    col += 1
+                else:
+                    raise ValueError("FEN棋子布局错误: %r" % fen)
+            if col != BOARD_SIZE:
+                raise ValueError("FEN棋子布局错误: %r" % fen)
+
+        if turn not in ('w', 'b'):
+            raise ValueError("FEN行棋方错误: %r" % fen)
+        position.turn = WHITE if turn == 'w' else BLACK
+        if castling != '-':
+            for char in castling:
+                flags = [flag for flag, letter in CASTLING_LETTERS if letter == char]
+                if not flags:
+                    raise ValueError("FEN易位权利错误: %r" % fen)
+                position.castling |= flags[0]
+        if ep != '-':
+            ep_square = parse_square(ep)
+            # 过路兵格必须在对方刚走两格的兵身后，且该兵经过的两格为空
+            if position.turn == WHITE:
+                ep_row, pawn_square, origin = 2, ep_square + 8, ep_square - 8
+            else:
+                ep_row, pawn_square, origin = 5, ep_square - 8, ep_square + 8
+            if (ep_square >> 3 != ep_row or
+                    not position.bitboards[(position.turn ^ 1) * 6 + PAWN] >> pawn_square & 1 or
+                    position.occupied >> ep_square & 1 or position.occupied >> origin & 1):
+                raise ValueError("FEN过路兵格无效: %r" % fen)
+            position.ep_square = ep_square
+        try:
+            position.halfmove_clock = int(halfmove)
+            position.fullmove_number = int(fullmove)
+        except ValueError:
+            raise ValueError("FEN回合数错误: %r" % fen)
+        position.key = position.compute_key()
+        return position
+
+    def fen(self):
+        """生成FEN字符串"""
+        rows = []
+        for row in range(BOARD_SIZE):
+            text = ''
+            empty = 0
+            for col in range(BOARD_SIZE):
+                found = self.piece_at(square(row, col))
+                if found is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                color, piece_type = found
+                letter = PIECE_LETTERS[piece_type]
+                text += letter.upper() if color == WHITE else letter
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = ''.join(letter for flag, letter in CASTLING_LETTERS
+                           if self.castling & flag) or '-'
+        ep = square_name(self.ep_square) if self.ep_square is not None else '-'
+        return '%s %s %s %s %d %d' % ('/'.join(rows), 'w' if self.turn == WHITE else 'b',
+                                      castling, ep, self.halfmove_clock, self.fullmove_number)
+
+    @classmethod
+    def from_board(cls, board, turn):
+        """由8x8的Piece棋盘构建位棋盘局面
+
+        王车易位权利由王和车的has_moved推出，吃过路兵目标格由
+        en_passant_vulnerable标记推出。
+        """
+        position = cls()
+        position.turn = turn.value
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                piece = board[row][col]
+                if piece is None:
+                    continue
+                position.put_piece(square(row, col), piece.color.value, piece.type.value)
+                if (piece.type == PieceType.PAWN and piece.en_passant_vulnerable and
+                        piece.color != turn):
+                    behind = 1 if piece.color == PieceColor.WHITE else -1
+                    position.ep_square = square(row + behind, col)
+
+        for color, home_row, king_flag, queen_flag in (
+                (PieceColor.WHITE, 7, CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN),
+                (PieceColor.BLACK, 0, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN)):
+            king = board[home_row][4]
+            if (king is None or king.type != PieceType.KING or
+                    king.color != color or king.has_moved):
+                continue
+            for rook_col, flag in ((7, king_flag), (0, queen_flag)):
+                rook = board[home_row][rook_col]
+                if (rook is not None and rook.type == PieceType.ROOK and
+                        rook.color == color and not rook.has_moved):
+                    position.castling |= flag
+        position.key = position.compute_key()
+        return position
+
+    @classmethod
+    def from_state(cls, bitboards, turn, castling, ep_square, halfmove_clock, fullmove_number):
+        """由12个位棋盘与局面字段构建局面（不含撤销栈），Zobrist键重新计算"""
+        return _position_from_state(bitboards, turn, castling, ep_square, halfmove_clock,
+                                    fullmove_number)
+
+    def copy(self):
+        """复制局面"""
+        position = Position.__new__(Position)
+        position.bitboards = self.bitboards[:]
+        position.occupancy = self.occupancy[:]
+        position.occupied = self.occupied
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.move_stack = self.move_stack[:]
+        position.key = self.key
+        return position
+
+    def __reduce__(self):
+        """序列化时只保存位棋盘与局面字段（不含撤销栈），用于在进程之间传递局面"""
+        return (_position_from_state, (tuple(self.bitboards), self.turn, self.castling,
+                                       self.ep_square, self.halfmove_clock,
+                                       self.fullmove_number))
+
+    def _ep_capturable(self):
+        """行棋方是否有兵可以吃过路兵（只有这时过路兵列才计入Zobrist键）"""
+        ep_square = self.ep_square
+        return (ep_square is not None and
+                PAWN_ATTACKS[self.turn ^ 1][ep_square] & self.bitboards[self.turn * 6 + PAWN])
+
+    def compute_key(self):
+        """从头计算Zobrist键（局面由外部直接构造后使用）"""
+        key = 0
+        for index, bitboard in enumerate(self.bitboards):
+            table = ZOBRIST_PIECES[index]
+            for sq in iter_squares(bitboard):
+                key ^= table[sq]
+        if self.turn == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if self._ep_capturable():
+            key ^= ZOBRIST_EP_FILES[self.ep_square & 7]
+        return key
+
+    def position_key(self):
+        """64位Zobrist局面键：覆盖棋子位置、行棋方、易位权利和可吃过路兵的列"""
+        return self.key
+
+    def put_piece(self, sq, color, piece_type):
+        """在空格sq上放置棋子"""
+        bit = 1 << sq
+        self.bitboards[color * 6 + piece_type] |= bit
+        self.occupancy[color] |= bit
+        self.occupied |= bit
+        self.key ^= ZOBRIST_PIECES[color * 6 + piece_type][sq]
+
+    def remove_piece(self, sq, color, piece_type):
+        """移除sq上的指定棋子"""
+        bit = 1 << sq
+        self.bitboards[color * 6 + piece_type] ^= bit
+        self.occupancy[color] ^= bit
+        self.occupied ^= bit
+        self.key ^= ZOBRIST_PIECES[color * 6 + piece_type][sq]
+
+    def piece_at(self, sq):
+        """返回sq上的(color, piece_type)，空格返回None"""
+        bit = 1 << sq
+        if not self.occupied & bit:
+            return None
+        color = WHITE if self.occupancy[WHITE] & bit else BLACK
+        base = color * 6
+        bitboards = self.bitboards
+        for piece_type in range(6):
+            if bitboards[base + piece_type] & bit:
+                return color, piece_type
+        return None
+
+    def _type_at(self, bit, color):
+        """返回color一方位于bit处的棋子类型"""
+        bitboards = self.bitboards
+        base = color * 6
+        for piece_type in range(6):
+            if bitboards[base + piece_type] & bit:
+                return piece_type
+        return None
+
+    def piece_type_at(self, sq, color):
+        """返回color一方位于sq的棋子类型，没有则返回None"""
+        return self._type_at(1 << sq, color)
+
+    def push(self, move):
+        """走一步棋（不检查合法性），撤销信息压入move_stack
+
+        撤销记录为定长元组：(走法, 走动的棋子类型, 被吃棋子类型,
+        原易位权利, 原过路兵目标格, 原半回合计数, 原Zobrist键)。
+        """
+        from_sq, to_sq, promotion = move
+        us = self.turn
+        them = us ^ 1
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        base = us * 6
+        piece_type = self._type_at(from_bit, us)
+        ep_square = self.ep_square
+        castling = self.castling
+        old_key = key = self.key
+        if ep_square is not None and self._ep_capturable():
+            key ^= ZOBRIST_EP_FILES[ep_square & 7]
+
+        captured = None
+        if occupancy[them] & to_bit:
+            captured = self._type_at(to_bit, them)
+            bitboards[them * 6 + captured] ^= to_bit
+            occupancy[them] ^= to_bit
+            key ^= ZOBRIST_PIECES[them * 6 + captured][to_sq]
+        elif piece_type == PAWN and to_sq == ep_square:
+            # 吃过路兵：被吃的兵在终点格后方
+            captured = PAWN
+            captured_sq = to_sq + 8 if us == WHITE else to_sq - 8
+            bitboards[them * 6 + PAWN] ^= 1 << captured_sq
+            occupancy[them] ^= 1 << captured_sq
+            key ^= ZOBRIST_PIECES[them * 6 + PAWN][captured_sq]
+
+        self.move_stack.append((move, piece_type, captured, castling,
+                                ep_square, self.halfmove_clock, old_key))
+
+        if promotion is None:
+            bitboards[base + piece_type] ^= from_bit | to_bit
+            key ^= ZOBRIST_PIECES[base + piece_type][from_sq] ^ ZOBRIST_PIECES[base + piece_type][to_sq]
+        else:
+            bitboards[base + PAWN] ^= from_bit
+            bitboards[base + promotion] |= to_bit
+            key ^= ZOBRIST_PIECES[base + PAWN][from_sq] ^ ZOBRIST_PIECES[base + promotion][to_sq]
+        occupancy[us] ^= from_bit | to_bit
+
+        if piece_type == KING and (to_sq - from_sq == 2 or from_sq - to_sq == 2):
+            # 王车易位：同时移动车
+            if to_sq > from_sq:
+                rook_from, rook_to = from_sq + 3, from_sq + 1
+            else:
+                rook_from, rook_to = from_sq - 4, from_sq - 1
+            rook_bits = (1 << rook_from) | (1 << rook_to)
+            bitboards[base + ROOK] ^= rook_bits
+            occupancy[us] ^= rook_bits
+            key ^= ZOBRIST_PIECES[base + ROOK][rook_from] ^ ZOBRIST_PIECES[base + ROOK][rook_to]
+
+        self.castling = castling & CASTLING_MASKS[from_sq] & CASTLING_MASKS[to_sq]
+        key ^= ZOBRIST_CASTLING[castling] ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_BLACK_TO_MOVE
+        if piece_type == PAWN and (to_sq - from_sq == 16 or from_sq - to_sq == 16):
+            ep_square = (from_sq + to_sq) >> 1
+            self.ep_square = ep_square
+            # 只有对方确实可以吃过路兵时才计入过路兵列
+            if PAWN_ATTACKS[us][ep_square] & bitboards[them * 6 + PAWN]:
+                key ^= ZOBRIST_EP_FILES[ep_square & 7]
+        else:
+            self.ep_square = None
+        self.key = key
+        if piece_type == PAWN or captured is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if us == BLACK:
+            self.fullmove_number += 1
+        self.occupied = occupancy[0] | occupancy[1]
+        self.turn = them
+
+    def pop(self):
+        """撤销最近一步棋，返回该走法"""
+        (move, piece_type, captured, castling, ep_square, halfmove_clock,
+         key) = self.move_stack.pop()
+        from_sq, to_sq, promotion = move
+        them = self.turn
+        us = them ^ 1
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        base = us * 6
+
+        if promotion is None:
+            bitboards[base + piece_type] ^= from_bit | to_bit
+        else:
+            bitboards[base + promotion] ^= to_bit
+            bitboards[base + PAWN] |= from_bit
+        occupancy[us] ^= from_bit | to_bit
+
+        if captured is not None:
+            if piece_type == PAWN and to_sq == ep_square:
+                captured_bit = 1 << (to_sq + 8 if us == WHITE else to_sq - 8)
+            else:
+                captured_bit = to_bit
+            bitboards[them * 6 + captured] |= captured_bit
+            occupancy[them] |= captured_bit
+        elif piece_type == KING and (to_sq - from_sq == 2 or from_sq - to_sq == 2):
+            if to_sq > from_sq:
+                rook_bits = (1 << (from_sq + 3)) | (1 << (from_sq + 1))
+            else:
+                rook_bits = (1 << (from_sq - 4)) | (1 << (from_sq - 1))
+            bitboards[base + ROOK] ^= rook_bits
+            occupancy[us] ^= rook_bits
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+        if us == BLACK:
+            self.fullmove_number -= 1
+        self.occupied = occupancy[0] | occupancy[1]
+        self.turn = us
+        return move
+
+    def king_square(self, color):
+        """返回指定颜色王所在的格子"""
+        king = self.bitboards[color * 6 + KING]
+        return (king & -king).bit_length() - 1
+
+    def is_square_attacked(self, sq, by_color):
+        """判断格子sq是否受到by_color一方的攻击
+
+        从目标格反查：以sq为起点查表得到马、王、兵的可能攻击位置，
+        沿射线求出滑动棋子的攻击范围，再与对方相应棋子求交。
+        """
+        bitboards = self.bitboards
+        base = by_color * 6
+        if KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & bitboards[base + KING]:
+            return True
+        # 位于sq的己方兵所能攻击的格子，恰为能攻击sq的对方兵所在格子
+        if PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base + PAWN]:
+            return True
+        queens = bitboards[base + QUEEN]
+        rooks = bitboards[base + ROOK] | queens
+        if rooks and _slider_attacks(sq, self.occupied, ROOK_RAYS) & rooks:
+            return True
+        bishops = bitboards[base + BISHOP] | queens
+        if bishops and _slider_attacks(sq, self.occupied, BISHOP_RAYS) & bishops:
+            return True
+        return False
+
+    def attackers(self, sq, by_color, occupied=None):
+        """返回by_color一方攻击sq的所有棋子（位棋盘）
+
+        可传入假设的占位occupied；不在其中的棋子视为已被吃掉。
+        """
+        if occupied is None:
+            occupied = self.occupied
+        bitboards = self.bitboards
+        base = by_color * 6
+        queens = bitboards[base + QUEEN]
+        attackers = ((KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT]) |
+                     (KING_ATTACKS[sq] & bitboards[base + KING]) |
+                     (PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base + PAWN]) |
+                     (_slider_attacks(sq, occupied, ROOK_RAYS) &
+                      (bitboards[base + ROOK] | queens)) |
+                     (_slider_attacks(sq, occupied, BISHOP_RAYS) &
+                      (bitboards[base + BISHOP] | queens)))
+        return attackers & occupied
+
+    def is_in_check(self, color=None):
+        """判断指定颜色（默认为行棋方）的王是否被将军"""
+        if color is None:
+            color = self.turn
+        king = self.bitboards[color * 6 + KING]
+        if not king:
+            return False
+        return self.is_square_attacked(king.bit_length() - 1, color ^ 1)
+
+    @property
+    def board(self):
+        """board[row][col]兼容视图"""
+        return BoardView(self)
+
+    def attacks_by(self, color):
+        """指定颜色所有棋子攻击到的格子（位棋盘）"""
+        occupied = self.occupied
+        bitboards = self.bitboards
+        base = color * 6
+        attacks = pawn_attacks_bb(bitboards[base + PAWN], color)
+        for sq in iter_squares(bitboards[base + KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in iter_squares(bitboards[base + BISHOP] | bitboards[base + QUEEN]):
+            attacks |= _slider_attacks(sq, occupied, BISHOP_RAYS)
+        for sq in iter_squares(bitboards[base + ROOK] | bitboards[base + QUEEN]):
+            attacks |= _slider_attacks(sq, occupied, ROOK_RAYS)
+        for sq in iter_squares(bitboards[base + KING]):
+            attacks |= KING_ATTACKS[sq]
+        return attacks
+
+    def pseudo_legal_moves(self):
+        """生成当前行棋方的伪合法走法列表
+
+        每个走法为(from_sq, to_sq, promotion)元组（与Move兼容），
+        promotion为升变棋子类型或None。
+        与Piece.get_possible_moves一致，不检查走后是否被将军。
+        """
+        moves = []
+        append = moves.append
+        us = self.turn
+        them = us ^ 1
+        bitboards = self.bitboards
+        base = us * 6
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = self.occupied
+        empty = MASK64 ^ occupied
+        not_own = MASK64 ^ own
+
+        # 兵：整体移位生成前进与吃子
+        pawns = bitboards[base + PAWN]
+        targets = enemy
+        if self.ep_square is not None:
+            targets |= 1 << self.ep_square
+        if us == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            pawn_sets = (
+                (single, 8),
+                (((pawns & NOT_FILE_A) >> 9) & targets, 9),
+                (((pawns & NOT_FILE_H) >> 7) & targets, 7),
+            )
+            promotion_row = ROW_MASKS[0]
+            double_offset = 16
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            pawn_sets = (
+                (single, -8),
+                (((pawns & NOT_FILE_A) << 7) & targets, -7),
+                (((pawns & NOT_FILE_H) << 9) & targets, -9),
+            )
+            promotion_row = ROW_MASKS[7]
+            double_offset = -16
+        for to_set, offset in pawn_sets:
+            for to_sq in iter_squares(to_set & ~promotion_row):
+                append((to_sq + offset, to_sq, None))
+            for to_sq in iter_squares(to_set & promotion_row):
+                for promotion in PROMOTION_TYPES:
+                    append((to_sq + offset, to_sq, promotion))
+        for to_sq in iter_squares(double):
+            append((to_sq + double_offset, to_sq, None))
+
+        # 马
+        for from_sq in iter_squares(bitboards[base + KNIGHT]):
+            for to_sq in iter_squares(KNIGHT_ATTACKS[from_sq] & not_own):
+                append((from_sq, to_sq, None))
+
+        # 象、车、后
+        for from_sq in iter_squares(bitboards[base + BISHOP]):
+            for to_sq in iter_squares(_slider_attacks(from_sq, occupied, BISHOP_RAYS) & not_own):
+                append((from_sq, to_sq, None))
+        for from_sq in iter_squares(bitboards[base + ROOK]):
+            for to_sq in iter_squares(_slider_attacks(from_sq, occupied, ROOK_RAYS) & not_own):
+                append((from_sq, to_sq, None))
+        for from_sq in iter_squares(bitboards[base + QUEEN]):
+            attacks = (_slider_attacks(from_sq, occupied, ROOK_RAYS) |
+                       _slider_attacks(from_sq, occupied, BISHOP_RAYS))
+            for to_sq in iter_squares(attacks & not_own):
+                append((from_sq, to_sq, None))
+
+        # 王（含王车易位，需在合法性检查中进一步验证）
+        king_bb = bitboards[base + KING]
+        if king_bb:
+            king_sq = king_bb.bit_length() - 1
+            for to_sq in iter_squares(KING_ATTACKS[king_sq] & not_own):
+                append((king_sq, to_sq, None))
+            if us == WHITE:
+                king_flag, queen_flag, home = CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, 60
+            else:
+                king_flag, queen_flag, home = CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, 4
+            if king_sq == home:
+                if self.castling & king_flag and not occupied & (0b11 << (home + 1)):
+                    append((home, home + 2, None))
+                if self.castling & queen_flag and not occupied & (0b111 << (home - 3)):
+                    append((home, home - 2, None))
+        return moves
+
+    def legal_moves(self):
+        """生成当前行棋方的全部合法走法，格式同pseudo_legal_moves
+
+        每个局面只计算一次将军掩码（解将可走到的格子）与被牵制棋子，
+        用它们直接过滤走法，不在棋盘上试走，也不修改局面。
+        """
+        moves = []
+        append = moves.append
+        us = self.turn
+        them = us ^ 1
+        bitboards = self.bitboards
+        base = us * 6
+        enemy_base = them * 6
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = self.occupied
+        not_own = MASK64 ^ own
+
+        king_bb = bitboards[base + KING]
+        if not king_bb:  # 没有王的局面（不应该发生）
+            return self.pseudo_legal_moves()
+        king_sq = king_bb.bit_length() - 1
+        checkers = self.attackers(king_sq, them)
+
+        # 王的移动：目标格在王离开后的占位下不能受攻击
+        without_king = occupied ^ king_bb
+        for to_sq in iter_squares(KING_ATTACKS[king_sq] & not_own):
+            if not self.attackers(to_sq, them, without_king):
+                append((king_sq, to_sq, None))
+
+        # 双将只能走王
+        if checkers & (checkers - 1):
+            return moves
+
+        if checkers:
+            # 单将：只能吃掉将军的棋子或挡在中间
+            check_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+        else:
+            check_mask = MASK64
+            # 王车易位：王不能在被将军时、也不能经过或到达受攻击的格子
+            if us == WHITE:
+                king_flag, queen_flag, home = CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, 60
+            else:
+                king_flag, queen_flag, home = CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, 4
+            if king_sq == home:
+                if (self.castling & king_flag and not occupied & (0b11 << (home + 1)) and
+                        not self.attackers(home + 1, them) and
+                        not self.attackers(home + 2, them)):
+                    append((home, home + 2, None))
+                if (self.castling & queen_flag and not occupied & (0b111 << (home - 3)) and
+                        not self.attackers(home - 1, them) and
+                        not self.attackers(home - 2, them)):
+                    append((home, home - 2, None))
+
+        # 牵制：从王出发只看对方棋子，找到同线的对方滑动棋子，
+        # 若中间恰好只有一个己方棋子，该棋子只能沿此线移动
+        pinned = 0
+        pin_masks = {}
+        enemy_queens = bitboards[enemy_base + QUEEN]
+        snipers = ((_slider_attacks(king_sq, enemy, ROOK_RAYS) &
+                    (bitboards[enemy_base + ROOK] | enemy_queens)) |
+                   (_slider_attacks(king_sq, enemy, BISHOP_RAYS) &
+                    (bitboards[enemy_base + BISHOP] | enemy_queens)))
+        for sniper_sq in iter_squares(snipers):
+            between = BETWEEN[king_sq][sniper_sq]
+            blockers = between & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+                pin_masks[blockers.bit_length() - 1] = between | (1 << sniper_sq)
+
+        targets = not_own & check_mask
+
+        # 兵（吃过路兵单独处理）
+        pawns = bitboards[base + PAWN]
+        empty = MASK64 ^ occupied
+        if us == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            pawn_sets = (
+                (single & check_mask, 8),
+                (((pawns & NOT_FILE_A) >> 9) & enemy & check_mask, 9),
+                (((pawns & NOT_FILE_H) >> 7) & enemy & check_mask, 7),
+                (double & check_mask, 16),
+            )
+            promotion_row = ROW_MASKS[0]
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            pawn_sets = (
+                (single & check_mask, -8),
+                (((pawns & NOT_FILE_A) << 7) & enemy & check_mask, -7),
+                (((pawns & NOT_FILE_H) << 9) & enemy & check_mask, -9),
+                (double & check_mask, -16),
+            )
+            promotion_row = ROW_MASKS[7]
+        for to_set, offset in pawn_sets:
+            for to_sq in iter_squares(to_set):
+                from_sq = to_sq + offset
+                if (1 << from_sq) & pinned and not pin_masks[from_sq] & (1 << to_sq):
+                    continue
+                if (1 << to_sq) & promotion_row:
+                    for promotion in PROMOTION_TYPES:
+                        append((from_sq, to_sq, promotion))
+                else:
+                    append((from_sq, to_sq, None))
+
+        # 吃过路兵：同一横线上同时移走两个兵可能造成闪击，直接按走后占位检查王
+        ep_square = self.ep_square
+        if ep_square is not None:
+            captured_sq = ep_square + 8 if us == WHITE else ep_square - 8
+            for from_sq in iter_squares(PAWN_ATTACKS[them][ep_square] & pawns):
+                after = (occupied ^ (1 << from_sq) ^ (1 << captured_sq)) | (1 << ep_square)
+                if not self.attackers(king_sq, them, after):
+                    append((from_sq, ep_square, None))
+
+        # 马（被牵制的马无法移动）
+        for from_sq in iter_squares(bitboards[base + KNIGHT] & ~pinned):
+            for to_sq in iter_squares(KNIGHT_ATTACKS[from_sq] & targets):
+                append((from_sq, to_sq, None))
+
+        # 象、车、后
+        for piece_type, rays in ((BISHOP, (BISHOP_RAYS,)), (ROOK, (ROOK_RAYS,)),
+                                 (QUEEN, (ROOK_RAYS, BISHOP_RAYS))):
+            for from_sq in iter_squares(bitboards[base + piece_type]):
+                attacks = 0
+                for ray_set in rays:
+                    attacks |= _slider_attacks(from_sq, occupied, ray_set)
+                attacks &= targets
+                if (1 << from_sq) & pinned:
+                    attacks &= pin_masks[from_sq]
+                for to_sq in iter_squares(attacks):
+                    append((from_sq, to_sq, None))
+        return moves
+
+
+def _position_from_state(bitboards, turn, castling, ep_square, halfmove_clock, fullmove_number):
+    """由Position.__reduce__保存的字段重建局面"""
+    position = Position()
+    position.bitboards = list(bitboards)
+    position.occupancy = [0, 0]
+    for index, bitboard in enumerate(bitboards):
+        position.occupancy[index // 6] |= bitboard
+    position.occupied = position.occupancy[WHITE] | position.occupancy[BLACK]
+    position.turn = turn
+    position.castling = castling
+    position.ep_square = ep_square
+    position.halfmove_clock = halfmove_clock
+    position.fullmove_number = fullmove_number
+    position.key = position.compute_key()
+    return position
+
+
+# 兼容视图：以board[row][col]形式读取位棋盘局面
+class BoardView:
+    __slots__ = ('position', '_pieces')
+
+    def __init__(self, position):
+        self.position = position
+        self._pieces = {}  # 已生成的Piece对象，保证同一格多次读取得到同一对象
+
+    def __getitem__(self, row):
+        return _RowView(self, row)
+
+    def __len__(self):
+        return BOARD_SIZE
+
+    def __iter__(self):
+        for row in range(BOARD_SIZE):
+            yield _RowView(self, row)
+
+    def piece(self, row, col):
+        """返回(row, col)上的Piece对象，空格返回None"""
+        sq = square(row, col)
+        if sq in self._pieces:
+            return self._pieces[sq]
+        position = self.position
+        found = position.piece_at(sq)
+        piece = None
+        if found is not None:
+            color, piece_type = found
+            piece = Piece(PieceType(piece_type), PieceColor(color), (row, col))
+            if piece_type == PAWN:
+                piece.has_moved = row != (6 if color == WHITE else 1)
+                if position.ep_square is not None:
+                    behind = 8 if color == WHITE else -8
+                    piece.en_passant_vulnerable = position.ep_square == sq + behind
+            elif piece_type == KING:
+                rights = position.castling >> (2 * color)
+                piece.has_moved = not rights & 0b11
+            elif piece_type == ROOK:
+                home_row = 7 if color == WHITE else 0
+                flag = 0
+                if row == home_row and col == 7:
+                    flag = CASTLE_WHITE_KING << (2 * color)
+                elif row == home_row and col == 0:
+                    flag = CASTLE_WHITE_QUEEN << (2 * color)
+                piece.has_moved = not position.castling & flag
+            else:
+                piece.has_moved = True
+        self._pieces[sq] = piece
+        return piece
+
+
+class _RowView:
+    __slots__ = ('view', 'row')
+
+    def __init__(self, view, row):
+        self.view = view
+        self.row = row
+
+    def __getitem__(self, col):
+        if not 0 <= col < BOARD_SIZE:
+            raise IndexError(col)
+        return self.view.piece(self.row, col)
+
+    def __len__(self):
+        return BOARD_SIZE
+
+    def __iter__(self):
+        for col in range(BOARD_SIZE):
+            yield self.view.piece(self.row, col)
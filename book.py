@@ -0,0 +1,240 @@
+"""开局库：Polyglot格式的二进制文件，内存映射后二分查找
+
+文件没有文件头，每个条目16字节（大端序）：局面键(u64)、走法(u16)、权重(u16)、
+learn(u32)，按局面键升序排列。局面键用Polyglot标准的Random64表计算（见
+polyglot_random.py和polyglot_key），与bitboard.py中本项目的Zobrist键不同。
+走法编码：
+    位0-2 目标列，位3-5 目标横线，位6-8 起点列，位9-11 起点横线，
+    位12-14 升变（1马 2象 3车 4后），易位记为王吃己方车（如e1h1）
+因此可以直接读取其他程序生成的Polyglot开局库，生成的库也能被其他程序使用。
+
+文件以只读方式mmap，打开时不读入内容，多个工作进程通过页缓存共享同一份数据。
+
+用法：
+    python book.py build games.pgn book.bin --max-ply 20
+    python book.py probe book.bin --fen "<FEN>"
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from bitboard import (Position, STARTING_FEN, WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                      PAWN_ATTACKS, iter_squares, move_to_uci)
+from pgn import read_games, tokenize_movetext, parse_san
+from polyglot_random import RANDOM64
+
+ENTRY = struct.Struct('>QHHI')
+ENTRY_BYTES = ENTRY.size
+MAX_WEIGHT = 0xFFFF
+DEFAULT_MAX_PLY = 20
+
+_PROMOTION_CODES = {None: 0, KNIGHT: 1, BISHOP: 2, ROOK: 3, QUEEN: 4}
+
+# 结果对白方/黑方的得分：胜2、和1、负0
+_RESULT_POINTS = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)}
+
+_CASTLING_OFFSET = 768
+_EN_PASSANT_OFFSET = 772
+_TURN_OFFSET = 780
+
+
+def polyglot_key(position):
+    """按Polyglot标准计算局面键
+
+    与本项目Zobrist键的差别：棋子种类按黑兵、白兵、黑马……交替编号，横线从第一横线数起；
+    吃过路兵的列只在行棋方有兵能吃过路兵时计入；白方行棋时异或第780个数。
+    """
+    key = 0
+    bitboards = position.bitboards
+    for color in (0, 1):
+        for piece_type in range(6):
+            base = 64 * (2 * piece_type + (color == WHITE))
+            for sq in iter_squares(bitboards[color * 6 + piece_type]):
+                key ^= RANDOM64[base + 8 * (7 - (sq >> 3)) + (sq & 7)]
+    for bit in range(4):
+        # 本项目的易位权利位依次为白短、白长、黑短、黑长，与Polyglot顺序相同
+        if position.castling >> bit & 1:
+            key ^= RANDOM64[_CASTLING_OFFSET + bit]
+    ep_square = position.ep_square
+    if ep_square is not None and \
+            PAWN_ATTACKS[position.turn ^ 1][ep_square] & bitboards[position.turn * 6 + PAWN]:
+        key ^= RANDOM64[_EN_PASSANT_OFFSET + (ep_square & 7)]
+    if position.turn == WHITE:
+        key ^= RANDOM64[_TURN_OFFSET]
+    return key
+
+
+def encode_move(position, move):
+    """把走法编码为16位整数（与Polyglot的走法编码相同）"""
+    from_sq, to_sq, promotion = move
+    if position.piece_type_at(from_sq, position.turn) == KING and abs(to_sq - from_sq) == 2:
+        # 易位记为王走到己方车所在的格子
+        to_sq = (from_sq & ~7) | (7 if to_sq > from_sq else 0)
+    return ((to_sq & 7) | ((7 - (to_sq >> 3)) << 3) |
+            ((from_sq & 7) << 6) | ((7 - (from_sq >> 3)) << 9) |
+            (_PROMOTION_CODES[promotion] << 12))
+
+
+def decode_move(position, bits):
+    """把16位走法还原为position中的合法走法，不合法时返回None"""
+    for move in position.legal_moves():
+        if encode_move(position, move) == bits:
+            return move
+    return None
+
+
+# 开局库类
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % ENTRY_BYTES or not size:
+            self._file.close()
+            raise ValueError("开局库文件大小不是%d字节的正整数倍" % ENTRY_BYTES)
+        self.entries = size // ENTRY_BYTES
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.entries
+
+    def __reduce__(self):
+        # 传给工作进程时只传路径，由子进程重新映射
+        return (OpeningBook, (self.path,))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _key_at(self, index):
+        offset = index * ENTRY_BYTES
+        return int.from_bytes(self._map[offset:offset + 8], 'big')
+
+    def entries_for(self, key):
+        """返回局面键对应的全部条目[(move_bits, weight, learn)]"""
+        low, high = 0, self.entries
+        while low < high:
+            mid = (low + high) // 2
+            if self._key_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        found = []
+        for index in range(low, self.entries):
+            entry_key, move_bits, weight, learn = ENTRY.unpack_from(self._map, index * ENTRY_BYTES)
+            if entry_key != key:
+                break
+            found.append((move_bits, weight, learn))
+        return found
+
+    def get_moves(self, position):
+        """返回局面在库中的合法走法[(move, weight)]，按权重降序"""
+        moves = []
+        for move_bits, weight, _ in self.entries_for(polyglot_key(position)):
+            move = decode_move(position, move_bits)
+            if move is not None:
+                moves.append((move, weight))
+        moves.sort(key=lambda item: -item[1])
+        return moves
+
+    def choose_move(self, position, rng=None, weighted=True):
+        """从库中选一个走法：按权重随机，weighted为False时取权重最高者；不在库中返回None"""
+        moves = [item for item in self.get_moves(position) if item[1] > 0]
+        if not moves:
+            return None
+        if not weighted:
+            return moves[0][0]
+        rng = rng or random
+        return rng.choices([move for move, _ in moves],
+                           weights=[weight for _, weight in moves])[0]
+
+
+def collect_statistics(lines, max_ply=DEFAULT_MAX_PLY, stats=None):
+    """统计PGN中前max_ply个半回合的{(Polyglot局面键, 走法编码): 得分}
+
+    得分按走子方的结果累加（胜2、和1、负0），再加1作为出现次数的权重，
+    使常见但胜率一般的走法不会被完全排除。一盘棋全部解析成功后才计入统计，
+    中途出错的棋局整盘跳过。返回(统计字典, 使用的棋局数, 跳过的棋局数)。
+    """
+    stats = {} if stats is None else stats
+    used = skipped = 0
+    for headers, movetext in read_games(lines):
+        entries = []
+        try:
+            position = Position.from_fen(headers['FEN']) if 'FEN' in headers else Position.initial()
+            sans, _ = tokenize_movetext(movetext)
+            points = _RESULT_POINTS.get(headers.get('Result'), (0, 0))
+            for san in sans[:max_ply]:
+                move = parse_san(position, san)
+                entries.append(((polyglot_key(position), encode_move(position, move)),
+                                1 + points[0 if position.turn == WHITE else 1]))
+                position.push(move)
+        except ValueError:
+            skipped += 1
+            continue
+        for entry, score in entries:
+            stats[entry] = stats.get(entry, 0) + score
+        used += 1
+    return stats, used, skipped
+
+
+def write_book(stats, path, min_weight=1):
+    """把统计结果写成按键排序的开局库文件，权重超过16位时按比例缩放，返回条目数"""
+    entries = [(key, move_bits, weight) for (key, move_bits), weight in stats.items()
+               if weight >= min_weight]
+    top = max((weight for _, _, weight in entries), default=0)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1.0
+    entries.sort(key=lambda entry: (entry[0], -entry[2], entry[1]))
+    with open(path, 'wb') as output:
+        for key, move_bits, weight in entries:
+            output.write(ENTRY.pack(key, move_bits, max(1, int(weight * scale)), 0))
+    return len(entries)
+
+
+def build_book(pgn_path, book_path, max_ply=DEFAULT_MAX_PLY, min_weight=1):
+    """由PGN文件生成开局库，返回(条目数, 使用的棋局数, 跳过的棋局数)"""
+    with open(pgn_path, encoding='utf-8', errors='replace') as source:
+        stats, used, skipped = collect_statistics(source, max_ply)
+    return write_book(stats, book_path, min_weight), used, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Polyglot格式的内存映射开局库")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="由PGN文件生成开局库")
+    build.add_argument("pgn", help="PGN文件路径")
+    build.add_argument("book", help="输出的开局库路径")
+    build.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY, help="每盘棋收录的半回合数")
+    build.add_argument("--min-weight", type=int, default=1, help="低于此权重的条目不收录")
+    probe = commands.add_parser("probe", help="查询局面在库中的走法")
+    probe.add_argument("book", help="开局库路径")
+    probe.add_argument("--fen", default=STARTING_FEN, help="要查询的局面")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count, used, skipped = build_book(args.pgn, args.book, args.max_ply, args.min_weight)
+        print("条目 %d  棋局 %d  跳过 %d" % (count, used, skipped))
+        return 0
+
+    position = Position.from_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        moves = book.get_moves(position)
+        total = sum(weight for _, weight in moves)
+        for move, weight in moves:
+            print("%-6s 权重 %5d  %5.1f%%" % (move_to_uci(move), weight, 100.0 * weight / total))
+        if not moves:
+            print("局面不在库中")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,647 @@
+"""国际象棋规则与棋局状态（无图形界面依赖）
+
+本模块不导入pygame，可以在服务端进程、批处理任务中直接使用规则引擎。
+图形界面见chess_game.py。
+"""
+from enum import Enum
+from typing import NamedTuple, Optional
+
+# 常量定义
+BOARD_SIZE = 8  # 棋盘大小 8x8
+
+
+def _build_step_table(offsets):
+    """预计算每个格子按给定偏移一步可达的格子（马、王的攻击表）"""
+    table = []
+    for row in range(BOARD_SIZE):
+        table_row = []
+        for col in range(BOARD_SIZE):
+            table_row.append([(row + dr, col + dc) for dr, dc in offsets
+                              if 0 <= row + dr < BOARD_SIZE and 0 <= col + dc < BOARD_SIZE])
+        table.append(table_row)
+    return table
+
+
+def _build_ray_table(directions):
+    """预计算每个格子沿各方向直到棋盘边缘的射线"""
+    table = []
+    for row in range(BOARD_SIZE):
+        table_row = []
+        for col in range(BOARD_SIZE):
+            rays = []
+            for dr, dc in directions:
+                ray = []
+                r, c = row + dr, col + dc
+                while 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE:
+                    ray.append((r, c))
+                    r, c = r + dr, c + dc
+                if ray:
+                    rays.append(ray)
+            table_row.append(rays)
+        table.append(table_row)
+    return table
+
+
+# 攻击查询表（用于从目标格反查攻击者）
+KNIGHT_TARGETS = _build_step_table([
+    (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+    (1, -2), (1, 2), (2, -1), (2, 1)
+])
+KING_TARGETS = _build_step_table([
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1), (0, 1),
+    (1, -1), (1, 0), (1, 1)
+])
+ORTHOGONAL_RAYS = _build_ray_table([(-1, 0), (1, 0), (0, -1), (0, 1)])
+DIAGONAL_RAYS = _build_ray_table([(-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+# 棋子颜色枚举
+class PieceColor(Enum):
+    WHITE = 0
+    BLACK = 1
+
+# 棋子类型枚举
+class PieceType(Enum):
+    PAWN = 0
+    KNIGHT = 1
+    BISHOP = 2
+    ROOK = 3
+    QUEEN = 4
+    KING = 5
+
+# 棋子类
+class Piece:
+    __slots__ = ('type', 'color', 'position', 'has_moved', 'en_passant_vulnerable')
+    
+    def __init__(self, piece_type, color, position):
+        self.type = piece_type
+        self.color = color
+        self.position = position  # (row, col)
+        self.has_moved = False  # 用于判断王车易位和兵的首次移动
+        self.en_passant_vulnerable = False  # 用于吃过路兵判断
+    
+    def get_possible_moves(self, board):
+        """获取棋子的所有可能移动位置"""
+        moves = []
+        row, col = self.position
+        
+        # 兵的移动
+        if self.type == PieceType.PAWN:
+            direction = -1 if self.color == PieceColor.WHITE else 1
+            
+            # 前进一步
+            if 0 <= row + direction < BOARD_SIZE and board[row + direction][col] is None:
+                moves.append((row + direction, col))
+                
+                # 初始位置可以前进两步
+                initial_row = 6 if self.color == PieceColor.WHITE else 1
+                if row == initial_row and board[row + 2*direction][col] is None:
+                    moves.append((row + 2*direction, col))
+            
+            # 斜向吃子
+            for dc in [-1, 1]:
+                if 0 <= row + direction < BOARD_SIZE and 0 <= col + dc < BOARD_SIZE:
+                    # 常规吃子
+                    target = board[row + direction][col + dc]
+                    if target is not None and target.color != self.color:
+                        moves.append((row + direction, col + dc))
+                    
+                    # 吃过路兵
+                    if row == (3 if self.color == PieceColor.WHITE else 4):
+                        target = board[row][col + dc]
+                        if (target is not None and target.type == PieceType.PAWN and 
+                            target.color != self.color and target.en_passant_vulnerable):
+                            moves.append((row + direction, col + dc))
+        
+        # 马的移动
+        elif self.type == PieceType.KNIGHT:
+            knight_moves = [
+                (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                (1, -2), (1, 2), (2, -1), (2, 1)
+            ]
+            for dr, dc in knight_moves:
+                new_row, new_col = row + dr, col + dc
+                if 0 <= new_row < BOARD_SIZE and 0 <= new_col < BOARD_SIZE:
+                    target = board[new_row][new_col]
+                    if target is None or target.color != self.color:
+                        moves.append((new_row, new_col))
+        
+        # 象的移动
+        elif self.type == PieceType.BISHOP:
+            directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # 对角线方向
+            for dr, dc in directions:
+                for i in range(1, BOARD_SIZE):
+                    new_row, new_col = row + i*dr, col + i*dc
+                    if not (0 <= new_row < BOARD_SIZE and 0 <= new_col < BOARD_SIZE):
+                        break
+                    target = board[new_row][new_col]
+                    if target is None:
+                        moves.append((new_row, new_col))
+                    elif target.color != self.color:
+                        moves.append((new_row, new_col))
+                        break
+                    else:
+                        break
+        
+        # 车的移动
+        elif self.type == PieceType.ROOK:
+            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # 水平和垂直方向
+            for dr, dc in directions:
+                for i in range(1, BOARD_SIZE):
+                    new_row, new_col = row + i*dr, col + i*dc
+                    if not (0 <= new_row < BOARD_SIZE and 0 <= new_col < BOARD_SIZE):
+                        break
+                    target = board[new_row][new_col]
+                    if target is None:
+                        moves.append((new_row, new_col))
+                    elif target.color != self.color:
+                        moves.append((new_row, new_col))
+                        break
+                    else:
+                        break
+        
+        # 后的移动（象+车的组合）
+        elif self.type == PieceType.QUEEN:
+            directions = [
+                (-1, -1), (-1, 0), (-1, 1),
+                (0, -1), (0, 1),
+                (1, -1), (1, 0), (1, 1)
+            ]
+            for dr, dc in directions:
+                for i in range(1, BOARD_SIZE):
+                    new_row, new_col = row + i*dr, col + i*dc
+                    if not (0 <= new_row < BOARD_SIZE and 0 <= new_col < BOARD_SIZE):
+                        break
+                    target = board[new_row][new_col]
+                    if target is None:
+                        moves.append((new_row, new_col))
+                    elif target.color != self.color:
+                        moves.append((new_row, new_col))
+                        break
+                    else:
+                        break
+        
+        # 王的移动
+        elif self.type == PieceType.KING:
+            # 常规移动
+            directions = [
+                (-1, -1), (-1, 0), (-1, 1),
+                (0, -1), (0, 1),
+                (1, -1), (1, 0), (1, 1)
+            ]
+            for dr, dc in directions:
+                new_row, new_col = row + dr, col + dc
+                if 0 <= new_row < BOARD_SIZE and 0 <= new_col < BOARD_SIZE:
+                    target = board[new_row][new_col]
+                    if target is None or target.color != self.color:
+                        moves.append((new_row, new_col))
+            
+            # 王车易位（需要在ChessGame类中进一步检查）
+            if not self.has_moved:
+                # 短易位（王侧）
+                if col + 3 < BOARD_SIZE:
+                    rook = board[row][col + 3]
+                    if (rook is not None and rook.type == PieceType.ROOK and 
+                        not rook.has_moved and 
+                        board[row][col + 1] is None and 
+                        board[row][col + 2] is None):
+                        moves.append((row, col + 2))  # 王移动两格
+                
+                # 长易位（后侧）
+                if col - 4 >= 0:
+                    rook = board[row][col - 4]
+                    if (rook is not None and rook.type == PieceType.ROOK and 
+                        not rook.has_moved and 
+                        board[row][col - 1] is None and 
+                        board[row][col - 2] is None and 
+                        board[row][col - 3] is None):
+                        moves.append((row, col - 2))  # 王移动两格
+        
+        return moves
+
+
+# 棋局的不可变快照：只含整数与元组，可哈希，可直接在进程之间传递
+class GameSnapshot(NamedTuple):
+    bitboards: tuple  # 12个位棋盘（color * 6 + piece_type），未变化的位棋盘在相邻快照间共享
+    turn: int
+    castling: int
+    ep_square: Optional[int]
+    halfmove_clock: int
+    fullmove_number: int
+    key: int  # Zobrist键
+    game_over: bool
+    winner: Optional[int]  # 胜方颜色编码，和棋或未结束为None
+
+
+# 棋局状态类（规则与状态，不含界面）
+class GameState:
+    def __init__(self):
+        self.board = [[None for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+        self.current_turn = PieceColor.WHITE
+        self.game_over = False
+        self.winner = None
+        self.promotion_pawn = None  # 用于兵的升变
+        self.king_positions = {}  # 双方王的位置，走子时增量更新
+        self.en_passant_pawn = None  # 上一步走了两格、可被吃过路兵的兵
+        self.move_history = []  # push()的撤销记录
+        self._position = None  # 当前局面的位棋盘缓存，随走子增量更新
+        self._pending_push = None  # 等待升变选择时暂存的(位棋盘缓存, 起点格)
+        self._legal_cache = None  # (局面键, {起点格: 终点格位掩码})，见legal_move_table
+        self.setup_board()
+    
+    def setup_board(self):
+        """初始化棋盘布局"""
+        # 放置黑方棋子
+        self.board[0][0] = Piece(PieceType.ROOK, PieceColor.BLACK, (0, 0))
+        self.board[0][1] = Piece(PieceType.KNIGHT, PieceColor.BLACK, (0, 1))
+        self.board[0][2] = Piece(PieceType.BISHOP, PieceColor.BLACK, (0, 2))
+        self.board[0][3] = Piece(PieceType.QUEEN, PieceColor.BLACK, (0, 3))
+        self.board[0][4] = Piece(PieceType.KING, PieceColor.BLACK, (0, 4))
+        self.board[0][5] = Piece(PieceType.BISHOP, PieceColor.BLACK, (0, 5))
+        self.board[0][6] = Piece(PieceType.KNIGHT, PieceColor.BLACK, (0, 6))
+        self.board[0][7] = Piece(PieceType.ROOK, PieceColor.BLACK, (0, 7))
+        
+        # 放置黑方兵
+        for col in range(BOARD_SIZE):
+            self.board[1][col] = Piece(PieceType.PAWN, PieceColor.BLACK, (1, col))
+        
+        # 放置白方兵
+        for col in range(BOARD_SIZE):
+            self.board[6][col] = Piece(PieceType.PAWN, PieceColor.WHITE, (6, col))
+        
+        # 放置白方棋子
+        self.board[7][0] = Piece(PieceType.ROOK, PieceColor.WHITE, (7, 0))
+        self.board[7][1] = Piece(PieceType.KNIGHT, PieceColor.WHITE, (7, 1))
+        self.board[7][2] = Piece(PieceType.BISHOP, PieceColor.WHITE, (7, 2))
+        self.board[7][3] = Piece(PieceType.QUEEN, PieceColor.WHITE, (7, 3))
+        self.board[7][4] = Piece(PieceType.KING, PieceColor.WHITE, (7, 4))
+        self.board[7][5] = Piece(PieceType.BISHOP, PieceColor.WHITE, (7, 5))
+        self.board[7][6] = Piece(PieceType.KNIGHT, PieceColor.WHITE, (7, 6))
+        self.board[7][7] = Piece(PieceType.ROOK, PieceColor.WHITE, (7, 7))
+        
+        self.king_positions = {PieceColor.WHITE: (7, 4), PieceColor.BLACK: (0, 4)}
+        self._position = None
+    
+    def locate_kings(self):
+        """扫描棋盘重新确定双方王的位置（仅在直接改写board后需要调用）"""
+        self.king_positions = {}
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                piece = self.board[row][col]
+                if piece is not None and piece.type == PieceType.KING:
+                    self.king_positions[piece.color] = (row, col)
+    
+    def move_piece(self, piece, new_row, new_col):
+        """移动棋子"""
+        position = self._position if self.promotion_pawn is None else None
+        self._position = None
+        self._legal_cache = None
+        old_row, old_col = piece.position
+        
+        # 处理吃过路兵
+        if (piece.type == PieceType.PAWN and 
+            old_col != new_col and 
+            self.board[new_row][new_col] is None):
+            # 吃过路兵情况下，需要移除被吃的兵
+            self.board[old_row][new_col] = None
+        
+        # 处理王车易位
+        if piece.type == PieceType.KING and abs(old_col - new_col) > 1:
+            # 短易位
+            if new_col > old_col:
+                rook = self.board[old_row][7]
+                self.board[old_row][5] = rook  # 移动车
+                rook.position = (old_row, 5)
+                rook.has_moved = True
+                self.board[old_row][7] = None
+            # 长易位
+            else:
+                rook = self.board[old_row][0]
+                self.board[old_row][3] = rook  # 移动车
+                rook.position = (old_row, 3)
+                rook.has_moved = True
+                self.board[old_row][0] = None
+        
+        # 重置过路兵状态（只有上一步走两格的兵带有该标记）
+        if self.en_passant_pawn is not None:
+            self.en_passant_pawn.en_passant_vulnerable = False
+            self.en_passant_pawn = None
+        
+        # 设置过路兵状态
+        if (piece.type == PieceType.PAWN and 
+            abs(old_row - new_row) == 2):
+            piece.en_passant_vulnerable = True
+            self.en_passant_pawn = piece
+        
+        # 移动棋子
+        self.board[new_row][new_col] = piece
+        self.board[old_row][old_col] = None
+        piece.position = (new_row, new_col)
+        piece.has_moved = True
+        if piece.type == PieceType.KING:
+            self.king_positions[piece.color] = (new_row, new_col)
+        
+        # 处理兵升变
+        from_square = old_row * BOARD_SIZE + old_col
+        if (piece.type == PieceType.PAWN and 
+            (new_row == 0 or new_row == 7)):
+            self.promotion_pawn = piece
+            self._pending_push = (position, from_square)
+        else:
+            # 切换回合
+            self.current_turn = PieceColor.BLACK if self.current_turn == PieceColor.WHITE else PieceColor.WHITE
+            
+            # 同步位棋盘缓存
+            if position is not None:
+                position.push((from_square, new_row * BOARD_SIZE + new_col, None))
+                self._position = position
+            
+            # 检查游戏结束条件
+            self.check_game_over()
+    
+    def promote_pawn(self, piece_type):
+        """升变兵为指定类型的棋子"""
+        if self.promotion_pawn is not None:
+            row, col = self.promotion_pawn.position
+            color = self.promotion_pawn.color
+            self.board[row][col] = Piece(piece_type, color, (row, col))
+            self.promotion_pawn = None
+            
+            # 切换回合
+            self.current_turn = PieceColor.BLACK if self.current_turn == PieceColor.WHITE else PieceColor.WHITE
+            
+            # 同步位棋盘缓存
+            position, from_square = self._pending_push
+            self._pending_push = None
+            if position is not None:
+                position.push((from_square, row * BOARD_SIZE + col, piece_type.value))
+                self._position = position
+            else:
+                # 等待升变时可能已按未升变的棋盘生成过缓存
+                self._position = None
+            
+            # 检查游戏结束条件
+            self.check_game_over()
+    
+    def push(self, move):
+        """按走法(from_square, to_square, promotion)走一步，可用pop()撤销
+        
+        格子编号为row * 8 + col；兵到达底线时必须给出升变棋子类型。
+        撤销记录只保存这一步涉及的几个棋子及其原状态。
+        """
+        from_square, to_square, promotion = move
+        from_row, from_col = divmod(from_square, BOARD_SIZE)
+        to_row, to_col = divmod(to_square, BOARD_SIZE)
+        piece = self.board[from_row][from_col]
+        if piece is None:
+            raise ValueError("起点格没有棋子: %r" % (move,))
+        if (piece.type == PieceType.PAWN and (to_row == 0 or to_row == 7) and
+                promotion is None):
+            raise ValueError("升变走法需要指定升变棋子: %r" % (move,))
+        
+        captured = self.board[to_row][to_col]
+        if captured is None and piece.type == PieceType.PAWN and from_col != to_col:
+            captured = self.board[from_row][to_col]  # 吃过路兵
+        rook = None
+        rook_had_moved = False
+        if piece.type == PieceType.KING and abs(to_col - from_col) > 1:
+            rook = self.board[from_row][7 if to_col > from_col else 0]
+            rook_had_moved = rook.has_moved
+        
+        self.move_history.append((move, piece, piece.has_moved, captured, rook, rook_had_moved,
+                                  self.en_passant_pawn, self.game_over, self.winner,
+                                  self._position))
+        self.move_piece(piece, to_row, to_col)
+        if promotion is not None:
+            self.promote_pawn(PieceType(promotion))
+    
+    def pop(self):
+        """撤销最近一次push()，返回该走法"""
+        (move, piece, had_moved, captured, rook, rook_had_moved,
+         en_passant_pawn, game_over, winner, position) = self.move_history.pop()
+        from_square, to_square, promotion = move
+        from_row, from_col = divmod(from_square, BOARD_SIZE)
+        to_row, to_col = divmod(to_square, BOARD_SIZE)
+        board = self.board
+        
+        # 撤回走动的棋子（升变时终点格上是新棋子，直接清除）
+        board[to_row][to_col] = None
+        board[from_row][from_col] = piece
+        piece.position = (from_row, from_col)
+        piece.has_moved = had_moved
+        piece.en_passant_vulnerable = False
+        if piece.type == PieceType.KING:
+            self.king_positions[piece.color] = (from_row, from_col)
+        
+        # 恢复被吃的棋子（其position在被吃时未改变）
+        if captured is not None:
+            row, col = captured.position
+            board[row][col] = captured
+        
+        # 撤回易位的车
+        if rook is not None:
+            home_col = 7 if to_col > from_col else 0
+            board[from_row][rook.position[1]] = None
+            board[from_row][home_col] = rook
+            rook.position = (from_row, home_col)
+            rook.has_moved = rook_had_moved
+        
+        if en_passant_pawn is not None:
+            en_passant_pawn.en_passant_vulnerable = True
+        self.en_passant_pawn = en_passant_pawn
+        self.current_turn = piece.color
+        self.game_over = game_over
+        self.winner = winner
+        self.promotion_pawn = None
+        self._pending_push = None
+        self._legal_cache = None
+        
+        # 位棋盘缓存与这一步同步时一并撤销，否则下次使用时重新生成
+        if position is not None and self._position is position:
+            position.pop()
+        else:
+            self._position = None
+        return move
+    
+    def legal_move_table(self):
+        """行棋方的全部合法走法按起点格分组：{起点格: 终点格位掩码}
+        
+        每个局面只生成一次，走子、悔棋或载入局面后重新生成。
+        """
+        position = self.current_position()
+        cache = self._legal_cache
+        if cache is not None and cache[0] == position.key:
+            return cache[1]
+        table = {}
+        for from_square, to_square, _ in position.legal_moves():
+            table[from_square] = table.get(from_square, 0) | (1 << to_square)
+        self._legal_cache = (position.key, table)
+        return table
+    
+    def legal_targets(self, row, col):
+        """(row, col)上的行棋方棋子可以走到的格子位掩码"""
+        return self.legal_move_table().get(row * BOARD_SIZE + col, 0)
+    
+    def get_valid_moves(self, piece):
+        """获取棋子的有效移动位置（考虑将军限制）
+        
+        由位棋盘的合法走法生成器计算，不在棋盘上试走，也不修改棋盘。
+        行棋方的棋子直接从legal_move_table的缓存中读取。
+        """
+        row, col = piece.position
+        if piece.color == self.current_turn:
+            from bitboard import iter_squares
+            return [divmod(sq, BOARD_SIZE) for sq in iter_squares(self.legal_targets(row, col))]
+        
+        position = self.to_position(piece.color)
+        from_square = row * BOARD_SIZE + col
+        valid_moves = []
+        for move_from, move_to, promotion in position.legal_moves():
+            # 升变的四种选择对应同一个目标格，只保留一个
+            if move_from == from_square and (promotion is None or promotion == PieceType.QUEEN.value):
+                valid_moves.append(divmod(move_to, BOARD_SIZE))
+        
+        return valid_moves
+    
+    def is_in_check(self, color):
+        """检查指定颜色的王是否被将军"""
+        king_position = self.king_positions.get(color)
+        if king_position is None:  # 如果找不到王（不应该发生）
+            return False
+        
+        opponent_color = PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+        return self.is_square_attacked(king_position, opponent_color)
+    
+    def is_square_attacked(self, square, by_color):
+        """判断格子square=(row, col)是否受到by_color一方的攻击
+        
+        从目标格向外反查：马、王、兵查预计算表，车、象、后沿射线找第一个棋子。
+        """
+        row, col = square
+        board = self.board
+        
+        # 马
+        for r, c in KNIGHT_TARGETS[row][col]:
+            piece = board[r][c]
+            if (piece is not None and piece.color == by_color and 
+                piece.type == PieceType.KNIGHT):
+                return True
+        
+        # 王
+        for r, c in KING_TARGETS[row][col]:
+            piece = board[r][c]
+            if (piece is not None and piece.color == by_color and 
+                piece.type == PieceType.KING):
+                return True
+        
+        # 兵（白兵从下方斜向攻击，黑兵从上方斜向攻击）
+        pawn_row = row + 1 if by_color == PieceColor.WHITE else row - 1
+        if 0 <= pawn_row < BOARD_SIZE:
+            for c in (col - 1, col + 1):
+                if 0 <= c < BOARD_SIZE:
+                    piece = board[pawn_row][c]
+                    if (piece is not None and piece.color == by_color and 
+                        piece.type == PieceType.PAWN):
+                        return True
+        
+        # 车和后（横竖射线）
+        for ray in ORTHOGONAL_RAYS[row][col]:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece is not None:
+                    if (piece.color == by_color and 
+                        (piece.type == PieceType.ROOK or piece.type == PieceType.QUEEN)):
+                        return True
+                    break
+        
+        # 象和后（斜线射线）
+        for ray in DIAGONAL_RAYS[row][col]:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece is not None:
+                    if (piece.color == by_color and 
+                        (piece.type == PieceType.BISHOP or piece.type == PieceType.QUEEN)):
+                        return True
+                    break
+        
+        return False
+    
+    def to_position(self, turn=None):
+        """转换为位棋盘局面（见bitboard.Position），默认以当前回合为行棋方"""
+        from bitboard import Position
+        return Position.from_board(self.board, self.current_turn if turn is None else turn)
+    
+    def load_position(self, position):
+        """用位棋盘局面替换当前棋局（has_moved与过路兵标记由局面推出）"""
+        from bitboard import BoardView
+        view = BoardView(position)
+        self.board = [[view.piece(row, col) for col in range(BOARD_SIZE)]
+                      for row in range(BOARD_SIZE)]
+        self.current_turn = PieceColor(position.turn)
+        self.game_over = False
+        self.winner = None
+        self.promotion_pawn = None
+        self._pending_push = None
+        self.move_history = []
+        self.en_passant_pawn = None
+        for row in self.board:
+            for piece in row:
+                if piece is not None and piece.en_passant_vulnerable:
+                    self.en_passant_pawn = piece
+        self.locate_kings()
+        self._position = position.copy()
+        self._legal_cache = None
+        self.check_game_over()
+    
+    def load_fen(self, fen):
+        """从FEN字符串载入棋局，格式错误时抛出ValueError"""
+        from bitboard import Position
+        self.load_position(Position.from_fen(fen))
+    
+    def snapshot(self):
+        """当前棋局的不可变快照，不含悔棋记录和界面对象，用restore()恢复
+        
+        位棋盘缓存随走子增量更新，未变化的位棋盘仍是同一个整数对象，
+        因此连续保存每一步的快照时，相邻快照共享这些整数，每步只需一个元组。
+        """
+        if self.promotion_pawn is not None:
+            raise ValueError("等待选择升变棋子时不能生成快照")
+        position = self.current_position()
+        return GameSnapshot(tuple(position.bitboards), position.turn, position.castling,
+                            position.ep_square, position.halfmove_clock,
+                            position.fullmove_number, position.key, self.game_over,
+                            None if self.winner is None else self.winner.value)
+    
+    def restore(self, snapshot):
+        """恢复snapshot()得到的快照（悔棋记录清空）"""
+        from bitboard import Position
+        self.load_position(Position.from_state(*snapshot[:6]))
+        self.game_over = snapshot.game_over
+        self.winner = None if snapshot.winner is None else PieceColor(snapshot.winner)
+    
+    def to_fen(self):
+        """当前棋局的FEN字符串（易位权利由has_moved推出，过路兵格由en_passant_vulnerable推出）"""
+        return self.current_position().fen()
+    
+    def current_position(self):
+        """当前局面的位棋盘表示（随走子增量更新，缓存失效时才重新生成）"""
+        if self._position is None:
+            self._position = self.to_position()
+        return self._position
+    
+    def position_key(self):
+        """当前局面的64位Zobrist键，可用于局面去重和缓存索引"""
+        return self.current_position().key
+    
+    def check_game_over(self):
+        """检查游戏是否结束"""
+        # 检查当前回合是否有合法移动
+        has_valid_move = bool(self.legal_move_table())
+        
+        if not has_valid_move:
+            self.game_over = True
+            # 检查是否是将军导致的游戏结束（将死）
+            if self.is_in_check(self.current_turn):
+                self.winner = PieceColor.BLACK if self.current_turn == PieceColor.WHITE else PieceColor.WHITE
+            else:  # 否则是和棋（逼和）
+                self.winner = None
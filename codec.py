@@ -0,0 +1,127 @@
+"""局面的定长二进制编码（32字节）
+
+布局：
+    字节 0-7    占位位图（第0格对应最低位，小端序）
+    字节 8-23   按格子编号升序排列的棋子编码，每个4位（color * 6 + piece_type），
+                最多32个棋子
+    字节 24     行棋方（第0位）| 易位权利（第1-4位）
+    字节 25     吃过路兵目标格，没有时为0xFF
+    字节 26-27  半回合计数（小端序）
+    字节 28-29  回合数（小端序）
+    字节 30-31  保留，为0
+
+解码直接得到位棋盘，不创建Piece对象。
+
+用法：
+    python codec.py            # 测试编码/解码吞吐量
+"""
+import sys
+import time
+
+from bitboard import Position, STARTING_FEN, WHITE, BLACK, KING, iter_squares
+
+POSITION_BYTES = 32
+MAX_PIECES = 32
+NO_EP_SQUARE = 0xFF
+MAX_CLOCK = 0xFFFF  # 半回合计数与回合数各占16位
+
+
+def encode(position):
+    """把局面编码为32字节，棋子超过32个或计数超出16位时抛出ValueError"""
+    occupied = position.occupied
+    codes = {}
+    for index, bitboard in enumerate(position.bitboards):
+        for sq in iter_squares(bitboard):
+            codes[sq] = index
+    if len(codes) > MAX_PIECES:
+        raise ValueError("棋子超过%d个，无法编码" % MAX_PIECES)
+    if not (0 <= position.halfmove_clock <= MAX_CLOCK and
+            0 <= position.fullmove_number <= MAX_CLOCK):
+        raise ValueError("半回合计数或回合数超出%d，无法编码" % MAX_CLOCK)
+
+    packed = 0
+    shift = 0
+    for sq in iter_squares(occupied):
+        packed |= codes[sq] << shift
+        shift += 4
+
+    ep_square = position.ep_square
+    return (occupied.to_bytes(8, 'little') +
+            packed.to_bytes(16, 'little') +
+            bytes((position.turn | (position.castling << 1),
+                   NO_EP_SQUARE if ep_square is None else ep_square)) +
+            position.halfmove_clock.to_bytes(2, 'little') +
+            position.fullmove_number.to_bytes(2, 'little') +
+            b'\0\0')
+
+
+def decode(data):
+    """由32字节编码还原局面，数据长度或内容错误时抛出ValueError"""
+    if len(data) != POSITION_BYTES:
+        raise ValueError("局面编码长度应为%d字节" % POSITION_BYTES)
+    occupied = int.from_bytes(data[0:8], 'little')
+    packed = int.from_bytes(data[8:24], 'little')
+    if bin(occupied).count('1') > MAX_PIECES:
+        raise ValueError("占位位图超过%d个棋子" % MAX_PIECES)
+
+    bitboards = [0] * 12
+    for sq in iter_squares(occupied):
+        code = packed & 0xF
+        if code >= 12:
+            raise ValueError("无效的棋子编码: %d" % code)
+        bitboards[code] |= 1 << sq
+        packed >>= 4
+    if bin(bitboards[KING]).count('1') != 1 or bin(bitboards[6 + KING]).count('1') != 1:
+        raise ValueError("每方必须恰好有一个王")
+
+    position = Position()
+    position.bitboards = bitboards
+    position.occupancy = [
+        bitboards[0] | bitboards[1] | bitboards[2] | bitboards[3] | bitboards[4] | bitboards[5],
+        bitboards[6] | bitboards[7] | bitboards[8] | bitboards[9] | bitboards[10] | bitboards[11],
+    ]
+    position.occupied = occupied
+    flags = data[24]
+    position.turn = BLACK if flags & 1 else WHITE
+    position.castling = (flags >> 1) & 0xF
+    position.ep_square = None if data[25] == NO_EP_SQUARE else data[25]
+    position.halfmove_clock = int.from_bytes(data[26:28], 'little')
+    position.fullmove_number = int.from_bytes(data[28:30], 'little')
+    position.key = position.compute_key()
+    return position
+
+
+def encode_many(positions):
+    """把多个局面依次编码为一个bytes，每个局面占32字节"""
+    return b''.join(encode(position) for position in positions)
+
+
+def decode_many(data):
+    """逐个解码encode_many的输出"""
+    view = memoryview(data)
+    for offset in range(0, len(data), POSITION_BYTES):
+        yield decode(view[offset:offset + POSITION_BYTES])
+
+
+def main(argv=None):
+    fens = [
+        STARTING_FEN,
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    ]
+    positions = [Position.from_fen(fen) for fen in fens] * 2000
+    start = time.perf_counter()
+    data = encode_many(positions)
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = list(decode_many(data))
+    decode_seconds = time.perf_counter() - start
+    assert all(a.fen() == b.fen() for a, b in zip(positions[:len(fens)], decoded))
+    print("每个局面 %d 字节" % POSITION_BYTES)
+    print("编码: %.0f 局面/秒" % (len(positions) / encode_seconds))
+    print("解码: %.0f 局面/秒" % (len(positions) / decode_seconds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
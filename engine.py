@@ -0,0 +1,381 @@
+"""搜索引擎：迭代加深的负极大值alpha-beta搜索
+
+在位棋盘局面上使用push/pop遍历博弈树，叶子处做只考虑吃子的静态搜索。
+走法排序使用置换表走法、MVV-LVA（先吃价值高的子、再用价值低的子去吃）
+与杀手走法，已搜索过的局面通过置换表（见tt.py）复用结果。
+搜索可以按深度、时间或节点数限制，每隔少量节点检查一次，超出预算立即停止。
+
+用法：
+    python engine.py --fen "<FEN>" --movetime 2000
+"""
+import argparse
+import sys
+import time
+from typing import NamedTuple, Optional
+
+from bitboard import Position, STARTING_FEN, move_to_uci
+from evaluation import PIECE_VALUES, evaluate
+from tt import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000  # 超过此分值表示已找到杀棋
+INFINITY = 1000000
+MAX_PLY = 128
+CHECK_INTERVAL = 64  # 每隔多少节点检查一次时间限制
+DELTA_MARGIN = 200  # 静态搜索中吃子后仍明显低于alpha时跳过（delta剪枝）
+
+
+class SearchAborted(Exception):
+    """达到时间/节点上限或收到停止请求时在搜索内部抛出"""
+
+
+class SearchResult(NamedTuple):
+    best_move: Optional[tuple]  # (from_square, to_square, promotion)，无合法走法时为None
+    score: int  # 行棋方视角的分值
+    depth: int  # 完成的迭代深度
+    pv: list  # 主要变例
+    nodes: int
+    seconds: float
+    nps: int
+    branching_factor: float  # 有效分支因子：最后一次迭代与上一次迭代的节点数之比
+
+
+# 搜索器
+class Searcher:
+    def __init__(self, tt=None, tablebase=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.tablebase = tablebase  # 可选的残局库（见tablebase.py）
+        self.nodes = 0
+        self.stop_requested = False
+        self.stop_event = None  # 调用方持有的threading.Event，设置后停止搜索
+        self.deadline = None
+        self.node_limit = None
+        self._next_check = CHECK_INTERVAL
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+
+    def stop(self):
+        """请求停止当前搜索（可以从其他线程调用）"""
+        self.stop_requested = True
+
+    def search(self, position, depth=None, movetime=None, nodes=None, on_iteration=None,
+               window=None, stop_event=None):
+        """搜索局面，返回SearchResult
+
+        depth为最大迭代深度，movetime为时间预算（秒），nodes为节点上限；
+        三者都未给出时搜索到最大深度。每完成一次迭代调用on_iteration(result)。
+        window=(alpha, beta)时根节点只在该窗口内搜索，结果超出窗口时分值只是上界或下界。
+        stop_event为threading.Event时，它被设置后也会停止搜索；与stop()不同，搜索开始时
+        不会清除它，因此搜索线程启动前发出的停止请求不会丢失。
+        传入的局面不会被修改。
+        """
+        root = position.copy()
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stop_requested = False
+        self.stop_event = stop_event
+        self.deadline = start + movetime if movetime is not None else None
+        self.node_limit = nodes
+        self._next_check = CHECK_INTERVAL if nodes is None else min(CHECK_INTERVAL, nodes)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.tt.new_search()
+        max_depth = min(depth or MAX_PLY - 1, MAX_PLY - 1)
+
+        root_moves = root.legal_moves()
+        if not root_moves:
+            score = -MATE_SCORE if root.is_in_check() else 0
+            return SearchResult(None, score, 0, [], 0, 0.0, 0, 0.0)
+
+        alpha, beta = window if window is not None else (-INFINITY, INFINITY)
+        result = None
+        # 第一层迭代完成之前的后备走法：置换表走法，否则按MVV-LVA排序后的第一个走法
+        entry = self.tt.probe(root.key)
+        tt_move = entry[3] if entry is not None and entry[3] in root_moves else None
+        best_move = self._order_moves(root, root_moves, 0, tt_move)[0]
+        previous_nodes = 0
+        for current_depth in range(1, max_depth + 1):
+            iteration_start = self.nodes
+            try:
+                score, pv = self._search_root(root, current_depth, root_moves, best_move,
+                                              alpha, beta)
+            except SearchAborted:
+                break
+            iteration_nodes = self.nodes - iteration_start
+            best_move = pv[0]
+            elapsed = time.perf_counter() - start
+            result = SearchResult(
+                best_move, score, current_depth, pv, self.nodes, elapsed,
+                int(self.nodes / elapsed) if elapsed > 0 else 0,
+                iteration_nodes / previous_nodes if previous_nodes else float(iteration_nodes))
+            previous_nodes = iteration_nodes
+            if on_iteration is not None:
+                on_iteration(result)
+
+            if abs(score) >= MATE_THRESHOLD or len(root_moves) == 1:
+                break
+            # 剩余时间不够完成下一次迭代时提前结束
+            if self.deadline is not None and elapsed * 2 > self.deadline - start:
+                break
+
+        if result is None:
+            # 第一层迭代都未完成：返回排序后的第一个走法
+            elapsed = time.perf_counter() - start
+            result = SearchResult(best_move, evaluate(root), 0, [best_move], self.nodes, elapsed,
+                                  int(self.nodes / elapsed) if elapsed > 0 else 0, 0.0)
+        return result
+
+    def _check_limits(self):
+        """检查停止请求、时间与节点上限"""
+        if self.stop_requested or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchAborted()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+        self._next_check = self.nodes + CHECK_INTERVAL
+        if self.node_limit is not None:
+            self._next_check = min(self._next_check, self.node_limit)
+
+    def _search_root(self, position, depth, moves, best_move, alpha, beta):
+        """根节点搜索，上一次迭代的最佳走法最先搜索"""
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_pv = None
+        for move in self._order_moves(position, moves, 0, best_move):
+            position.push(move)
+            score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            position.pop()
+            if score > best_score:
+                best_score = score
+                best_pv = [move] + self.pv_table[1]
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_score >= beta:
+            bound = BOUND_LOWER
+        elif best_score > original_alpha:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        self.tt.store(position.key, depth, _score_to_tt(best_score, 0), bound, best_pv[0])
+        return best_score, best_pv
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        """负极大值alpha-beta搜索"""
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+        self.pv_table[ply] = []
+
+        if self._is_draw(position):
+            return 0
+        if ply >= MAX_PLY - 1:
+            return evaluate(position)
+
+        # 子力足够少时直接查残局库，得到精确的距杀步数
+        tablebase = self.tablebase
+        if tablebase is not None and bin(position.occupied).count('1') <= tablebase.max_pieces:
+            result = tablebase.probe(position)
+            if result is not None:
+                wdl, dtm = result
+                return (MATE_SCORE - ply - dtm) * wdl
+
+        in_check = position.is_in_check()
+        if in_check:
+            depth += 1  # 被将军时延伸一层
+        if depth <= 0:
+            return self._quiescence(position, alpha, beta, ply)
+
+        # 置换表：深度足够时直接使用已有结果，否则至少取其最佳走法用于排序
+        key = position.key
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, bound, tt_move = entry
+            if entry_depth >= depth:
+                entry_score = _score_from_tt(entry_score, ply)
+                if (bound == BOUND_EXACT or
+                        (bound == BOUND_LOWER and entry_score >= beta) or
+                        (bound == BOUND_UPPER and entry_score <= alpha)):
+                    if tt_move is not None:
+                        self.pv_table[ply] = [tt_move]
+                    return entry_score
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        enemy = position.occupancy[position.turn ^ 1]
+        for move in self._order_moves(position, moves, ply, tt_move):
+            position.push(move)
+            score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        # 不吃子的走法造成剪枝时记为杀手走法
+                        if not (1 << move[1]) & enemy and move[2] is None:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                        break
+
+        if best_score >= beta:
+            bound = BOUND_LOWER
+        elif best_score > original_alpha:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        self.tt.store(key, depth, _score_to_tt(best_score, ply), bound,
+                      best_move if bound != BOUND_UPPER else None)
+        return best_score
+
+    def _quiescence(self, position, alpha, beta, ply):
+        """静态搜索：只展开吃子与升变，直到局面平稳"""
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+        self.pv_table[ply] = []
+
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        them = position.turn ^ 1
+        enemy = position.occupancy[them]
+        captures = [move for move in position.legal_moves()
+                    if (1 << move[1]) & enemy or move[2] is not None]
+        best_score = stand_pat
+        for move in self._order_moves(position, captures, ply):
+            if (move[2] is None and stand_pat + DELTA_MARGIN +
+                    PIECE_VALUES[position.piece_type_at(move[1], them)] <= alpha):
+                continue
+            position.push(move)
+            score = -self._quiescence(position, -beta, -alpha, ply + 1)
+            position.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def _is_draw(self, position):
+        """五十步规则或局面重复（搜索中出现一次重复即视为和棋）"""
+        halfmove_clock = position.halfmove_clock
+        if halfmove_clock >= 100:
+            return True
+        stack = position.move_stack
+        key = position.key
+        # 撤销记录的最后一项是走该步之前的局面键；只比较同一方行棋的局面
+        limit = min(halfmove_clock, len(stack))
+        for back in range(2, limit + 1, 2):
+            if stack[-back][-1] == key:
+                return True
+        return False
+
+    def _order_moves(self, position, moves, ply, first=None):
+        """走法排序：指定的首选走法、MVV-LVA吃子、升变、杀手走法、其余走法"""
+        us = position.turn
+        them = us ^ 1
+        enemy = position.occupancy[them]
+        killers = self.killers[ply]
+        piece_type_at = position.piece_type_at
+        scores = []
+        for move in moves:
+            from_sq, to_sq, promotion = move
+            if move == first:
+                score = 1 << 30
+            elif (1 << to_sq) & enemy:
+                victim = piece_type_at(to_sq, them)
+                attacker = piece_type_at(from_sq, us)
+                score = (1 << 20) + PIECE_VALUES[victim] * 16 - attacker
+            elif promotion is not None:
+                score = (1 << 19) + promotion
+            elif move == killers[0]:
+                score = 1 << 18
+            elif move == killers[1]:
+                score = (1 << 18) - 1
+            else:
+                score = 0
+            scores.append(score)
+        order = sorted(range(len(moves)), key=scores.__getitem__, reverse=True)
+        return [moves[index] for index in order]
+
+
+def _score_to_tt(score, ply):
+    """杀棋分值存入置换表时改为相对当前节点的距离"""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    """从置换表取出的杀棋分值还原为相对根节点的距离"""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def format_score(score):
+    """分值的可读形式：杀棋显示为mate N（N为步数，负数表示被杀）"""
+    if abs(score) >= MATE_THRESHOLD:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return "mate %d" % (moves if score > 0 else -moves)
+    return "cp %d" % score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="alpha-beta搜索引擎")
+    parser.add_argument("--fen", default=STARTING_FEN, help="要分析的局面")
+    parser.add_argument("--depth", type=int, help="最大搜索深度")
+    parser.add_argument("--movetime", type=int, help="时间预算（毫秒）")
+    parser.add_argument("--nodes", type=int, help="节点上限")
+    parser.add_argument("--hash", type=float, default=16, help="置换表大小（MB）")
+    parser.add_argument("--tablebase", help="残局库目录")
+    args = parser.parse_args(argv)
+    if args.depth is None and args.movetime is None and args.nodes is None:
+        args.depth = 4
+
+    def report(result):
+        print("深度 %2d  %-9s  节点 %9d  %6.2fs  %7d nps  分支因子 %5.2f  pv %s" % (
+            result.depth, format_score(result.score), result.nodes, result.seconds,
+            result.nps, result.branching_factor, " ".join(move_to_uci(m) for m in result.pv)))
+
+    movetime = args.movetime / 1000.0 if args.movetime is not None else None
+    tablebase = None
+    if args.tablebase:
+        from tablebase import Tablebase
+        tablebase = Tablebase(args.tablebase)
+    searcher = Searcher(TranspositionTable(args.hash), tablebase)
+    result = searcher.search(Position.from_fen(args.fen), depth=args.depth,
+                             movetime=movetime, nodes=args.nodes, on_iteration=report)
+    if result.best_move is None:
+        print("没有合法走法")
+    else:
+        print("最佳走法: %s" % move_to_uci(result.best_move))
+    print("置换表命中率: %.1f%%  填充率: %d‰" % (searcher.tt.hit_rate * 100, searcher.tt.hashfull()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""可选的热点计时与性能剖析
+
+enable()把规则核心、位棋盘和界面中的热点方法替换为计时包装函数，统计调用
+次数与累计耗时；disable()换回原方法。未启用时代码中没有任何检查或包装，
+因此关闭时没有额外开销。耗时为包含内部调用的墙钟时间（例如push的耗时
+包含其中的move_piece和check_game_over）。
+
+统计的类别：
+    movegen     走法生成（get_valid_moves、legal_move_table、legal_moves等）
+    legality    合法性与终局检查（check_game_over、is_in_check）
+    attack      攻击检测（is_square_attacked、attackers）
+    make        走子与悔棋（move_piece、promote_pawn、push、pop）
+    render      界面绘制（BoardRenderer.render）
+    frame       ChessGame.run_frame，另外记录每帧耗时的分位数
+界面模块只在已被导入时才会被包装，启用统计不会导入pygame。
+
+snapshot()返回当前统计，start_dump()定期把统计以文本或JSON写到标准输出或文件；
+profile_call()在cProfile下运行一次对局或搜索，保存pstats文件并返回摘要。
+
+用法：
+    python instrumentation.py games --games 20 --json stats.json   # 随机对局的热点统计
+    python instrumentation.py ui --interval 5                       # 运行界面并每5秒输出统计
+    python instrumentation.py profile-game --output game.pstats      # 剖析一盘对局
+    python instrumentation.py profile-search --depth 4 --output search.pstats
+"""
+import argparse
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+
+# (模块, 类, 方法, 类别)
+TARGETS = (
+    ("chess_core", "GameState", "get_valid_moves", "movegen"),
+    ("chess_core", "GameState", "legal_move_table", "movegen"),
+    ("chess_core", "GameState", "check_game_over", "legality"),
+    ("chess_core", "GameState", "is_in_check", "legality"),
+    ("chess_core", "GameState", "is_square_attacked", "attack"),
+    ("chess_core", "GameState", "move_piece", "make"),
+    ("chess_core", "GameState", "promote_pawn", "make"),
+    ("chess_core", "GameState", "push", "make"),
+    ("chess_core", "GameState", "pop", "make"),
+    ("bitboard", "Position", "legal_moves", "movegen"),
+    ("bitboard", "Position", "pseudo_legal_moves", "movegen"),
+    ("bitboard", "Position", "is_in_check", "legality"),
+    ("bitboard", "Position", "is_square_attacked", "attack"),
+    ("bitboard", "Position", "attackers", "attack"),
+    ("bitboard", "Position", "push", "make"),
+    ("bitboard", "Position", "pop", "make"),
+    ("chess_game", "BoardRenderer", "render", "render"),
+    ("chess_game", "ChessGame", "run_frame", "frame"),
+)
+UI_MODULES = ("chess_game",)  # 只在已导入时包装，避免导入pygame
+FRAME_SAMPLES = 1000  # 保留最近多少帧的耗时
+
+_counters = {}  # 名称 -> [类别, 调用次数, 累计秒数]
+_frame_times = deque(maxlen=FRAME_SAMPLES)
+_originals = {}  # (类, 方法) -> 原函数
+_started = None
+_dump_thread = None
+_dump_stop = threading.Event()
+
+
+def _wrap(function, counter, samples=None):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            counter[1] += 1
+            counter[2] += elapsed
+            if samples is not None:
+                samples.append(elapsed)
+    return wrapper
+
+
+def enable():
+    """启用计时（重复调用无影响）"""
+    global _started
+    if _originals:
+        return
+    for module_name, class_name, method, category in TARGETS:
+        if module_name in UI_MODULES and module_name not in sys.modules:
+            continue
+        module = __import__(module_name)
+        cls = getattr(module, class_name)
+        # 只包装在该类上定义的方法，继承的方法由基类的包装统计
+        function = cls.__dict__.get(method)
+        if function is None:
+            continue
+        name = "%s.%s" % (class_name, method)
+        counter = _counters.setdefault(name, [category, 0, 0.0])
+        samples = _frame_times if category == "frame" else None
+        _originals[(cls, method)] = function
+        setattr(cls, method, _wrap(function, counter, samples))
+    if _started is None:
+        _started = time.perf_counter()
+
+
+def disable():
+    """恢复原方法，已有的统计保留"""
+    for (cls, method), function in _originals.items():
+        setattr(cls, method, function)
+    _originals.clear()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def reset():
+    """清空统计"""
+    global _started
+    for counter in _counters.values():
+        counter[1] = 0
+        counter[2] = 0.0
+    _frame_times.clear()
+    _started = time.perf_counter() if _originals else None
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def snapshot():
+    """当前统计：{'elapsed': 秒, 'methods': {名称: {...}}, 'categories': {...}, 'frames': {...}}"""
+    methods = {}
+    categories = {}
+    for name, (category, calls, seconds) in list(_counters.items()):
+        methods[name] = {"category": category, "calls": calls, "seconds": seconds,
+                         "mean_us": seconds / calls * 1e6 if calls else 0.0}
+        total = categories.setdefault(category, {"calls": 0, "seconds": 0.0})
+        total["calls"] += calls
+        total["seconds"] += seconds
+    frames = list(_frame_times)
+    return {
+        "elapsed": time.perf_counter() - _started if _started is not None else 0.0,
+        "methods": methods,
+        "categories": categories,
+        "frames": {
+            "count": len(frames),
+            "p50_ms": _percentile(frames, 0.5) * 1000,
+            "p99_ms": _percentile(frames, 0.99) * 1000,
+            "max_ms": max(frames) * 1000 if frames else 0.0,
+        },
+    }
+
+
+def format_report(stats):
+    """把snapshot()的结果格式化为文本表格（按累计耗时排序）"""
+    lines = ["统计时长 %.2fs" % stats["elapsed"]]
+    lines.append("%-32s %-9s %10s %10s %10s" % ("方法", "类别", "调用", "累计(ms)", "平均(us)"))
+    ordered = sorted(stats["methods"].items(), key=lambda item: -item[1]["seconds"])
+    for name, method in ordered:
+        if method["calls"]:
+            lines.append("%-32s %-9s %10d %10.1f %10.2f" % (
+                name, method["category"], method["calls"], method["seconds"] * 1000,
+                method["mean_us"]))
+    frames = stats["frames"]
+    if frames["count"]:
+        lines.append("帧 %d  p50 %.1fms  p99 %.1fms  最大 %.1fms" % (
+            frames["count"], frames["p50_ms"], frames["p99_ms"], frames["max_ms"]))
+    return "\n".join(lines)
+
+
+def dump(path=None, as_json=False):
+    """把当前统计写到文件（覆盖）或标准输出"""
+    stats = snapshot()
+    text = json.dumps(stats, indent=2) if as_json else format_report(stats)
+    if path is None:
+        print(text, flush=True)
+    else:
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+
+
+def start_dump(interval, path=None, as_json=False):
+    """每隔interval秒在后台线程中调用一次dump"""
+    global _dump_thread
+    stop_dump()
+    _dump_stop.clear()
+
+    def loop():
+        while not _dump_stop.wait(interval):
+            dump(path, as_json)
+
+    _dump_thread = threading.Thread(target=loop, daemon=True)
+    _dump_thread.start()
+
+
+def stop_dump():
+    global _dump_thread
+    if _dump_thread is not None:
+        _dump_stop.set()
+        _dump_thread.join()
+        _dump_thread = None
+
+
+def profile_call(function, *args, output=None, sort="cumulative", limit=25, **kwargs):
+    """在cProfile下调用一次function，返回(返回值, 摘要文本)；给出output时保存pstats文件"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    if output is not None:
+        profiler.dump_stats(output)
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats(sort).print_stats(limit)
+    return result, buffer.getvalue()
+
+
+def _random_games(games, seed):
+    from tournament import RandomPlayer, play_game
+    white, black = RandomPlayer(seed), RandomPlayer(seed + 1)
+    return [play_game(white, black, index) for index in range(games)]
+
+
+def main(argv=None):
+    from bitboard import Position, STARTING_FEN
+    from engine import Searcher
+
+    parser = argparse.ArgumentParser(description="热点计时与性能剖析")
+    commands = parser.add_subparsers(dest="command", required=True)
+    games = commands.add_parser("games", help="启用计时运行随机对局并输出统计")
+    games.add_argument("--games", type=int, default=20, help="对局数")
+    games.add_argument("--seed", type=int, default=0, help="随机种子")
+    games.add_argument("--json", help="把统计以JSON写入文件")
+    ui = commands.add_parser("ui", help="启用计时运行图形界面，定期输出统计")
+    ui.add_argument("--interval", type=float, default=5.0, help="输出间隔（秒）")
+    ui.add_argument("--json", help="把统计以JSON定期写入文件（否则以文本输出到标准输出）")
+    profile_game = commands.add_parser("profile-game", help="在cProfile下运行一盘随机对局")
+    profile_game.add_argument("--seed", type=int, default=0, help="随机种子")
+    profile_game.add_argument("--output", help="保存pstats文件")
+    profile_search = commands.add_parser("profile-search", help="在cProfile下运行一次搜索")
+    profile_search.add_argument("--fen", default=STARTING_FEN, help="要搜索的局面")
+    profile_search.add_argument("--depth", type=int, default=4, help="搜索深度")
+    profile_search.add_argument("--output", help="保存pstats文件")
+    args = parser.parse_args(argv)
+
+    if args.command == "games":
+        enable()
+        _random_games(args.games, args.seed)
+        disable()
+        print(format_report(snapshot()))
+        if args.json:
+            dump(args.json, as_json=True)
+    elif args.command == "ui":
+        import chess_game
+        enable()
+        start_dump(args.interval, args.json, as_json=bool(args.json))
+        try:
+            chess_game.ChessGame().run()
+        finally:
+            stop_dump()
+            dump(args.json, as_json=bool(args.json))
+    elif args.command == "profile-game":
+        _, text = profile_call(_random_games, 1, args.seed, output=args.output)
+        print(text)
+    else:
+        # 置换表在剖析之外分配
+        searcher = Searcher()
+        _, text = profile_call(searcher.search, Position.from_fen(args.fen), depth=args.depth,
+                               output=args.output)
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
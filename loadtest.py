@@ -0,0 +1,211 @@
+"""棋局服务器压力测试
+
+在同一进程中启动GameServer，用多个TCP连接创建并订阅N盘棋局，然后每盘棋
+按预先生成的随机合法走法序列逐步走棋（每个连接把自己所有棋局的走法成批
+发出，再收齐回复），统计：
+    - 每秒走棋数
+    - 服务器端走棋校验耗时的p50/p99
+    - 客户端看到的往返延迟p50/p99（包含排队）
+    - 每盘棋的内存：另建一个服务器，在tracemalloc下直接创建同样数量的棋局并走完
+      同样的走法（不计时），分别给出创建后和走完后的字节数；另给出压测本身
+      走完之后的RSS增量
+
+用法：
+    python loadtest.py --games 1000 10000 --connections 20 --plies 20
+"""
+import argparse
+import asyncio
+import gc
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+from bitboard import Position, move_to_uci
+from server import GameServer
+
+
+def _rss_bytes():
+    """当前常驻内存，取不到时退回到峰值常驻内存"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def random_sequences(count, plies, seed=0):
+    """生成count条随机合法走法序列（UCI），对局提前结束时序列较短"""
+    rng = random.Random(seed)
+    sequences = []
+    for _ in range(count):
+        position = Position.initial()
+        moves = []
+        for _ in range(plies):
+            legal = position.legal_moves()
+            if not legal:
+                break
+            move = rng.choice(legal)
+            moves.append(move_to_uci(move))
+            position.push(move)
+        sequences.append(moves)
+    return sequences
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+# 压测客户端：一个TCP连接，负责若干盘棋
+class _Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.games = []
+        self.pushes = 0
+
+    async def request_all(self, lines, reply_prefixes=('ok', 'error')):
+        """成批发送命令，按顺序收齐以reply_prefixes开头的回复，其余行作为推送计数
+
+        返回[(回复字段, 往返秒数)]。
+        """
+        sent = time.perf_counter()
+        self.writer.write(''.join(line + '\n' for line in lines).encode())
+        await self.writer.drain()
+        replies = []
+        while len(replies) < len(lines):
+            line = (await self.reader.readline()).decode()
+            if not line:
+                raise ConnectionError("服务器关闭了连接")
+            fields = line.split()
+            if fields[0] not in reply_prefixes:
+                self.pushes += 1
+                continue
+            replies.append((fields, time.perf_counter() - sent))
+        return replies
+
+
+def measure_game_memory(game_count, plies, sequences):
+    """在tracemalloc下创建game_count盘棋并走完，返回(创建后, 走完后)每盘棋的字节数
+
+    直接调用GameServer的方法，不经过网络，也不计入压测的耗时。
+    """
+    server = GameServer()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        game_ids = [server.new_game() for _ in range(game_count)]
+        created = tracemalloc.get_traced_memory()[0] - start
+        for ply in range(plies):
+            for game_id in game_ids:
+                moves = sequences[game_id % len(sequences)]
+                if ply < len(moves):
+                    server.apply_move(game_id, moves[ply])
+        # 走棋校验耗时样本不属于棋局，测量前清空
+        server.latencies.clear()
+        gc.collect()
+        played = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return created / game_count, played / game_count
+
+
+async def run_load(game_count, connections, plies, sequences):
+    """执行一轮压测，返回结果字典"""
+    server = GameServer()
+    listener = await server.start('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    clients = []
+    for _ in range(connections):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=1 << 20)
+        clients.append(_Client(reader, writer))
+
+    # 创建并订阅棋局
+    gc.collect()
+    rss_start = _rss_bytes()
+    game_ids = [server.new_game() for _ in range(game_count)]
+    for index, game_id in enumerate(game_ids):
+        clients[index % connections].games.append(game_id)
+    await asyncio.gather(*(client.request_all(['join %d' % game_id for game_id in client.games],
+                                              ('state', 'error'))
+                           for client in clients))
+
+    # 每个连接按半回合成批走棋
+    round_trips = []
+    errors = [0]
+
+    async def play(client):
+        for ply in range(plies):
+            lines = []
+            for game_id in client.games:
+                moves = sequences[game_id % len(sequences)]
+                if ply < len(moves):
+                    lines.append('move %d %s' % (game_id, moves[ply]))
+            if not lines:
+                break
+            for fields, seconds in await client.request_all(lines):
+                if fields[0] == 'ok':
+                    round_trips.append(seconds)
+                else:
+                    errors[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(client) for client in clients))
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    gc.collect()
+    rss_growth = _rss_bytes() - rss_start
+
+    for client in clients:
+        client.writer.close()
+        await client.writer.wait_closed()
+    # 等服务器处理完断开，避免连接任务在事件循环结束时被取消
+    while server.connections:
+        await asyncio.sleep(0.01)
+    listener.close()
+    await listener.wait_closed()
+    return {
+        'games': game_count,
+        'moves': stats['moves'],
+        'errors': errors[0],
+        'pushes': sum(client.pushes for client in clients),
+        'seconds': elapsed,
+        'moves_per_second': stats['moves'] / elapsed if elapsed > 0 else 0.0,
+        'validate_p50_us': stats['p50_us'],
+        'validate_p99_us': stats['p99_us'],
+        'rtt_p50_ms': _percentile(round_trips, 0.5) * 1000,
+        'rtt_p99_ms': _percentile(round_trips, 0.99) * 1000,
+        'rss_growth_per_game': rss_growth / game_count,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="棋局服务器压力测试")
+    parser.add_argument("--games", type=int, nargs="+", default=[1000, 10000], help="同时进行的棋局数")
+    parser.add_argument("--connections", type=int, default=20, help="客户端连接数")
+    parser.add_argument("--plies", type=int, default=20, help="每盘棋走的半回合数")
+    parser.add_argument("--sequences", type=int, default=200, help="预先生成的不同走法序列数")
+    args = parser.parse_args(argv)
+
+    sequences = random_sequences(args.sequences, args.plies)
+    for game_count in args.games:
+        result = asyncio.run(run_load(game_count, args.connections, args.plies, sequences))
+        created, played = measure_game_memory(game_count, args.plies, sequences)
+        print("棋局 %6d  走棋 %7d  用时 %6.2fs  %7.0f 步/秒  校验 p50 %4dus p99 %5dus  "
+              "往返 p50 %6.1fms p99 %6.1fms  内存/局 创建 %5.1fKB 走完 %5.1fKB（RSS增量 %5.1fKB）  "
+              "推送 %d  错误 %d" % (
+                  result['games'], result['moves'], result['seconds'], result['moves_per_second'],
+                  result['validate_p50_us'], result['validate_p99_us'],
+                  result['rtt_p50_ms'], result['rtt_p99_ms'],
+                  created / 1024, played / 1024, result['rss_growth_per_game'] / 1024,
+                  result['pushes'], result['errors']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
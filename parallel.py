@@ -0,0 +1,236 @@
+"""多进程并行分析：根节点走法拆分
+
+CPython的GIL使单线程搜索只能用到一个核心。这里把根节点的每个合法走法
+作为独立任务分发到multiprocessing进程池，每个工作进程有自己的搜索器和
+置换表，对走后的局面做固定深度搜索，最后合并为一个最佳走法和主要变例。
+
+为了不让各进程都用全窗口搜索而浪费节点，采用“长子先行”：主进程先做
+浅层搜索排序根节点走法，第一个走法用全窗口搜索得到基准分值，其余走法
+并行做零窗口搜索，只有超过基准分值的走法才用全窗口重新搜索。
+
+局面以位棋盘字段的紧凑元组在进程间传递（见Position.__reduce__），
+不传递Piece对象。任务用apply_async提交，主进程等待结果时每隔POLL_INTERVAL秒
+检查一次停止请求、截止时间与节点上限，不必等到某个根节点走法搜索完成。
+
+用法：
+    python parallel.py --depth 4 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from bitboard import Position, STARTING_FEN, move_to_uci
+from engine import Searcher, SearchResult, SearchAborted, MATE_THRESHOLD, INFINITY, format_score
+from tt import TranspositionTable, DEFAULT_SIZE_MB
+
+POLL_INTERVAL = 0.01  # 等待工作进程时检查停止条件的间隔（秒）
+BENCHMARK_FEN = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+# 工作进程内的搜索器（由进程池初始化函数创建，在同一进程的任务之间复用）
+_worker_searcher = None
+
+
+def _init_worker(hash_mb):
+    global _worker_searcher
+    _worker_searcher = Searcher(TranspositionTable(hash_mb))
+
+
+def _search_move(task):
+    """工作进程任务：走出根节点走法后搜索depth - 1层（至少1层）
+
+    window为父节点视角的(alpha, beta)，None表示全窗口；nodes为节点上限，None表示不限。
+    """
+    position, move, depth, window, nodes = task
+    position.push(move)
+    child_window = None if window is None else (-window[1], -window[0])
+    result = _worker_searcher.search(position, depth=max(depth - 1, 1), nodes=nodes,
+                                     window=child_window)
+    return move, _parent_score(result.score), result.pv, result.nodes
+
+
+def _parent_score(score):
+    """子节点分值转换为父节点视角（杀棋距离增加一步）"""
+    if score >= MATE_THRESHOLD:
+        return -score + 1
+    if score <= -MATE_THRESHOLD:
+        return -score - 1
+    return -score
+
+
+# 并行搜索器
+class ParallelSearcher:
+    def __init__(self, workers=None, hash_mb=DEFAULT_SIZE_MB):
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_mb = hash_mb
+        self.pool = self._create_pool()
+        self.ordering_searcher = Searcher(TranspositionTable(hash_mb))
+        self.stop_requested = False
+        self.stop_event = None  # 调用方持有的threading.Event，见reset
+        self.deadline = None  # time.perf_counter()的截止时间，None表示不限时
+        self.node_limit = None  # 单次search的节点上限
+        self.nodes = 0
+
+    def _create_pool(self):
+        return multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                    initargs=(self.hash_mb,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """关闭进程池"""
+        self.pool.terminate()
+        self.pool.join()
+
+    def _restart_pool(self):
+        """结束仍在运行的任务，换成新的进程池（各工作进程的置换表随之清空）"""
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = self._create_pool()
+
+    def clear(self):
+        """清空主进程与全部工作进程的置换表，新对局开始时调用"""
+        self.ordering_searcher.tt.clear()
+        self._restart_pool()
+
+    def reset(self, deadline=None, stop_event=None):
+        """清除stop()的停止请求并设置截止时间，在一次限时分析开始前调用
+
+        stop_event为threading.Event时，它被设置后也会停止搜索；reset不会清除它，
+        因此在reset之前发出的停止请求不会丢失。
+        """
+        self.stop_requested = False
+        self.stop_event = stop_event
+        self.deadline = deadline
+
+    def stop(self):
+        """请求停止当前搜索（可以从其他线程调用），POLL_INTERVAL秒内生效"""
+        self.stop_requested = True
+        self.ordering_searcher.stop()
+
+    def _check_limits(self):
+        if self.stop_requested or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchAborted()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+
+    def search(self, position, depth, nodes=None):
+        """固定深度搜索，返回与Searcher.search相同结构的SearchResult
+
+        nodes为本次搜索的节点上限。收到停止请求、超过deadline或节点上限时抛出
+        SearchAborted，并重建进程池以结束仍在运行的任务。
+        """
+        self.node_limit = nodes
+        try:
+            return self._search(position, depth)
+        except SearchAborted:
+            self._restart_pool()
+            raise
+
+    def _gather(self, tasks):
+        """提交全部任务，按完成顺序产生结果；等待期间定时检查停止条件
+
+        有节点上限时每个任务带上提交时剩余的节点数，使工作进程中的搜索也在上限处停下，
+        各任务同时运行，总节点数最多超出上限约进程数倍。
+        """
+        remaining = None if self.node_limit is None else max(self.node_limit - self.nodes, 1)
+        pending = [self.pool.apply_async(_search_move, (task + (remaining,),)) for task in tasks]
+        while pending:
+            self._check_limits()
+            pending[0].wait(POLL_INTERVAL)
+            waiting = []
+            for async_result in pending:
+                if async_result.ready():
+                    result = async_result.get()
+                    self.nodes += result[3]
+                    yield result
+                else:
+                    waiting.append(async_result)
+            pending = waiting
+
+    def _search(self, position, depth):
+        start = time.perf_counter()
+        self.nodes = 0
+        moves = position.legal_moves()
+        if not moves or depth <= 1:
+            return self.ordering_searcher.search(position, depth=max(depth, 1))
+
+        # 浅层搜索确定根节点走法顺序
+        movetime = None if self.deadline is None else max(self.deadline - time.perf_counter(), 0.0)
+        ordering = self.ordering_searcher.search(position, depth=max(depth - 2, 1), movetime=movetime,
+                                                 nodes=self.node_limit, stop_event=self.stop_event)
+        self.nodes = ordering.nodes
+        self._check_limits()
+        ordered = [ordering.best_move] + [move for move in moves if move != ordering.best_move]
+
+        # 第一个走法全窗口搜索，得到基准分值
+        for move, score, pv, _ in self._gather([(position, ordered[0], depth, None)]):
+            best = (move, score, pv)
+            alpha = score
+
+        # 其余走法并行做零窗口搜索，找出可能更好的走法
+        tasks = [(position, move, depth, (alpha, alpha + 1)) for move in ordered[1:]]
+        fail_high = []
+        for move, score, pv, _ in self._gather(tasks):
+            if score > alpha:
+                fail_high.append(move)
+
+        # 超过基准分值的走法用全窗口重新搜索
+        tasks = [(position, move, depth, (alpha, INFINITY)) for move in fail_high]
+        for move, score, pv, _ in self._gather(tasks):
+            # 分值相同时取排序靠前的走法，使结果与任务完成顺序无关
+            if (score > best[1] or
+                    (score == best[1] and ordered.index(move) < ordered.index(best[0]))):
+                best = (move, score, pv)
+
+        elapsed = time.perf_counter() - start
+        move, score, pv = best
+        return SearchResult(move, score, depth, [move] + pv, self.nodes, elapsed,
+                            int(self.nodes / elapsed) if elapsed > 0 else 0, 0.0)
+
+
+def benchmark(fen, depth, worker_counts, hash_mb=DEFAULT_SIZE_MB):
+    """对不同进程数运行固定深度分析，返回[(进程数, 用时, 结果)]"""
+    position = Position.from_fen(fen)
+    results = []
+    for workers in worker_counts:
+        with ParallelSearcher(workers, hash_mb) as searcher:
+            start = time.perf_counter()
+            result = searcher.search(position, depth)
+            results.append((workers, time.perf_counter() - start, result))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程并行分析与加速比测试")
+    parser.add_argument("--fen", default=BENCHMARK_FEN, help="要分析的局面")
+    parser.add_argument("--depth", type=int, default=3, help="固定搜索深度")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="要测试的进程数")
+    parser.add_argument("--hash", type=float, default=DEFAULT_SIZE_MB,
+                        help="每个进程的置换表大小（MB）")
+    args = parser.parse_args(argv)
+    if args.fen == "startpos":
+        args.fen = STARTING_FEN
+
+    print("CPU核心数: %s（加速比相对于第一组进程数）" % os.cpu_count())
+    baseline = None
+    for workers, seconds, result in benchmark(args.fen, args.depth, args.workers, args.hash):
+        if baseline is None:
+            baseline = seconds
+        speedup = baseline / seconds if seconds > 0 else float("nan")
+        print("进程 %2d  用时 %7.2fs  加速比 %5.2f  节点 %9d  %-9s  pv %s" % (
+            workers, seconds, speedup, result.nodes, format_score(result.score),
+            " ".join(move_to_uci(move) for move in result.pv)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""走法生成性能测试（perft）与回归检查
+
+perft统计从给定局面出发走N步的叶子节点数，用来验证走法生成的正确性，
+同时测量速度。内置标准参考局面及其已知节点数。
+
+用法：
+    python perft.py                          # 运行全部参考局面
+    python perft.py --depth 4 --json out.json
+    python perft.py --fen "<FEN>" --depth 3 --divide
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from bitboard import Position, STARTING_FEN, move_to_uci
+
+# 参考局面：(名称, FEN, 深度1起的已知节点数)
+REFERENCE_POSITIONS = [
+    ("startpos", STARTING_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    # 吃过路兵与横线牵制
+    ("en-passant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    # 升变与易位
+    ("promotion", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("promotion-checks", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+DEFAULT_DEPTH = 3
+
+
+def perft(position, depth):
+    """统计走depth步后的叶子节点数（最后一层直接计数合法走法）"""
+    moves = position.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    push = position.push
+    pop = position.pop
+    for move in moves:
+        push(move)
+        nodes += perft(position, depth - 1)
+        pop()
+    return nodes
+
+
+def divide(position, depth):
+    """按根节点走法分别统计节点数，返回[(走法, 节点数)]"""
+    results = []
+    for move in position.legal_moves():
+        position.push(move)
+        results.append((move, perft(position, depth - 1)))
+        position.pop()
+    return results
+
+
+def run_position(name, fen, depth, expected=None):
+    """对单个局面运行perft，返回结果记录"""
+    position = Position.from_fen(fen)
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "fen": fen,
+        "depth": depth,
+        "nodes": nodes,
+        "expected": expected,
+        "ok": expected is None or nodes == expected,
+        "seconds": round(elapsed, 6),
+        "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+    }
+
+
+def run_suite(depth):
+    """对全部参考局面运行perft，深度超过已知数据时取已知的最大深度"""
+    results = []
+    for name, fen, counts in REFERENCE_POSITIONS:
+        d = min(depth, len(counts))
+        results.append(run_position(name, fen, d, counts[d - 1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="走法生成perft测试")
+    parser.add_argument("--fen", help="测试指定局面（默认运行全部参考局面）")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="搜索深度")
+    parser.add_argument("--divide", action="store_true", help="按根节点走法分别输出节点数")
+    parser.add_argument("--json", metavar="PATH", help="把结果以JSON格式写入文件")
+    args = parser.parse_args(argv)
+    if args.depth < 1:
+        parser.error("深度至少为1")
+
+    if args.fen and args.divide:
+        position = Position.from_fen(args.fen)
+        start = time.perf_counter()
+        counts = divide(position, args.depth)
+        elapsed = time.perf_counter() - start
+        for move, nodes in sorted(counts, key=lambda item: move_to_uci(item[0])):
+            print("%s: %d" % (move_to_uci(move), nodes))
+        total = sum(nodes for _, nodes in counts)
+        print("\n走法数: %d  节点数: %d  用时: %.3fs" % (len(counts), total, elapsed))
+        results = [{
+            "name": "custom",
+            "fen": args.fen,
+            "depth": args.depth,
+            "nodes": total,
+            "expected": None,
+            "ok": True,
+            "seconds": round(elapsed, 6),
+            "nps": int(total / elapsed) if elapsed > 0 else 0,
+            "divide": {move_to_uci(move): nodes for move, nodes in counts},
+        }]
+    else:
+        if args.fen:
+            results = [run_position("custom", args.fen, args.depth)]
+        else:
+            results = run_suite(args.depth)
+        for result in results:
+            status = "通过" if result["ok"] else "失败（期望 %d）" % result["expected"]
+            print("%-18s 深度 %d  节点 %12d  %8.3fs  %9d nps  %s" % (
+                result["name"], result["depth"], result["nodes"],
+                result["seconds"], result["nps"], status))
+        total_nodes = sum(result["nodes"] for result in results)
+        total_seconds = sum(result["seconds"] for result in results)
+        if total_seconds > 0:
+            print("合计: %d 节点, %.3fs, %d nps" % (
+                total_nodes, total_seconds, total_nodes / total_seconds))
+
+    if args.json:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""PGN棋谱的流式读取与回放
+
+read_games逐行读取PGN文件，每次产生一盘棋（标签与着法文本），不会把
+整个文件读入内存。replay_game把着法逐步解析为SAN并用规则引擎
+（GameState）回放，检查合法性并判定终局。格式错误或含非法着法的棋局
+会被跳过并给出诊断信息，不会中断整个处理过程。
+
+用法：
+    python pgn.py games.pgn --workers 4 --output records.jsonl
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import re
+import sys
+import time
+
+from bitboard import (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                      PIECE_LETTERS, square_name, parse_square)
+from chess_core import GameState
+
+SAN_PIECES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+RESULT_TOKENS = ('1-0', '0-1', '1/2-1/2', '*')
+DEFAULT_CHUNK_SIZE = 100
+
+_SAN_PATTERN = re.compile(
+    r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQnbrq]))?$')
+_TAG_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+
+
+class PGNError(ValueError):
+    """着法文本无法解析或含有非法着法"""
+
+
+def parse_san(position, san):
+    """把SAN着法解析为position中的合法走法(from, to, promotion)"""
+    text = san.rstrip('+#!?')
+    moves = position.legal_moves()
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        king_sq = position.king_square(position.turn)
+        offset = 2 if text in ('O-O', '0-0') else -2
+        for move in moves:
+            if move[0] == king_sq and move[1] == king_sq + offset and \
+                    position.piece_type_at(king_sq, position.turn) == KING:
+                return move
+        raise PGNError("非法的易位: %s" % san)
+
+    match = _SAN_PATTERN.match(text)
+    if match is None:
+        raise PGNError("无法解析的着法: %s" % san)
+    piece_letter, from_file, from_rank, _, target, promotion_letter = match.groups()
+    piece_type = SAN_PIECES[piece_letter] if piece_letter else PAWN
+    to_sq = parse_square(target)
+    promotion = SAN_PIECES[promotion_letter.upper()] if promotion_letter else None
+    from_col = 'abcdefgh'.index(from_file) if from_file else None
+    from_row = 8 - int(from_rank) if from_rank else None
+
+    candidates = []
+    for move in moves:
+        from_sq, move_to, move_promotion = move
+        if move_to != to_sq or move_promotion != promotion:
+            continue
+        if from_col is not None and from_sq & 7 != from_col:
+            continue
+        if from_row is not None and from_sq >> 3 != from_row:
+            continue
+        if position.piece_type_at(from_sq, position.turn) != piece_type:
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise PGNError("%s的着法: %s" % ("非法" if not candidates else "有歧义", san))
+    return candidates[0]
+
+
+def move_to_san(position, move):
+    """把走法转换为SAN（含将军与将杀标记），position在返回时保持不变"""
+    from_sq, to_sq, promotion = move
+    us = position.turn
+    piece_type = position.piece_type_at(from_sq, us)
+    if piece_type == KING and abs(to_sq - from_sq) == 2:
+        san = 'O-O' if to_sq > from_sq else 'O-O-O'
+    else:
+        capture = bool(position.occupancy[us ^ 1] & (1 << to_sq)) or \
+            (piece_type == PAWN and to_sq == position.ep_square)
+        if piece_type == PAWN:
+            san = square_name(from_sq)[0] + 'x' if capture else ''
+        else:
+            san = PIECE_LETTERS[piece_type].upper()
+            # 同类棋子可以走到同一格时加上起点的列或行
+            rivals = [other[0] for other in position.legal_moves()
+                      if other[1] == to_sq and other[0] != from_sq and
+                      position.piece_type_at(other[0], us) == piece_type]
+            if rivals:
+                if all(other & 7 != from_sq & 7 for other in rivals):
+                    san += square_name(from_sq)[0]
+                elif all(other >> 3 != from_sq >> 3 for other in rivals):
+                    san += square_name(from_sq)[1]
+                else:
+                    san += square_name(from_sq)
+            if capture:
+                san += 'x'
+        san += square_name(to_sq)
+        if promotion is not None:
+            san += '=' + PIECE_LETTERS[promotion].upper()
+
+    position.push(move)
+    if position.is_in_check():
+        san += '#' if not position.legal_moves() else '+'
+    position.pop()
+    return san
+
+
+def read_games(lines):
+    """从逐行输入中依次产生棋局(标签字典, 着法文本)
+
+    着法文本保留换行，使分号开始的行尾注释只作用到本行末尾。
+    """
+    headers = {}
+    movetext = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('%'):
+            continue
+        if line.startswith('['):
+            if movetext:
+                yield headers, '\n'.join(movetext)
+                headers = {}
+                movetext = []
+            match = _TAG_PATTERN.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+            continue
+        movetext.append(line)
+    if movetext or headers:
+        yield headers, '\n'.join(movetext)
+
+
+def tokenize_movetext(movetext):
+    """去掉注释、变着、NAG和回合号，返回(SAN着法列表, 结果标记)"""
+    tokens = []
+    result = None
+    depth = 0
+    # 把括号和注释拆成独立的记号
+    text = re.sub(r'\{[^}]*\}', ' ', movetext)
+    text = re.sub(r';[^\n]*', ' ', text)
+    text = text.replace('(', ' ( ').replace(')', ' ) ')
+    for token in text.split():
+        if token == '(':
+            depth += 1
+            continue
+        if token == ')':
+            depth -= 1
+            if depth < 0:
+                raise PGNError("变着括号不匹配")
+            continue
+        if depth or token.startswith('$'):
+            continue
+        if token in RESULT_TOKENS:
+            result = token
+            continue
+        token = _MOVE_NUMBER.sub('', token)
+        if token:
+            tokens.append(token)
+    if depth:
+        raise PGNError("变着括号不匹配")
+    return tokens, result
+
+
+def replay_game(headers, movetext, index=0):
+    """用规则引擎回放一盘棋，返回记录字典；出错时记录中含有error字段"""
+    record = {
+        "index": index,
+        "white": headers.get("White", "?"),
+        "black": headers.get("Black", "?"),
+        "result": headers.get("Result", "*"),
+    }
+    game = GameState()
+    fen = headers.get("FEN")
+    ply = 0
+    try:
+        if fen:
+            game.load_fen(fen)
+        sans, result_token = tokenize_movetext(movetext)
+        for ply, san in enumerate(sans, 1):
+            if game.game_over:
+                raise PGNError("棋局已结束后仍有着法: %s" % san)
+            game.push(parse_san(game.current_position(), san))
+    except ValueError as error:
+        record["error"] = "第%d个半回合: %s" % (ply, error) if ply else str(error)
+        return record
+
+    record["plies"] = len(sans)
+    record["final_fen"] = game.to_fen()
+    if game.game_over:
+        record["termination"] = "checkmate" if game.winner is not None else "stalemate"
+        record["winner"] = None if game.winner is None else game.winner.name.lower()
+    else:
+        record["termination"] = None
+    if result_token and result_token != record["result"]:
+        record["result_mismatch"] = result_token
+    return record
+
+
+def _replay_chunk(chunk):
+    """工作进程任务：回放一批棋局"""
+    return [replay_game(headers, movetext, index) for index, headers, movetext in chunk]
+
+
+def _chunks(games, chunk_size):
+    chunk = []
+    for index, (headers, movetext) in enumerate(games):
+        chunk.append((index, headers, movetext))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay_stream(lines, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """回放输入中的所有棋局，按顺序产生记录
+
+    workers大于1时按批分发到进程池；同时在途的批次数有上限，
+    因此内存占用与文件大小无关。
+    """
+    games = read_games(lines)
+    if workers <= 1:
+        for chunk in _chunks(games, chunk_size):
+            yield from _replay_chunk(chunk)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in _chunks(games, chunk_size):
+            pending.append(pool.apply_async(_replay_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PGN棋谱流式回放")
+    parser.add_argument("path", help="PGN文件路径，'-'表示标准输入")
+    parser.add_argument("--workers", type=int, default=1, help="工作进程数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="每批分发的棋局数")
+    parser.add_argument("--output", help="把每盘棋的记录以JSON行写入文件")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8',
+                                                     errors='replace')
+    output = open(args.output, 'w') if args.output else None
+    start = time.perf_counter()
+    games = 0
+    skipped = 0
+    try:
+        for record in replay_stream(source, args.workers, args.chunk_size):
+            games += 1
+            if "error" in record:
+                skipped += 1
+                print("跳过第%d盘（%s - %s）: %s" % (
+                    record["index"] + 1, record["white"], record["black"], record["error"]),
+                    file=sys.stderr)
+            if output is not None:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print("棋局 %d  跳过 %d  用时 %.2fs  %.1f 盘/秒" % (
+        games, skipped, elapsed, games / elapsed if elapsed > 0 else 0.0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
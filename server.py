@@ -0,0 +1,306 @@
+"""多棋局服务器（asyncio，TCP文本行协议）
+
+一个进程内保存任意多盘无界面棋局（GameState），客户端每行发送一条命令，
+字段以空格分隔：
+    new                     创建棋局          -> game <id>
+    join <id>               订阅棋局          -> state <id> <结果> <FEN>
+    leave <id>              取消订阅          -> ok <id>
+    move <id> <uci>         走棋（如e2e4、e7e8q） -> ok <id> <uci> 或 error <id> <原因>
+    state <id>              查询局面          -> state <id> <结果> <FEN>
+    stats                   服务器统计        -> stats key=value ...
+    quit                    断开连接
+走棋成功后向该棋局的全部订阅者推送state行，棋局结束时再推送
+    end <id> <结果> <checkmate|stalemate>
+结果为1-0、0-1、1/2-1/2，进行中为*。
+
+已结束且没有订阅者的棋局从内存中移除，只在有上限的归档中保留结果和最终FEN
+（state与join仍可查询，move返回game over）；超出归档上限的最早棋局被丢弃。
+
+每个连接有一个有上限的发送队列，由单独的写任务写出。积压超过一半时暂停读取
+该连接的后续命令，等写任务取走后再继续；推送只向队列放入消息，不等待网络，
+队列满（客户端读得太慢）时断开该连接，不会拖慢其他客户端。
+
+用法：
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from bitboard import Move, PAWN
+from chess_core import GameState, PieceColor
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+SEND_QUEUE_SIZE = 256  # 每个连接最多积压的消息数
+LATENCY_SAMPLES = 100000  # 保留最近多少次走棋的校验耗时
+ARCHIVE_SIZE = 10000  # 保留最近多少盘已移除棋局的结果
+
+
+def game_result(game):
+    """棋局结果字符串"""
+    if not game.game_over:
+        return '*'
+    if game.winner is None:
+        return '1/2-1/2'
+    return '1-0' if game.winner == PieceColor.WHITE else '0-1'
+
+
+# 客户端连接
+class _Connection:
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.queue = asyncio.Queue(SEND_QUEUE_SIZE)
+        self.games = set()  # 订阅的棋局
+        self.closed = False
+        self.flushed = asyncio.Event()  # 写任务取空队列时置位
+        self.task = asyncio.create_task(self._write_loop())
+
+    async def reply(self, line):
+        """命令回复：放入发送队列，积压超过一半时等写任务取走后再返回"""
+        self.send(line)
+        if self.queue.qsize() >= SEND_QUEUE_SIZE // 2 and not self.closed:
+            self.flushed.clear()
+            await self.flushed.wait()
+
+    def send(self, line):
+        """推送：放入发送队列，不等待；队列已满时断开连接"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.server.slow_disconnects += 1
+            self.close()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                line = await self.queue.get()
+                self.writer.write(line.encode() + b'\n')
+                # 一次写出队列中已有的全部消息，再等待缓冲区排空
+                while not self.queue.empty():
+                    self.writer.write(self.queue.get_nowait().encode() + b'\n')
+                self.flushed.set()
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.flushed.set()
+        self.server.unsubscribe_all(self)
+        self.task.cancel()
+        self.writer.close()
+
+
+# 棋局服务器
+class GameServer:
+    def __init__(self):
+        self.games = {}
+        self.subscribers = defaultdict(set)
+        self.archive = OrderedDict()  # 已移除的棋局：id -> (结果, 最终FEN)
+        self.retired = 0
+        self._ids = itertools.count(1)
+        self.connections = 0
+        self.moves = 0
+        self.rejected = 0
+        self.slow_disconnects = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # 走棋校验耗时（秒）
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """开始监听，返回asyncio.Server"""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        connection = _Connection(self, writer)
+        self.connections += 1
+        try:
+            while not connection.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = self.handle_line(connection, line.decode(errors='replace').split())
+                if reply is None:
+                    break
+                await connection.reply(reply)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            connection.close()
+
+    def handle_line(self, connection, fields):
+        """执行一条命令，返回回复行；quit返回None"""
+        if not fields:
+            return 'error - empty command'
+        command, args = fields[0], fields[1:]
+        if command == 'quit':
+            return None
+        if command == 'new':
+            return 'game %d' % self.new_game()
+        if command == 'stats':
+            return 'stats ' + ' '.join('%s=%s' % item for item in self.stats().items())
+        if command not in ('join', 'leave', 'move', 'state') or not args:
+            return 'error - unknown command'
+
+        try:
+            game_id = int(args[0])
+        except ValueError:
+            return 'error - bad game id'
+        if game_id not in self.games:
+            if game_id not in self.archive:
+                return 'error %d no such game' % game_id
+            # 已结束并移除的棋局不再有推送，只能查询结果
+            if command in ('join', 'state'):
+                return self.state_line(game_id)
+            if command == 'leave':
+                return 'ok %d' % game_id
+            return 'error %d game over' % game_id
+        if command == 'join':
+            self.subscribers[game_id].add(connection)
+            connection.games.add(game_id)
+            return self.state_line(game_id)
+        if command == 'leave':
+            self.subscribers[game_id].discard(connection)
+            connection.games.discard(game_id)
+            self._retire_if_done(game_id)
+            return 'ok %d' % game_id
+        if command == 'state':
+            return self.state_line(game_id)
+        if len(args) != 2:
+            return 'error %d usage: move <id> <uci>' % game_id
+        error = self.apply_move(game_id, args[1])
+        if error is not None:
+            return 'error %d %s' % (game_id, error)
+        return 'ok %d %s' % (game_id, args[1])
+
+    def new_game(self):
+        game_id = next(self._ids)
+        self.games[game_id] = GameState()
+        return game_id
+
+    def state_line(self, game_id):
+        game = self.games.get(game_id)
+        if game is None:
+            result, fen = self.archive[game_id]
+            return 'state %d %s %s' % (game_id, result, fen)
+        return 'state %d %s %s' % (game_id, game_result(game), game.to_fen())
+
+    def apply_move(self, game_id, text):
+        """按规则校验并走棋，成功返回None并推送给订阅者，否则返回错误原因"""
+        start = time.perf_counter()
+        game = self.games[game_id]
+        error = None
+        if game.game_over:
+            error = 'game over'
+        else:
+            try:
+                move = Move.from_uci(text)
+            except ValueError:
+                error = 'bad move'
+            else:
+                error = self._check_legal(game, move)
+        if error is None:
+            game.push(move)
+            self.moves += 1
+        else:
+            self.rejected += 1
+        self.latencies.append(time.perf_counter() - start)
+        if error is not None:
+            return error
+
+        subscribers = self.subscribers.get(game_id)
+        if subscribers:
+            state = self.state_line(game_id)
+            end = None
+            if game.game_over:
+                end = 'end %d %s %s' % (game_id, game_result(game),
+                                        'checkmate' if game.winner is not None else 'stalemate')
+            for connection in list(subscribers):
+                connection.send(state)
+                if end is not None:
+                    connection.send(end)
+        self._retire_if_done(game_id)
+        return None
+
+    def _check_legal(self, game, move):
+        """用合法走法缓存校验走法，兵到达底线时必须且只能带升变"""
+        from_square, to_square, promotion = move
+        if not game.legal_move_table().get(from_square, 0) >> to_square & 1:
+            return 'illegal move'
+        position = game.current_position()
+        promoting = (position.piece_type_at(from_square, position.turn) == PAWN and
+                     (to_square < 8 or to_square >= 56))
+        if promoting != (promotion is not None):
+            return 'illegal move'
+        return None
+
+    def unsubscribe_all(self, connection):
+        games = list(connection.games)
+        connection.games.clear()
+        for game_id in games:
+            self.subscribers[game_id].discard(connection)
+            self._retire_if_done(game_id)
+
+    def _retire_if_done(self, game_id):
+        """棋局已结束且没有订阅者时移出内存，结果放入有上限的归档"""
+        game = self.games.get(game_id)
+        if game is None or not game.game_over or self.subscribers.get(game_id):
+            return
+        del self.games[game_id]
+        self.subscribers.pop(game_id, None)
+        self.archive[game_id] = (game_result(game), game.to_fen())
+        if len(self.archive) > ARCHIVE_SIZE:
+            self.archive.popitem(last=False)
+        self.retired += 1
+
+    def latency_percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def stats(self):
+        return {
+            'games': len(self.games),
+            'retired': self.retired,
+            'connections': self.connections,
+            'moves': self.moves,
+            'rejected': self.rejected,
+            'slow_disconnects': self.slow_disconnects,
+            'p50_us': int(self.latency_percentile(0.5) * 1e6),
+            'p99_us': int(self.latency_percentile(0.99) * 1e6),
+        }
+
+
+async def serve(host, port):
+    server = GameServer()
+    listener = await server.start(host, port)
+    print("棋局服务器监听 %s:%d" % (host, port))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="asyncio多棋局服务器")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,551 @@
+"""残局库：逆向分析生成的胜/和/负与距杀步数表
+
+子力组合用字母表示，白方在前、黑方在后，各自以K开头，例如KQK、KRK、KPK、
+KRKP。生成时先递归生成吃子或升变后可能到达的全部子组合，再对本组合
+逆向分析：
+    1. 扫描全部局面，用Position.legal_moves（项目自己的走法规则）统计每个
+       局面的合法走法数，记下被将杀/逼和的局面；吃子和升变走法直接查询
+       已生成的子组合表。这一步按块分发到多个进程，每块的结果写入检查点
+       文件，中断后重新运行会跳过已完成的块。
+    2. 从被将杀的局面开始按半回合数逐层反推前驱局面：能走到“对方必败”的
+       局面为胜，所有走法都走到“对方必胜”的局面为负，最后仍未确定的为和。
+
+表文件为16字节文件头加上每个局面一个有符号字节，局面下标为
+    行棋方 * 64^n + 各棋子格子编号组成的64进制数，
+同类棋子按格子编号升序排列。字节值：0为和；正数d为行棋方d个半回合后将杀
+对方；-(d+1)为行棋方d个半回合后被将杀（-1即已被将杀）；-128为不合法局面。
+表未做对称压缩，三子表512KB，四子表32MB；生成时每个局面另需约4个字节的
+扫描数据，五子表需要十GB以上内存，因此最多支持四子。
+
+生成时假定没有易位权利和吃过路兵的机会，查询带有这两种权利的局面时返回None。
+双方都有兵时，兵走两格后对方可能吃过路兵，而后继局面在表中不含过路兵格，
+结果会出错，因此不能生成这类子力组合（如KPKP）；只有一方有兵时不会出现
+吃过路兵。
+
+查询时表文件以只读方式mmap，一次查询只读一个字节。
+
+用法：
+    python tablebase.py generate KQK KRK KPK --workers 4
+    python tablebase.py probe --fen "8/8/8/8/8/2k5/8/2KQ4 w - - 0 1"
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+from bitboard import (Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                      KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, bishop_attacks,
+                      rook_attacks, queen_attacks, iter_squares)
+
+MAGIC = b'CTB1'
+HEADER_BYTES = 16
+MAX_PIECES = 4  # 表和扫描数据都按64^n分配，五子表需要十GB以上内存
+MAX_DTM = 126
+CHUNK_SIZE = 1 << 16
+DEFAULT_DIRECTORY = 'tablebases'
+FILE_SUFFIX = '.tb'
+
+PIECE_ORDER = 'KQRBNP'
+LETTER_TYPES = {'K': KING, 'Q': QUEEN, 'R': ROOK, 'B': BISHOP, 'N': KNIGHT, 'P': PAWN}
+_LETTER_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+
+# 扫描阶段的局面状态
+_STATUS_INVALID = 0
+_STATUS_NORMAL = 1
+_STATUS_MATED = 2
+_STATUS_STALEMATE = 3
+
+
+def _sort_side(side):
+    return ''.join(sorted(side, key=PIECE_ORDER.index))
+
+
+def _side_strength(side):
+    return (sum(_LETTER_VALUES[letter] for letter in side),
+            tuple(-PIECE_ORDER.index(letter) for letter in side))
+
+
+def split_material(name):
+    """把子力组合名拆成(白方, 黑方)，格式错误时抛出ValueError"""
+    name = name.upper()
+    second_king = name.find('K', 1)
+    if not name.startswith('K') or second_king < 0 or 'K' in name[second_king + 1:]:
+        raise ValueError("子力组合应为两个以K开头的部分，如KRKP: %r" % name)
+    white, black = name[:second_king], name[second_king:]
+    if any(letter not in LETTER_TYPES for letter in name):
+        raise ValueError("未知的棋子字母: %r" % name)
+    if len(name) > MAX_PIECES:
+        raise ValueError("最多支持%d个棋子: %r" % (MAX_PIECES, name))
+    return _sort_side(white), _sort_side(black)
+
+
+def canonical_material(white, black):
+    """返回(规范名, 是否交换颜色)：较强的一方作为白方"""
+    white, black = _sort_side(white), _sort_side(black)
+    if _side_strength(black) > _side_strength(white):
+        return black + white, True
+    return white + black, False
+
+
+def required_materials(name):
+    """一步吃子或升变后可能到达的子力组合（规范名）"""
+    white, black = split_material(name)
+    results = set()
+    sides = [white, black]
+    for mover in (0, 1):
+        own, other = sides[mover], sides[mover ^ 1]
+        # 吃子之后对方少一个棋子
+        captures = [other] + [other.replace(letter, '', 1) for letter in set(other[1:])]
+        if 'P' in own:
+            for promoted in 'QRBN':
+                new_own = own.replace('P', promoted, 1)
+                for new_other in captures:
+                    pair = (new_own, new_other) if mover == 0 else (new_other, new_own)
+                    results.add(canonical_material(*pair)[0])
+        for new_other in captures[1:]:
+            pair = (own, new_other) if mover == 0 else (new_other, own)
+            results.add(canonical_material(*pair)[0])
+    results.discard(canonical_material(white, black)[0])
+    return results
+
+
+# 子力组合的下标布局
+class _Layout:
+    def __init__(self, name):
+        white, black = split_material(name)
+        self.name = white + black
+        self.pieces = ([(WHITE, LETTER_TYPES[letter]) for letter in white] +
+                       [(BLACK, LETTER_TYPES[letter]) for letter in black])
+        self.count = len(self.pieces)
+        self.per_turn = 64 ** self.count
+        self.size = 2 * self.per_turn
+        # 同类棋子的下标区间，用于规范化排列顺序
+        self.groups = []
+        start = 0
+        for end in range(1, self.count + 1):
+            if end == self.count or self.pieces[end] != self.pieces[start]:
+                self.groups.append((start, end))
+                start = end
+        self.duplicate_groups = [(start, end) for start, end in self.groups if end - start > 1]
+
+    def index(self, turn, squares):
+        index = turn
+        for sq in squares:
+            index = index * 64 + sq
+        return index
+
+    def decode(self, index):
+        squares = [0] * self.count
+        for slot in range(self.count - 1, -1, -1):
+            index, squares[slot] = divmod(index, 64)
+        return index, squares
+
+    def canonicalize(self, squares):
+        for start, end in self.duplicate_groups:
+            squares[start:end] = sorted(squares[start:end])
+        return squares
+
+    def position(self, turn, squares):
+        """由下标对应的格子构建局面，不合法时返回None"""
+        if len(set(squares)) != self.count:
+            return None
+        for start, end in self.duplicate_groups:
+            if squares[start:end] != sorted(squares[start:end]):
+                return None
+        position = Position()
+        for (color, piece_type), sq in zip(self.pieces, squares):
+            if piece_type == PAWN and (sq < 8 or sq >= 56):
+                return None
+            position.put_piece(sq, color, piece_type)
+        position.turn = turn
+        position.key = position.compute_key()
+        if position.is_in_check(turn ^ 1):
+            return None
+        return position
+
+    def predecessors(self, index):
+        """前驱局面的下标：对方把一个棋子沿不吃子、不升变的走法退回一步"""
+        turn, squares = self.decode(index)
+        mover = turn ^ 1
+        occupied = 0
+        for sq in squares:
+            occupied |= 1 << sq
+        empty = ~occupied
+        result = []
+        for slot, (color, piece_type) in enumerate(self.pieces):
+            if color != mover:
+                continue
+            sq = squares[slot]
+            if piece_type == PAWN:
+                back = 8 if color == WHITE else -8
+                origins = []
+                previous = sq + back
+                if 8 <= previous < 56 and empty >> previous & 1:
+                    origins.append(previous)
+                    start_row = 6 if color == WHITE else 1
+                    if (previous + back) >> 3 == start_row and empty >> (previous + back) & 1:
+                        origins.append(previous + back)
+            else:
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[sq]
+                elif piece_type == KING:
+                    targets = KING_ATTACKS[sq]
+                elif piece_type == BISHOP:
+                    targets = bishop_attacks(sq, occupied)
+                elif piece_type == ROOK:
+                    targets = rook_attacks(sq, occupied)
+                else:
+                    targets = queen_attacks(sq, occupied)
+                origins = iter_squares(targets & empty)
+            for origin in origins:
+                moved = squares[:]
+                moved[slot] = origin
+                result.append(self.index(mover, self.canonicalize(moved)))
+        return result
+
+
+def _decode_value(byte):
+    """表中字节转为(wdl, dtm)，不合法局面返回None"""
+    if byte == 0:
+        return 0, 0
+    if byte < 128:
+        return 1, byte
+    if byte == 128:
+        return None
+    return -1, 255 - byte
+
+
+# 残局库查询
+class Tablebase:
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self._tables = {}
+        self._layouts = {}
+        self._plans = {}
+        names = self.available()
+        self.max_pieces = max((len(name) for name in names), default=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __reduce__(self):
+        return (Tablebase, (self.directory,))
+
+    def available(self):
+        """目录中已生成的子力组合"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(FILE_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.endswith(FILE_SUFFIX))
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table[0].close()
+                table[1].close()
+        self._tables.clear()
+        self._plans.clear()
+
+    def _table(self, name):
+        table = self._tables.get(name, False)
+        if table is False:
+            path = os.path.join(self.directory, name + FILE_SUFFIX)
+            if os.path.exists(path):
+                handle = open(path, 'rb')
+                data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                if data[:4] != MAGIC or data[4:12].rstrip(b'\0').decode() != name:
+                    data.close()
+                    handle.close()
+                    raise ValueError("残局库文件头错误: %s" % path)
+                table = (data, handle)
+                self._layouts[name] = _Layout(name)
+            else:
+                table = None
+            self._tables[name] = table
+        return table
+
+    def probe(self, position):
+        """查询局面，返回行棋方视角的(wdl, dtm)：wdl为1胜/0和/-1负，dtm为距杀半回合数
+
+        表中没有该子力组合、有易位权利或可以吃过路兵时返回None。
+        """
+        if position.castling:
+            return None
+        ep_square = position.ep_square
+        if ep_square is not None and \
+                PAWN_ATTACKS[position.turn ^ 1][ep_square] & position.bitboards[position.turn * 6 + PAWN]:
+            return None
+        bitboards = position.bitboards
+        counts = tuple([bin(bitboard).count('1') for bitboard in bitboards])
+        plan = self._plans.get(counts, False)
+        if plan is False:
+            plan = self._plans[counts] = self._plan(counts)
+        if plan is None:
+            return None
+
+        data, sources, mirror = plan
+        index = position.turn ^ (mirror and 1)
+        for bitboard_index, several in sources:
+            bitboard = bitboards[bitboard_index]
+            if several:
+                for sq in sorted(sq ^ mirror for sq in iter_squares(bitboard)):
+                    index = index * 64 + sq
+            else:
+                index = index * 64 + ((bitboard.bit_length() - 1) ^ mirror)
+        return _decode_value(data[HEADER_BYTES + index])
+
+    def _plan(self, counts):
+        """按各类棋子数量确定查询方式：(表数据, [(位棋盘下标, 是否多个同类棋子)], 镜像掩码)"""
+        if sum(counts) > self.max_pieces:
+            return None
+        white = ''.join(letter * counts[LETTER_TYPES[letter]] for letter in PIECE_ORDER)
+        black = ''.join(letter * counts[6 + LETTER_TYPES[letter]] for letter in PIECE_ORDER)
+        if not white.startswith('K') or not black.startswith('K'):
+            return None
+        name, flipped = canonical_material(white, black)
+        table = self._table(name)
+        if table is None:
+            return None
+        layout = self._layouts[name]
+        # 交换颜色时读取对方的位棋盘，并把格子上下翻转
+        sources = [((layout.pieces[start][0] ^ flipped) * 6 + layout.pieces[start][1], end - start > 1)
+                   for start, end in layout.groups]
+        return table[0], sources, 56 if flipped else 0
+
+    def probe_wdl(self, position):
+        """只返回胜/和/负（1/0/-1），不在表中时返回None"""
+        result = self.probe(position)
+        return None if result is None else result[0]
+
+
+# 扫描阶段工作进程使用的残局库（查询子组合）
+_worker_tablebase = None
+
+
+def _init_worker(directory):
+    global _worker_tablebase
+    _worker_tablebase = Tablebase(directory)
+
+
+def _scan_chunk(task):
+    """扫描[start, stop)内的局面：状态、合法走法数，以及吃子/升变走法的结果
+
+    返回(start, 状态, 走法数, 胜事件, 减计数事件)。事件为(下标, 层数)的扁平数组：
+    胜事件表示该局面在这一层确定为胜，减计数事件表示处理这一层时该局面
+    剩余走法数减一。
+    """
+    name, start, stop = task
+    layout = _Layout(name)
+    status = bytearray(stop - start)
+    counts = bytearray(stop - start)
+    win_events = array('q')
+    decrement_events = array('q')
+    for index in range(start, stop):
+        turn, squares = layout.decode(index)
+        position = layout.position(turn, squares)
+        if position is None:
+            continue
+        moves = position.legal_moves()
+        offset = index - start
+        if not moves:
+            status[offset] = _STATUS_MATED if position.is_in_check() else _STATUS_STALEMATE
+            continue
+        status[offset] = _STATUS_NORMAL
+        counts[offset] = len(moves)
+        enemy = position.occupancy[turn ^ 1]
+        for move in moves:
+            if move[2] is None and not enemy >> move[1] & 1:
+                continue
+            position.push(move)
+            result = _worker_tablebase.probe(position)
+            position.pop()
+            if result is None:
+                raise RuntimeError("缺少子力组合表: %s" % position.fen())
+            wdl, dtm = result
+            if wdl < 0:
+                win_events.extend((index, dtm + 1))
+            elif wdl > 0:
+                decrement_events.extend((index, dtm))
+    return start, bytes(status), bytes(counts), win_events, decrement_events
+
+
+def _scan(name, directory, workers, log):
+    """执行扫描阶段，已完成的块从检查点读取"""
+    layout = _Layout(name)
+    checkpoint_dir = os.path.join(directory, name + '.part')
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    chunks = {}
+    tasks = []
+    for start in range(0, layout.size, CHUNK_SIZE):
+        path = os.path.join(checkpoint_dir, '%012d.pkl' % start)
+        if os.path.exists(path):
+            with open(path, 'rb') as handle:
+                chunks[start] = pickle.load(handle)
+        else:
+            tasks.append((name, start, min(start + CHUNK_SIZE, layout.size)))
+    if chunks:
+        log("%s: 从检查点恢复 %d 块" % (name, len(chunks)))
+
+    def save(result):
+        path = os.path.join(checkpoint_dir, '%012d.pkl' % result[0])
+        with open(path + '.tmp', 'wb') as handle:
+            pickle.dump(result, handle, pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        chunks[result[0]] = result
+        log("%s: 扫描 %d/%d 块" % (name, len(chunks), total))
+
+    total = len(chunks) + len(tasks)
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(directory,)) as pool:
+            for result in pool.imap_unordered(_scan_chunk, tasks):
+                save(result)
+    else:
+        _init_worker(directory)
+        for task in tasks:
+            save(_scan_chunk(task))
+    return [chunks[start] for start in sorted(chunks)], checkpoint_dir
+
+
+def _propagate(layout, chunks):
+    """逐层逆向分析，返回表数据（每个局面一个字节）"""
+    size = layout.size
+    status = b''.join(chunk[1] for chunk in chunks)
+    remaining = bytearray(b''.join(chunk[2] for chunk in chunks))
+    # 不合法局面记为-128，被将杀记为-1，其余先记为和
+    values = bytearray(status.translate(bytes([128, 0, 255, 0]) + bytes(252)))
+    resolved = bytearray(status.translate(bytes([1, 0, 1, 1]) + bytes(252)))
+
+    levels = defaultdict(list)
+    wins_at = defaultdict(list)
+    decrements_at = defaultdict(list)
+    index = status.find(_STATUS_MATED)
+    while index >= 0:
+        levels[0].append(index)
+        index = status.find(_STATUS_MATED, index + 1)
+    for chunk in chunks:
+        for events, target in ((chunk[3], wins_at), (chunk[4], decrements_at)):
+            for offset in range(0, len(events), 2):
+                target[events[offset + 1]].append(events[offset])
+
+    predecessors = layout.predecessors
+    level = 0
+    while levels or wins_at or decrements_at:
+        if level > MAX_DTM:
+            raise OverflowError("%s: 距杀步数超过%d个半回合" % (layout.name, MAX_DTM))
+        if level % 2 == 0:
+            # 本层的负局面：能走到这里的前驱局面在下一层为胜
+            for index in levels.pop(level, ()):
+                for previous in predecessors(index):
+                    if not resolved[previous]:
+                        resolved[previous] = 1
+                        values[previous] = level + 1
+                        levels[level + 1].append(previous)
+        else:
+            current = levels.pop(level, [])
+            for index in wins_at.pop(level, ()):
+                if not resolved[index]:
+                    resolved[index] = 1
+                    values[index] = level
+                    current.append(index)
+            # 本层的胜局面：前驱局面的剩余走法数减一，减到0时在下一层为负
+            children = [predecessors(index) for index in current]
+            children.append(decrements_at.pop(level, ()))
+            for group in children:
+                for previous in group:
+                    if not resolved[previous]:
+                        remaining[previous] -= 1
+                        if not remaining[previous]:
+                            resolved[previous] = 1
+                            values[previous] = 255 - (level + 1)  # 即有符号字节-(level + 2)
+                            levels[level + 1].append(previous)
+        level += 1
+    return values
+
+
+def generate(name, directory=DEFAULT_DIRECTORY, workers=1, log=print):
+    """生成子力组合表（先递归生成依赖的子组合），已存在的表直接跳过，返回文件路径
+
+    子力组合超过MAX_PIECES个棋子或双方都有兵（生成时不处理吃过路兵）时抛出ValueError。
+    """
+    white, black = split_material(name)
+    if 'P' in white and 'P' in black:
+        raise ValueError("不支持双方都有兵的子力组合（生成时不处理吃过路兵）: %r" % name)
+    name = canonical_material(white, black)[0]
+    path = os.path.join(directory, name + FILE_SUFFIX)
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    for required in sorted(required_materials(name), key=len):
+        generate(required, directory, workers, log)
+
+    start = time.perf_counter()
+    layout = _Layout(name)
+    chunks, checkpoint_dir = _scan(name, directory, workers, log)
+    values = _propagate(layout, chunks)
+
+    header = MAGIC + name.encode().ljust(8, b'\0') + bytes([layout.count]) + bytes(3)
+    with open(path + '.tmp', 'wb') as handle:
+        handle.write(header)
+        handle.write(values)
+    os.replace(path + '.tmp', path)
+    for chunk_name in os.listdir(checkpoint_dir):
+        os.remove(os.path.join(checkpoint_dir, chunk_name))
+    os.rmdir(checkpoint_dir)
+    log("%s: 完成，%s，用时 %.1fs" % (name, _summary(values), time.perf_counter() - start))
+    return path
+
+
+def _summary(values):
+    """统计表中白方行棋时的胜/和/负数与最长距杀"""
+    half = len(values) // 2
+    white = values[:half]
+    invalid = white.count(128)
+    draws = white.count(0)
+    wins = sum(white.count(byte) for byte in range(1, 128))
+    losses = half - invalid - draws - wins
+    longest = max((byte for byte in range(1, 128) if byte in white), default=0)
+    return "白方行棋 胜 %d 和 %d 负 %d，最长距杀 %d 个半回合" % (wins, draws, losses, longest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="残局库生成与查询")
+    parser.add_argument("--directory", default=DEFAULT_DIRECTORY, help="表文件目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="生成子力组合表")
+    build.add_argument("materials", nargs="+", help="子力组合，如KQK KRK KPK KRKP")
+    build.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="扫描阶段的进程数")
+    probe = commands.add_parser("probe", help="查询局面")
+    probe.add_argument("--fen", required=True, help="要查询的局面")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        for material in args.materials:
+            try:
+                generate(material, args.directory, args.workers)
+            except ValueError as error:
+                parser.error(str(error))
+        return 0
+
+    position = Position.from_fen(args.fen)
+    with Tablebase(args.directory) as tablebase:
+        result = tablebase.probe(position)
+    if result is None:
+        print("局面不在残局库中")
+        return 1
+    wdl, dtm = result
+    print({1: "行棋方胜，%d个半回合后将杀" % dtm, 0: "和棋",
+           -1: "行棋方负，%d个半回合后被将杀" % dtm}[wdl])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import batch_eval
+from batch_eval import (codes_to_planes, decode_records, encode_positions, evaluate_codes,
+                        evaluate_planes, planes_to_codes, _sample_positions)
+from bitboard import Position, BLACK
+from codec import encode_many
+from evaluation import evaluate
+
+
+@pytest.fixture(scope='module')
+def positions():
+    positions = _sample_positions(200, seed=3)
+    positions.append(Position.initial())
+    positions.append(Position.from_fen('4k3/8/8/8/8/8/8/4K3 b - - 0 1'))
+    return positions
+
+
+def test_batch_matches_scalar_evaluate(positions, monkeypatch):
+    # 块大小取小值，覆盖分块边界
+    monkeypatch.setattr(batch_eval, 'CHUNK_SIZE', 7)
+    expected = np.array([evaluate(position) for position in positions], dtype=np.int32)
+    codes, turns = decode_records(encode_many(positions))
+    assert (evaluate_codes(codes, turns) == expected).all()
+    assert (evaluate_planes(codes_to_planes(codes), turns) == expected).all()
+
+    direct_codes, direct_turns = encode_positions(positions)
+    assert (direct_codes == codes).all() and (direct_turns == turns).all()
+
+
+def test_white_view_without_turns(positions):
+    codes, turns = encode_positions(positions)
+    white = np.array([evaluate(position) * (-1 if position.turn == BLACK else 1)
+                      for position in positions], dtype=np.int32)
+    assert (evaluate_codes(codes) == white).all()
+    assert (evaluate_planes(codes_to_planes(codes)) == white).all()
+
+
+def test_planes_codes_round_trip(positions):
+    codes, _ = encode_positions(positions)
+    planes = codes_to_planes(codes)
+    assert planes.shape == (len(positions), 12, 64)
+    assert (planes.sum(axis=(1, 2)) == (codes != batch_eval.EMPTY).sum(axis=1)).all()
+    assert (planes_to_codes(planes) == codes).all()
@@ -0,0 +1,72 @@
+from bitboard import Position, move_to_uci
+from book import (ENTRY, OpeningBook, build_book, collect_statistics, encode_move, decode_move,
+                  polyglot_key)
+
+GAMES = """[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 d6 0-1
+
+[Result "1/2-1/2"]
+
+1. d4 d5 1/2-1/2
+"""
+
+
+def test_build_and_probe(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(GAMES, encoding="utf-8")
+    book_path = tmp_path / "book.bin"
+    count, used, skipped = build_book(str(pgn_path), str(book_path))
+    assert (used, skipped) == (3, 0)
+    with OpeningBook(str(book_path)) as book:
+        assert len(book) == count
+        moves = dict(book.get_moves(Position.initial()))
+    initial = Position.initial()
+    e4 = next(move for move in initial.legal_moves() if move[:2] == (52, 36))
+    d4 = next(move for move in initial.legal_moves() if move[:2] == (51, 35))
+    assert set(moves) == {e4, d4}
+    assert moves[e4] > moves[d4]
+
+
+def test_polyglot_reference_keys():
+    # Polyglot格式说明中给出的参考局面键
+    moves = [None, "e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"]
+    keys = [0x463B96181691FC9C, 0x823C9B50FD114196, 0x0756B94461C50FB0, 0x662FAFB965DB29D4,
+            0x22A48B5A8E47FF78, 0x652A607CA3F242C1, 0x00FDD303C946BDD9]
+    position = Position.initial()
+    for uci, key in zip(moves, keys):
+        if uci is not None:
+            position.push(next(move for move in position.legal_moves() if move_to_uci(move) == uci))
+        assert polyglot_key(position) == key
+    for fen, key in [
+        ("rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3", 0x3C8123EA7B067637),
+        ("rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4", 0x5C3F9B829B279560),
+    ]:
+        assert polyglot_key(Position.from_fen(fen)) == key
+
+
+def test_reads_external_polyglot_entry(tmp_path):
+    # 其他程序生成的库：起始局面 e2e4，没有文件头
+    path = tmp_path / "polyglot.bin"
+    path.write_bytes(ENTRY.pack(0x463B96181691FC9C, 0x031C, 10, 0))
+    with OpeningBook(str(path)) as book:
+        assert book.get_moves(Position.initial()) == [((52, 36, None), 10)]
+
+
+def test_game_with_bad_move_adds_nothing():
+    games = """[Result "1-0"]
+
+1. e4 e5 2. Qxf7 1-0
+"""
+    stats, used, skipped = collect_statistics(games.splitlines(keepends=True))
+    assert (stats, used, skipped) == ({}, 0, 1)
+
+
+def test_castling_move_encoding_round_trip():
+    position = Position.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    for move in position.legal_moves():
+        assert decode_move(position, encode_move(position, move)) == move
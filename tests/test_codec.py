@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from bitboard import Position, STARTING_FEN
+from codec import POSITION_BYTES, decode, decode_many, encode, encode_many
+from perft import REFERENCE_POSITIONS
+
+
+def _random_positions(count, plies, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        position = Position.initial()
+        for _ in range(rng.randrange(plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.push(rng.choice(moves))
+        positions.append(position.copy())
+    return positions
+
+
+FENS = [fen for _, fen, _ in REFERENCE_POSITIONS] + [
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+    '4k3/8/8/8/8/8/8/4K3 b - - 99 200',
+]
+
+
+@pytest.mark.parametrize('fen', FENS)
+def test_round_trip(fen):
+    position = Position.from_fen(fen)
+    data = encode(position)
+    assert len(data) == POSITION_BYTES
+    decoded = decode(data)
+    assert decoded.fen() == fen
+    assert decoded.bitboards == position.bitboards
+    assert decoded.key == position.key
+    assert encode(decoded) == data
+
+
+def test_round_trip_many():
+    positions = _random_positions(50, 60)
+    data = encode_many(positions)
+    assert len(data) == POSITION_BYTES * len(positions)
+    assert [position.fen() for position in decode_many(data)] == \
+        [position.fen() for position in positions]
+
+
+def test_decode_rejects_bad_data():
+    data = encode(Position.from_fen(STARTING_FEN))
+    with pytest.raises(ValueError):
+        decode(data[:-1])
+    with pytest.raises(ValueError):
+        decode(data[:8] + b'\xff' * 16 + data[24:])
+
+
+def _with_occupancy(data, occupied):
+    return occupied.to_bytes(8, 'little') + data[8:]
+
+
+def _encode_unchecked(position):
+    """按相同布局编码，不检查王的数量"""
+    packed = 0
+    shift = 0
+    for sq in range(64):
+        for index, bitboard in enumerate(position.bitboards):
+            if bitboard >> sq & 1:
+                packed |= index << shift
+                shift += 4
+    return (position.occupied.to_bytes(8, 'little') + packed.to_bytes(16, 'little') +
+            bytes((position.turn, 0xFF)) + bytes(6))
+
+
+def test_decode_rejects_more_than_32_pieces():
+    data = encode(Position.from_fen(STARTING_FEN))
+    # 33个格子：多出来的格子没有棋子编码，不能按白兵解码
+    with pytest.raises(ValueError):
+        decode(_with_occupancy(data, (1 << 33) - 1))
+
+
+@pytest.mark.parametrize('fen', [
+    '8/8/8/8/8/8/8/4K3 w - - 0 1',
+    '4k3/8/8/8/8/8/8/3KK3 w - - 0 1',
+])
+def test_decode_requires_one_king_per_side(fen):
+    with pytest.raises(ValueError):
+        decode(_encode_unchecked(Position.from_fen(fen)))
+
+
+@pytest.mark.parametrize('field, value', [('halfmove_clock', 65536), ('fullmove_number', 70000)])
+def test_encode_rejects_clock_overflow(field, value):
+    position = Position.from_fen(STARTING_FEN)
+    setattr(position, field, value)
+    with pytest.raises(ValueError):
+        encode(position)
+
+
+def test_batch_decode_applies_the_same_checks():
+    batch_eval = pytest.importorskip('batch_eval')
+    good = encode(Position.from_fen(STARTING_FEN))
+    codes, turns = batch_eval.decode_records(good * 2)
+    assert codes.shape == (2, 64)
+    for bad in (_with_occupancy(good, (1 << 33) - 1),
+                _encode_unchecked(Position.from_fen('8/8/8/8/8/8/8/4K3 w - - 0 1'))):
+        with pytest.raises(ValueError):
+            batch_eval.decode_records(good + bad)
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+from chess_core import GameState, PieceColor, PieceType
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _move(game, from_square, to_square):
+    (from_row, from_col), (to_row, to_col) = from_square, to_square
+    game.move_piece(game.board[from_row][from_col], to_row, to_col)
+
+
+def test_rules_core_does_not_import_pygame():
+    code = ("import sys, chess_core; chess_core.GameState().check_game_over(); "
+            "sys.exit('pygame' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
+
+
+def test_fools_mate_through_move_piece():
+    game = GameState()
+    for from_square, to_square in [((6, 5), (5, 5)), ((1, 4), (3, 4)),
+                                   ((6, 6), (4, 6)), ((0, 3), (4, 7))]:
+        assert not game.game_over
+        _move(game, from_square, to_square)
+    assert game.game_over
+    assert game.winner == PieceColor.BLACK
+
+
+def test_promotion_waits_for_choice():
+    game = GameState()
+    game.load_fen("8/P6k/8/8/8/8/8/4K3 w - - 0 1")
+    _move(game, (1, 0), (0, 0))
+    assert game.promotion_pawn is not None
+    assert game.current_turn == PieceColor.WHITE
+    game.promote_pawn(PieceType.QUEEN)
+    assert game.board[0][0].type == PieceType.QUEEN
+    assert game.current_turn == PieceColor.BLACK
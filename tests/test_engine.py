@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from bitboard import Position, STARTING_FEN, move_to_uci
+from engine import MATE_SCORE, Searcher
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+@pytest.mark.parametrize("fen, best, plies", [
+    ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", "d1d8", 1),
+    ("6k1/8/8/8/8/8/8/RR4K1 w - - 0 1", "a1a7", 3),
+])
+def test_finds_mate(fen, best, plies):
+    result = Searcher().search(Position.from_fen(fen), depth=5)
+    assert move_to_uci(result.best_move) == best
+    assert result.score == MATE_SCORE - plies
+
+
+def test_no_legal_moves():
+    mated = Searcher().search(Position.from_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1"), depth=3)
+    assert mated.best_move is None and mated.score == -MATE_SCORE
+    stalemate = Searcher().search(Position.from_fen("7k/5Q2/8/8/8/8/8/6K1 b - - 0 1"), depth=3)
+    assert stalemate.best_move is None and stalemate.score == 0
+
+
+def test_search_leaves_position_unchanged():
+    position = Position.from_fen(KIWIPETE)
+    Searcher().search(position, depth=3)
+    assert position.fen() == KIWIPETE
+
+
+def test_fallback_move_is_ordered_when_first_depth_does_not_finish():
+    result = Searcher().search(Position.from_fen(KIWIPETE), movetime=0.0)
+    assert result.depth == 0
+    # MVV-LVA：先吃价值最高的子，同价值时用价值低的子去吃
+    assert move_to_uci(result.best_move) == "e2a6"
+
+
+def test_movetime_and_nodes_limits():
+    start = time.perf_counter()
+    result = Searcher().search(Position.from_fen(KIWIPETE), movetime=0.2)
+    assert time.perf_counter() - start < 0.5
+    assert result.best_move is not None
+    result = Searcher().search(Position.from_fen(STARTING_FEN), nodes=2000)
+    assert result.nodes <= 2000
+
+
+def test_stop_from_other_thread():
+    searcher = Searcher()
+    timer = threading.Timer(0.2, searcher.stop)
+    timer.start()
+    start = time.perf_counter()
+    result = searcher.search(Position.from_fen(KIWIPETE))
+    assert time.perf_counter() - start < 0.6
+    assert result.best_move in Position.from_fen(KIWIPETE).legal_moves()
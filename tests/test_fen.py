@@ -0,0 +1,45 @@
+import pytest
+
+from bitboard import Position, STARTING_FEN
+from chess_core import GameState
+
+ROUND_TRIP_FENS = [
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1",
+    "4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+@pytest.mark.parametrize("fen", ROUND_TRIP_FENS)
+def test_position_fen_round_trip(fen):
+    assert Position.from_fen(fen).fen() == fen
+
+
+@pytest.mark.parametrize("fen", ROUND_TRIP_FENS)
+def test_game_state_fen_round_trip(fen):
+    game = GameState()
+    game.load_fen(fen)
+    assert game.to_fen() == fen
+    assert game.position_key() == Position.from_fen(fen).key
+
+
+@pytest.mark.parametrize("fen", [
+    "4k3/8/8/3P4/8/8/8/4K3 w - e6 0 1",          # e5上没有黑兵
+    "4k3/8/8/8/3pP3/8/8/4K3 b - e6 0 1",         # 行棋方不对应的横线
+    "4k3/8/4p3/3Pp3/8/8/8/4K3 w - e6 0 1",       # 过路兵格被占
+    "4k3/4n3/8/3Pp3/8/8/8/4K3 w - e6 0 1",       # 兵的出发格被占
+])
+def test_invalid_en_passant_square_rejected(fen):
+    with pytest.raises(ValueError):
+        Position.from_fen(fen)
+
+
+def test_en_passant_push_pop_restores_position():
+    position = Position.from_fen("4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 1")
+    before = (position.fen(), position.key, position.bitboards[:])
+    for move in position.legal_moves():
+        position.push(move)
+        position.pop()
+        assert (position.fen(), position.key, position.bitboards) == before
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import instrumentation
+from bitboard import Position
+from chess_core import GameState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    instrumentation.disable()
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_enable_wraps_and_disable_restores():
+    originals = (Position.legal_moves, GameState.push)
+    instrumentation.enable()
+    assert instrumentation.is_enabled()
+    assert Position.legal_moves is not originals[0]
+    # 重复调用不会包装两次
+    wrapped = Position.legal_moves
+    instrumentation.enable()
+    assert Position.legal_moves is wrapped
+    instrumentation.disable()
+    assert not instrumentation.is_enabled()
+    assert (Position.legal_moves, GameState.push) == originals
+
+
+def test_counts_calls_by_method_and_category():
+    instrumentation.enable()
+    position = Position.initial()
+    for _ in range(3):
+        position.legal_moves()
+    position.push(position.legal_moves()[0])
+    position.pop()
+    instrumentation.disable()
+    # 停用后的调用不再计数
+    position.legal_moves()
+
+    stats = instrumentation.snapshot()
+    assert stats["methods"]["Position.legal_moves"]["calls"] == 4
+    assert stats["methods"]["Position.push"]["calls"] == 1
+    assert stats["methods"]["Position.pop"]["calls"] == 1
+    assert stats["categories"]["make"]["calls"] >= 2
+    assert stats["methods"]["Position.legal_moves"]["seconds"] > 0
+    json.dumps(stats)
+
+    report = instrumentation.format_report(stats)
+    assert "Position.legal_moves" in report
+    # 没有调用过的方法不出现在报告中
+    assert "GameState.promote_pawn" not in report
+
+    instrumentation.reset()
+    assert instrumentation.snapshot()["methods"]["Position.legal_moves"]["calls"] == 0
+
+
+def test_enable_does_not_import_ui():
+    code = ("import sys, instrumentation; instrumentation.enable(); "
+            "sys.exit('pygame' in sys.modules or 'chess_game' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode == 0
+
+
+def test_random_games_counted():
+    instrumentation.enable()
+    results = instrumentation._random_games(1, seed=5)
+    instrumentation.disable()
+    assert len(results) == 1
+    stats = instrumentation.snapshot()
+    assert stats["categories"]["make"]["calls"] > 0
+    assert stats["categories"]["movegen"]["calls"] > 0
+
+
+def test_profile_call_returns_result_and_summary(tmp_path):
+    output = tmp_path / "search.pstats"
+    result, text = instrumentation.profile_call(sum, [1, 2, 3], output=str(output))
+    assert result == 6
+    assert "function calls" in text
+    assert output.exists()
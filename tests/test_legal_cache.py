@@ -0,0 +1,49 @@
+import random
+
+from chess_core import GameState
+
+
+def _expected_table(game):
+    table = {}
+    for from_sq, to_sq, _ in game.current_position().legal_moves():
+        table[from_sq] = table.get(from_sq, 0) | (1 << to_sq)
+    return table
+
+
+def test_table_follows_push_and_pop():
+    rng = random.Random(11)
+    game = GameState()
+    tables = []
+    for _ in range(60):
+        table = game.legal_move_table()
+        assert table == _expected_table(game)
+        # 同一局面只生成一次
+        assert game.legal_move_table() is table
+        tables.append(table)
+        moves = game.current_position().legal_moves()
+        if not moves:
+            break
+        game.push(rng.choice(moves))
+    else:
+        tables.append(game.legal_move_table())
+    while game.move_history:
+        game.pop()
+        tables.pop()
+        assert game.legal_move_table() == tables[-1]
+
+
+def test_table_rebuilt_after_loading_position():
+    game = GameState()
+    game.legal_move_table()
+    game.load_fen("4k3/8/8/8/8/8/8/R3K3 w Q - 0 1")
+    table = game.legal_move_table()
+    assert table == _expected_table(game)
+    assert table[60] >> 58 & 1  # 长易位 e1c1
+
+
+def test_valid_moves_for_side_to_move_use_table():
+    game = GameState()
+    knight = game.board[7][6]
+    assert sorted(game.get_valid_moves(knight)) == [(5, 5), (5, 7)]
+    assert game.legal_targets(7, 6) == (1 << 45) | (1 << 47)
+    assert game.legal_targets(4, 4) == 0
@@ -0,0 +1,25 @@
+import pytest
+
+from bitboard import Position
+from perft import REFERENCE_POSITIONS, divide, perft
+
+# 浅层深度：各参考局面深度2，节点较少的再测深度3
+CASES = [(name, fen, depth, counts[depth - 1])
+         for name, fen, counts in REFERENCE_POSITIONS
+         for depth in (1, 2, 3) if depth <= 2 or counts[2] < 20000]
+
+
+@pytest.mark.parametrize('name, fen, depth, expected', CASES,
+                         ids=['%s-%d' % (case[0], case[2]) for case in CASES])
+def test_reference_positions(name, fen, depth, expected):
+    position = Position.from_fen(fen)
+    assert perft(position, depth) == expected
+    # 走子与悔棋后局面不变
+    assert position.fen() == Position.from_fen(fen).fen()
+
+
+def test_divide_sums_to_perft():
+    name, fen, counts = REFERENCE_POSITIONS[1]
+    results = divide(Position.from_fen(fen), 2)
+    assert len(results) == counts[0]
+    assert sum(nodes for _, nodes in results) == counts[1]
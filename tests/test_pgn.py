@@ -0,0 +1,43 @@
+import pytest
+
+from bitboard import Position
+from pgn import PGNError, move_to_san, parse_san, read_games, replay_game, tokenize_movetext
+
+SCHOLARS_MATE = [
+    '[Event "test"]',
+    '[Result "1-0"]',
+    '',
+    '1. e4 ; 行尾注释',
+    'e5 2. Bc4 {花括号注释} Nc6 3. Qh5 Nf6 (3... g6) 4. Qxf7# 1-0',
+]
+
+
+def test_semicolon_comment_only_ends_its_line():
+    (headers, movetext), = read_games(SCHOLARS_MATE)
+    record = replay_game(headers, movetext)
+    assert "error" not in record
+    assert record["plies"] == 7
+    assert record["termination"] == "checkmate"
+    assert record["winner"] == "white"
+
+
+def test_tokenize_strips_comments_variations_and_numbers():
+    sans, result = tokenize_movetext("1. e4 $1 {x} e5 (1... c5 2. Nf3) 2. Nf3 ; y\nNc6 *")
+    assert sans == ["e4", "e5", "Nf3", "Nc6"]
+    assert result == "*"
+
+
+def test_read_games_splits_multiple_games():
+    games = list(read_games(SCHOLARS_MATE + ['', '[Event "second"]', '', '1. d4 d5 *']))
+    assert [headers["Event"] for headers, _ in games] == ["test", "second"]
+
+
+def test_san_round_trip_over_legal_moves():
+    position = Position.from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    for move in position.legal_moves():
+        assert tuple(parse_san(position, move_to_san(position, move))) == tuple(move)
+
+
+def test_illegal_san_raises():
+    with pytest.raises(PGNError):
+        parse_san(Position.initial(), "Ke2")
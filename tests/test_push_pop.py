@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from bitboard import Position
+from chess_core import GameState, PieceType
+
+
+def _random_game(seed, plies):
+    rng = random.Random(seed)
+    game = GameState()
+    fens = [game.to_fen()]
+    for _ in range(plies):
+        moves = game.current_position().legal_moves()
+        if not moves:
+            break
+        game.push(rng.choice(moves))
+        fens.append(game.to_fen())
+    return game, fens
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pop_restores_every_position(seed):
+    game, fens = _random_game(seed, 80)
+    while game.move_history:
+        fens.pop()
+        game.pop()
+        assert game.to_fen() == fens[-1]
+        assert game.position_key() == Position.from_fen(fens[-1]).key
+    assert not game.game_over
+
+
+def test_push_pop_promotion_capture():
+    game = GameState()
+    game.load_fen("1r5k/P7/8/8/8/8/8/4K3 w - - 0 1")
+    before = game.to_fen()
+    game.push((8, 1, PieceType.KNIGHT.value))
+    assert game.to_fen() == "1N5k/8/8/8/8/8/8/4K3 b - - 0 1"
+    game.pop()
+    assert game.to_fen() == before
+    assert game.board[1][0].type == PieceType.PAWN
+
+
+def test_push_requires_promotion_piece():
+    game = GameState()
+    game.load_fen("8/P6k/8/8/8/8/8/4K3 w - - 0 1")
+    with pytest.raises(ValueError):
+        game.push((8, 0, None))
+
+
+def test_position_cached_while_promotion_pending_is_refreshed():
+    game = GameState()
+    game.load_fen("8/P6k/8/8/8/8/8/4K3 w - - 0 1")
+    game._position = None  # 与界面一样，缓存在等待升变时才生成
+    game.move_piece(game.board[1][0], 0, 0)
+    game.current_position()
+    game.position_key()
+    game.promote_pawn(PieceType.QUEEN)
+    assert game.to_fen().startswith("Q7/7k/")
+    assert game.position_key() == Position.from_fen(game.to_fen()).key
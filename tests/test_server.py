@@ -0,0 +1,59 @@
+import server
+from server import GameServer
+
+FOOLS_MATE = ('f2f3', 'e7e5', 'g2g4', 'd8h4')
+
+
+# 代替网络连接，记录推送的消息
+class _Client:
+    def __init__(self):
+        self.games = set()
+        self.pushed = []
+
+    def send(self, line):
+        self.pushed.append(line)
+
+
+def _play(game_server, client, moves):
+    game_id = int(game_server.handle_line(client, ['new']).split()[1])
+    for move in moves:
+        assert game_server.handle_line(client, ['move', str(game_id), move]).startswith('ok')
+    return game_id
+
+
+def test_finished_game_without_subscribers_is_retired():
+    game_server = GameServer()
+    client = _Client()
+    game_id = _play(game_server, client, FOOLS_MATE)
+    assert game_id not in game_server.games
+    assert game_server.handle_line(client, ['state', str(game_id)]).startswith(
+        'state %d 0-1 ' % game_id)
+    assert game_server.handle_line(client, ['move', str(game_id), 'e2e4']) == \
+        'error %d game over' % game_id
+    assert game_server.stats()['retired'] == 1
+
+
+def test_finished_game_is_kept_until_last_subscriber_leaves():
+    game_server = GameServer()
+    client = _Client()
+    game_id = int(game_server.handle_line(client, ['new']).split()[1])
+    game_server.handle_line(client, ['join', str(game_id)])
+    for move in FOOLS_MATE:
+        game_server.handle_line(client, ['move', str(game_id), move])
+    assert client.pushed[-1] == 'end %d 0-1 checkmate' % game_id
+    assert game_id in game_server.games
+    game_server.unsubscribe_all(client)
+    assert game_id not in game_server.games
+    assert game_id not in game_server.subscribers
+
+
+def test_unfinished_games_are_kept_and_archive_is_bounded(monkeypatch):
+    monkeypatch.setattr(server, 'ARCHIVE_SIZE', 2)
+    game_server = GameServer()
+    client = _Client()
+    running = _play(game_server, client, FOOLS_MATE[:2])
+    finished = [_play(game_server, client, FOOLS_MATE) for _ in range(3)]
+    assert running in game_server.games
+    assert list(game_server.archive) == finished[1:]
+    assert game_server.handle_line(client, ['state', str(finished[0])]) == \
+        'error %d no such game' % finished[0]
@@ -0,0 +1,69 @@
+import pickle
+import random
+
+import pytest
+
+from chess_core import GameSnapshot, GameState, PieceColor
+
+
+def _move(game, from_square, to_square):
+    (from_row, from_col), (to_row, to_col) = from_square, to_square
+    game.move_piece(game.board[from_row][from_col], to_row, to_col)
+
+
+def test_restore_round_trip():
+    rng = random.Random(2)
+    game = GameState()
+    snapshots = []
+    for _ in range(40):
+        snapshots.append((game.snapshot(), game.to_fen()))
+        moves = game.current_position().legal_moves()
+        if not moves:
+            break
+        game.push(rng.choice(moves))
+    restored = GameState()
+    for snapshot, fen in snapshots:
+        restored.restore(snapshot)
+        assert restored.to_fen() == fen
+        assert restored.position_key() == snapshot.key
+        assert restored.move_history == []
+        assert restored.snapshot() == snapshot
+
+
+def test_snapshot_is_hashable_and_picklable():
+    game = GameState()
+    snapshot = game.snapshot()
+    assert isinstance(snapshot, GameSnapshot)
+    assert {snapshot: 1}[GameState().snapshot()] == 1
+    assert pickle.loads(pickle.dumps(snapshot)) == snapshot
+    assert snapshot.ep_square is None and snapshot.winner is None
+
+
+def test_adjacent_snapshots_share_unchanged_bitboards():
+    game = GameState()
+    before = game.snapshot()
+    _move(game, (6, 4), (4, 4))  # e2e4
+    after = game.snapshot()
+    changed = [index for index in range(12) if before.bitboards[index] is not after.bitboards[index]]
+    assert changed == [0]  # 只有白兵的位棋盘变化
+
+
+def test_game_over_restored():
+    game = GameState()
+    for from_square, to_square in [((6, 5), (5, 5)), ((1, 4), (3, 4)),
+                                   ((6, 6), (4, 6)), ((0, 3), (4, 7))]:
+        _move(game, from_square, to_square)
+    snapshot = game.snapshot()
+    assert snapshot.game_over and snapshot.winner == PieceColor.BLACK.value
+    restored = GameState()
+    restored.restore(snapshot)
+    assert restored.game_over and restored.winner == PieceColor.BLACK
+
+
+def test_snapshot_rejected_while_promotion_pending():
+    game = GameState()
+    game.load_fen("4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+    _move(game, (1, 0), (0, 0))
+    assert game.promotion_pawn is not None
+    with pytest.raises(ValueError):
+        game.snapshot()
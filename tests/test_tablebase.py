@@ -0,0 +1,79 @@
+import os
+import random
+
+import pytest
+
+from bitboard import Position
+from tablebase import (Tablebase, generate, required_materials, split_material, _Layout,
+                       FILE_SUFFIX, HEADER_BYTES, MAX_PIECES)
+
+
+@pytest.mark.parametrize('name', ['KPKP', 'KPPKP', 'KPKRP'])
+def test_generate_rejects_pawns_on_both_sides(tmp_path, name):
+    with pytest.raises(ValueError):
+        generate(name, str(tmp_path), log=lambda text: None)
+    assert os.listdir(tmp_path) == []
+
+
+def test_piece_count_is_capped(tmp_path):
+    with pytest.raises(ValueError):
+        generate('KQ' + 'R' * (MAX_PIECES - 2) + 'K', str(tmp_path), log=lambda text: None)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('name', ['KPK', 'KRKP', 'KQKP', 'KPPK'])
+def test_single_side_pawn_tables_never_need_both_side_pawns(name):
+    # 吃子和升变只会减少兵，依赖的子组合中也不会出现双方都有兵
+    for required in required_materials(name) | {name}:
+        white, black = split_material(required)
+        assert not ('P' in white and 'P' in black)
+
+
+@pytest.fixture(scope='module')
+def kqk(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('tablebases'))
+    generate('KQK', directory, log=lambda text: None)
+    with Tablebase(directory) as tablebase:
+        yield tablebase
+
+
+def _probe_after(tablebase, position, move):
+    # 黑王吃后之后查询的是依赖的KK表
+    position.push(move)
+    try:
+        return tablebase.probe(position)
+    finally:
+        position.pop()
+
+
+def test_kqk_longest_mate(kqk):
+    # 王后对单王，白方行棋最长10步（19个半回合）将杀
+    with open(os.path.join(kqk.directory, 'KQK' + FILE_SUFFIX), 'rb') as handle:
+        values = handle.read()[HEADER_BYTES:]
+    white = values[:len(values) // 2]
+    assert max(byte for byte in white if byte < 128) == 19
+    assert kqk.probe(Position.from_fen('k7/8/1K6/8/8/8/7Q/8 w - - 0 1')) == (1, 1)
+
+
+def test_kqk_values_consistent_with_successors(kqk):
+    # 胜d：有走法到对方负d-1，且没有更快的杀；负d：每个走法都到对方胜，最慢为d-1
+    layout = _Layout('KQK')
+    rng = random.Random(7)
+    checked = 0
+    while checked < 300:
+        position = layout.position(rng.randrange(2), [rng.randrange(64) for _ in range(3)])
+        if position is None:
+            continue
+        wdl, dtm = kqk.probe(position)
+        results = [_probe_after(kqk, position, move) for move in position.legal_moves()]
+        if wdl == 1:
+            assert min(d for w, d in results if w == -1) == dtm - 1
+        elif wdl == -1:
+            if dtm == 0:
+                assert results == [] and position.is_in_check(position.turn)
+            else:
+                assert all(w == 1 for w, _ in results)
+                assert max(d for _, d in results) == dtm - 1
+        else:
+            assert not results or max(-w for w, _ in results) == 0
+        checked += 1
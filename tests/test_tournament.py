@@ -0,0 +1,28 @@
+import math
+
+import pytest
+
+from pgn import PGNError
+from tournament import elo_difference, read_openings
+
+
+def test_elo_interval_is_unbounded_at_extreme_scores():
+    elo, lower, upper = elo_difference(10, 0, 0)
+    assert elo == math.inf and upper == math.inf
+    assert 0 < lower < math.inf
+    elo, lower, upper = elo_difference(0, 0, 10)
+    assert elo == -math.inf and lower == -math.inf
+    assert -math.inf < upper < 0
+
+
+def test_elo_interval_contains_estimate():
+    elo, lower, upper = elo_difference(60, 20, 20)
+    assert lower < elo < upper
+    assert elo_difference(30, 40, 30)[0] == pytest.approx(0.0)
+
+
+def test_read_openings_reports_bad_line():
+    lines = ["1. e4 e5 2. Nf3 Nc6", "# 注释", "", "1. d4 d5 2. Ke3"]
+    assert read_openings(lines[:3]) == [["e4", "e5", "Nf3", "Nc6"]]
+    with pytest.raises(PGNError, match="第4行"):
+        read_openings(lines)
@@ -0,0 +1,62 @@
+from tt import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER, ENTRY_BYTES, TranspositionTable
+
+
+def _single_bucket():
+    # 预算不足一个桶时只分配一个桶（两个条目），所有键都落在同一个桶
+    table = TranspositionTable(0)
+    assert table.entries == 2
+    return table
+
+
+def test_store_and_probe_round_trip():
+    table = TranspositionTable(1)
+    table.store(0x123456789ABCDEF0, 7, -31337, BOUND_LOWER, (12, 4, 4))
+    assert table.probe(0x123456789ABCDEF0) == (7, -31337, BOUND_LOWER, (12, 4, 4))
+    assert table.probe(0x0FEDCBA987654321) is None
+    assert table.hit_rate == 0.5
+
+
+def test_size_stays_within_budget():
+    for size_mb in (1, 3, 16):
+        table = TranspositionTable(size_mb)
+        assert table.nbytes <= size_mb * 1024 * 1024
+        assert table.nbytes * 2 > size_mb * 1024 * 1024
+        assert len(table.table) * 8 == table.entries * ENTRY_BYTES
+
+
+def test_same_key_overwrites_and_keeps_move():
+    table = _single_bucket()
+    table.store(1, 3, 10, BOUND_EXACT, (8, 16, None))
+    table.store(1, 5, 20, BOUND_UPPER)
+    assert table.probe(1) == (5, 20, BOUND_UPPER, (8, 16, None))
+    assert table.replacements == 0
+
+
+def test_same_generation_replaces_shallower_entry():
+    table = _single_bucket()
+    table.store(1, 8, 0, BOUND_EXACT)
+    table.store(2, 3, 0, BOUND_EXACT)
+    table.store(3, 5, 0, BOUND_EXACT)
+    assert table.probe(1) is not None
+    assert table.probe(2) is None
+    assert table.probe(3) is not None
+    assert table.replacements == 1
+
+
+def test_older_generation_is_replaced_first():
+    table = _single_bucket()
+    table.store(1, 10, 0, BOUND_EXACT)
+    table.new_search()
+    table.store(2, 4, 0, BOUND_EXACT)
+    table.store(3, 2, 0, BOUND_EXACT)
+    assert table.probe(1) is None
+    assert table.probe(2) is not None
+    assert table.probe(3) is not None
+
+
+def test_clear():
+    table = TranspositionTable(1)
+    table.store(42, 1, 0, BOUND_EXACT)
+    table.clear()
+    assert table.probe(42) is None
+    assert table.hashfull() == 0
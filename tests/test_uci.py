@@ -0,0 +1,155 @@
+import io
+import threading
+import time
+
+import pytest
+
+from bitboard import Position, move_to_uci
+from engine import SearchAborted
+from parallel import ParallelSearcher
+from uci import UCIEngine, allocate_time, parse_go
+
+
+@pytest.fixture
+def engine():
+    engine = UCIEngine(io.StringIO())
+    yield engine
+    engine.handle("quit")
+    if engine.parallel is not None:
+        engine.parallel.close()
+
+
+def _lines(engine):
+    return engine.output.getvalue().splitlines()
+
+
+def _run(engine, *commands, timeout=10):
+    """依次执行命令，等待搜索线程结束，返回bestmove行"""
+    for command in commands:
+        engine.handle(command)
+    engine.thread.join(timeout)
+    assert not engine.thread.is_alive()
+    return [line for line in _lines(engine) if line.startswith("bestmove")]
+
+
+def _stop_within(engine, seconds):
+    stopper = threading.Thread(target=engine.handle, args=("stop",), daemon=True)
+    stopper.start()
+    stopper.join(seconds)
+    assert not stopper.is_alive()
+
+
+def test_handshake(engine):
+    engine.handle("uci")
+    engine.handle("isready")
+    lines = _lines(engine)
+    assert lines[0].startswith("id name ")
+    assert "option name Threads type spin default 1 min 1 max 64" in lines
+    assert lines[-2:] == ["uciok", "readyok"]
+
+
+def test_parse_go_and_time_allocation():
+    options = parse_go("wtime 60000 btime 30000 winc 1000 movestogo 20 depth 5 ponder".split())
+    assert options == {"wtime": 60.0, "btime": 30.0, "winc": 1.0, "movestogo": 20, "depth": 5,
+                       "ponder": True}
+    assert allocate_time(60.0, 1.0, 20) == pytest.approx(60.0 / 20 + 0.8 - 0.05)
+    assert allocate_time(0.1) == 0.01
+
+
+def test_position_moves_and_bestmove(engine):
+    bestmoves = _run(engine, "position startpos moves e2e4 e7e5 g1f3", "go depth 2")
+    position = Position.from_fen("rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2")
+    move = bestmoves[-1].split()[1]
+    assert move in {move_to_uci(legal) for legal in position.legal_moves()}
+
+
+def test_illegal_move_reported(engine):
+    engine.handle("position startpos moves e2e4 e2e4")
+    assert _lines(engine) == ["info string 非法走法: e2e4"]
+    assert engine.game.to_fen().split()[0] == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR"
+
+
+def test_mate_in_one_from_fen(engine):
+    bestmoves = _run(engine, "position fen 6k1/5ppp/8/8/8/8/8/3Q2K1 w - - 0 1", "go depth 3")
+    assert bestmoves == ["bestmove d1d8"]
+
+
+def test_nodes_limit(engine):
+    bestmoves = _run(engine, "position startpos", "go nodes 2000")
+    assert len(bestmoves) == 1
+
+
+def test_stop_before_search_starts_is_not_lost(engine):
+    # 搜索线程开始搜索前先收到stop：停止请求不能被搜索开始时的重置清除
+    search = engine.searcher.search
+
+    def delayed(*args, **kwargs):
+        time.sleep(0.2)
+        return search(*args, **kwargs)
+
+    engine.searcher.search = delayed
+    engine.handle("position startpos")
+    engine.handle("go infinite")
+    _stop_within(engine, 5)
+    assert len([line for line in _lines(engine) if line.startswith("bestmove")]) == 1
+
+
+def test_ponderhit_applies_time_limit(engine):
+    engine.handle("position startpos")
+    engine.handle("go ponder movetime 100")
+    time.sleep(0.1)
+    assert not any(line.startswith("bestmove") for line in _lines(engine))
+    engine.handle("ponderhit")
+    engine.thread.join(5)
+    assert not engine.thread.is_alive()
+    assert any(line.startswith("bestmove") for line in _lines(engine))
+
+
+def test_threads_search_stop_and_new_game(engine):
+    engine.handle("setoption name Threads value 2")
+    assert engine.parallel is not None and engine.parallel.workers == 2
+    bestmoves = _run(engine, "position startpos", "go depth 2")
+    assert len(bestmoves) == 1
+
+    # 根节点走法搜索途中也能及时停止
+    engine.handle("go infinite")
+    time.sleep(0.5)
+    _stop_within(engine, 2)
+    assert len([line for line in _lines(engine) if line.startswith("bestmove")]) == 2
+
+    cleared = []
+    engine.parallel.clear = lambda: cleared.append(True)
+    engine.handle("ucinewgame")
+    assert cleared == [True]
+
+
+@pytest.fixture(scope="module")
+def parallel_searcher():
+    with ParallelSearcher(1, 1) as searcher:
+        yield searcher
+
+
+@pytest.mark.parametrize("limit", ["stop", "deadline", "nodes"])
+def test_parallel_limits_checked_while_root_move_runs(parallel_searcher, limit):
+    # 单个根节点走法的深层搜索要数秒，停止条件必须在等待期间生效
+    stop_event = threading.Event()
+    parallel_searcher.reset(time.perf_counter() + 0.3 if limit == "deadline" else None, stop_event)
+    timer = threading.Timer(0.3, stop_event.set)
+    if limit == "stop":
+        timer.start()
+    start = time.perf_counter()
+    with pytest.raises(SearchAborted):
+        parallel_searcher.search(Position.initial(), 7, nodes=2000 if limit == "nodes" else None)
+    timer.cancel()
+    assert time.perf_counter() - start < 1.5
+
+
+def test_parallel_clear_resets_tables_and_workers(parallel_searcher):
+    parallel_searcher.reset()
+    position = Position.initial()
+    parallel_searcher.search(position, 2)
+    pool = parallel_searcher.pool
+    assert parallel_searcher.ordering_searcher.tt.probe(position.key) is not None
+    parallel_searcher.clear()
+    assert parallel_searcher.ordering_searcher.tt.probe(position.key) is None
+    assert parallel_searcher.pool is not pool
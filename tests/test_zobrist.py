@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from bitboard import Position, STARTING_FEN
+
+START_FENS = [
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+]
+
+
+@pytest.mark.parametrize("fen", START_FENS)
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_key_matches_recompute(fen, seed):
+    rng = random.Random(seed)
+    position = Position.from_fen(fen)
+    keys = [position.key]
+    for _ in range(60):
+        moves = position.legal_moves()
+        if not moves:
+            break
+        position.push(rng.choice(moves))
+        assert position.key == position.compute_key()
+        assert position.key == Position.from_fen(position.fen()).key
+        keys.append(position.key)
+    while len(keys) > 1:
+        position.pop()
+        keys.pop()
+        assert position.key == keys[-1]
+
+
+def test_key_depends_on_side_castling_and_en_passant():
+    base = Position.from_fen(STARTING_FEN).key
+    assert Position.from_fen(STARTING_FEN.replace(" w ", " b ")).key != base
+    assert Position.from_fen(STARTING_FEN.replace("KQkq", "Qkq")).key != base
+    with_ep = Position.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+    without = Position.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3")
+    assert with_ep.key != without.key
+
+
+def test_transposition_gives_same_key():
+    first = Position.initial()
+    second = Position.initial()
+    for move in [(62, 45, None), (6, 21, None), (57, 42, None), (1, 18, None)]:
+        first.push(move)
+    for move in [(57, 42, None), (1, 18, None), (62, 45, None), (6, 21, None)]:
+        second.push(move)
+    assert first.key == second.key
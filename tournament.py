@@ -0,0 +1,353 @@
+"""无界面自对弈与比赛框架
+
+两个玩家在进程池中对弈N盘，双方每盘交换先后手。每步按界面相同的方式
+调用move_piece（兵到底线时再调用promote_pawn），由check_game_over判定将死
+和逼和；另外按五十步规则、三次重复和最大半回合数判和，避免对局无限进行。
+
+玩家用字符串描述：
+    random                  随机走子
+    depth=3                 引擎固定深度
+    movetime=0.1            引擎每步限时（秒）
+    nodes=20000             引擎每步节点上限
+引擎参数可以用逗号组合，并可加hash=MB指定置换表大小，如depth=4,hash=32。
+给出--openings时双方先按文件中的开局走法（每行一条SAN序列）走棋，
+每条开局连续下两盘、双方各执一次先手。
+
+输出PGN棋谱与统计：盘/秒、半回合/秒、玩家一的胜/和/负及Elo差。Elo差的95%区间
+由得分率的Wilson区间换算，全胜或全负时区间一端为无穷大。
+
+用法：
+    python tournament.py random depth=2 --games 100 --workers 4 --pgn games.pgn
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from bitboard import Position
+from chess_core import GameState, PieceColor, PieceType, BOARD_SIZE
+from engine import Searcher
+from pgn import PGNError, move_to_san, parse_san, tokenize_movetext
+from tt import TranspositionTable, DEFAULT_SIZE_MB
+
+DEFAULT_MAX_PLIES = 300
+DEFAULT_CHUNK_SIZE = 4
+
+
+# 随机走子的玩家
+class RandomPlayer:
+    name = "random"
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def new_game(self, index):
+        self.rng = random.Random("%s:%d" % (self.seed, index))
+
+    def choose_move(self, game):
+        return self.rng.choice(game.current_position().legal_moves())
+
+
+# 引擎玩家：按深度、每步时间或节点数限制搜索
+class EnginePlayer:
+    def __init__(self, depth=None, movetime=None, nodes=None, hash_mb=DEFAULT_SIZE_MB, name=None):
+        self.depth = depth
+        self.movetime = movetime
+        self.nodes = nodes
+        self.searcher = Searcher(TranspositionTable(hash_mb))
+        self.name = name or "engine"
+
+    def new_game(self, index):
+        pass
+
+    def choose_move(self, game):
+        result = self.searcher.search(game.current_position(), depth=self.depth,
+                                      movetime=self.movetime, nodes=self.nodes)
+        return result.best_move
+
+
+# 按开局走法走棋的玩家，开局走完后交给fallback
+class ScriptedPlayer:
+    def __init__(self, lines, fallback):
+        self.lines = lines  # 每条开局为SAN列表
+        self.fallback = fallback
+        self.name = fallback.name
+        self.line = []
+
+    def new_game(self, index):
+        # 每条开局连续使用两盘
+        self.line = self.lines[index // 2 % len(self.lines)] if self.lines else []
+        self.fallback.new_game(index)
+
+    def choose_move(self, game):
+        ply = game.ply
+        if ply < len(self.line):
+            return parse_san(game.current_position(), self.line[ply])
+        return self.fallback.choose_move(game)
+
+
+def make_player(spec, seed=0):
+    """按描述字符串创建玩家，描述无效时抛出ValueError"""
+    if spec == "random":
+        return RandomPlayer(seed)
+    options = {}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        try:
+            if key in ("depth", "nodes"):
+                options[key] = int(value)
+            elif key == "movetime":
+                options[key] = float(value)
+            elif key == "hash":
+                options["hash_mb"] = float(value)
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError("无效的玩家描述: %s" % spec) from None
+    if not options.keys() & {"depth", "movetime", "nodes"}:
+        raise ValueError("引擎玩家需要depth、movetime或nodes: %s" % spec)
+    return EnginePlayer(name=spec, **options)
+
+
+def read_openings(lines):
+    """读取开局文件：每个非空行一条开局，可带回合编号
+
+    每条开局从初始局面回放一遍，有无法解析或不合法的走法时抛出带行号的PGNError。
+    """
+    openings = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            sans = tokenize_movetext(line)[0]
+            position = Position.initial()
+            for san in sans:
+                position.push(parse_san(position, san))
+        except PGNError as error:
+            raise PGNError("开局文件第%d行: %s" % (number, error)) from None
+        openings.append(sans)
+    return openings
+
+
+# 一盘棋（GameState加上和棋判定所需的计数）
+class _Game(GameState):
+    def __init__(self):
+        super().__init__()
+        self.ply = 0
+        self.repetitions = {self.position_key(): 1}
+
+    def apply(self, move):
+        """按界面的走子方式执行合法走法"""
+        from_square, to_square, promotion = move
+        if not self.legal_move_table().get(from_square, 0) >> to_square & 1:
+            raise ValueError("非法走法: %r" % (move,))
+        from_row, from_col = divmod(from_square, BOARD_SIZE)
+        piece = self.board[from_row][from_col]
+        self.move_piece(piece, *divmod(to_square, BOARD_SIZE))
+        if self.promotion_pawn is not None:
+            self.promote_pawn(PieceType(promotion) if promotion is not None else PieceType.QUEEN)
+        self.ply += 1
+        key = self.position_key()
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+        return self.repetitions[key]
+
+
+def play_game(white, black, index=0, max_plies=DEFAULT_MAX_PLIES, record_san=False):
+    """下一盘棋，返回记录字典
+
+    result为1-0、0-1或1/2-1/2，termination为checkmate、stalemate、fifty moves、
+    repetition或move cap；record_san为真时记录SAN走法。
+    """
+    game = _Game()
+    players = {PieceColor.WHITE: white, PieceColor.BLACK: black}
+    white.new_game(index)
+    if black is not white:
+        black.new_game(index)
+    sans = []
+    termination = None
+    while not game.game_over:
+        if game.ply >= max_plies:
+            termination = "move cap"
+            break
+        move = players[game.current_turn].choose_move(game)
+        if record_san:
+            sans.append(move_to_san(game.current_position(), move))
+        if game.apply(move) >= 3:
+            termination = "repetition"
+            break
+        if game.current_position().halfmove_clock >= 100 and not game.game_over:
+            termination = "fifty moves"
+            break
+
+    if game.game_over and game.winner is not None:
+        result = "1-0" if game.winner == PieceColor.WHITE else "0-1"
+        termination = "checkmate"
+    else:
+        result = "1/2-1/2"
+        if game.game_over:
+            termination = "stalemate"
+    return {"index": index, "white": white.name, "black": black.name, "result": result,
+            "termination": termination, "plies": game.ply, "sans": sans}
+
+
+# 工作进程内的两个玩家（由进程池初始化函数创建，在同一进程的棋局之间复用）
+_worker_setup = None
+
+
+def _create_players(specs, openings, seed):
+    players = [make_player(spec, seed) for spec in specs]
+    if openings:
+        players = [ScriptedPlayer(openings, player) for player in players]
+    return players
+
+
+def _init_worker(specs, openings, seed, max_plies, record_san):
+    global _worker_setup
+    _worker_setup = (_create_players(specs, openings, seed), max_plies, record_san)
+
+
+def _play_task(index):
+    """工作进程任务：第index盘，偶数盘玩家一执白"""
+    (first, second), max_plies, record_san = _worker_setup
+    white, black = (first, second) if index % 2 == 0 else (second, first)
+    return play_game(white, black, index, max_plies, record_san)
+
+
+def run_match(specs, games, workers=1, openings=None, seed=0,
+              max_plies=DEFAULT_MAX_PLIES, record_san=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """对弈games盘，按完成顺序产生记录"""
+    setup = (specs, openings or [], seed, max_plies, record_san)
+    if workers <= 1:
+        _init_worker(*setup)
+        for index in range(games):
+            yield _play_task(index)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=setup) as pool:
+        yield from pool.imap_unordered(_play_task, range(games), chunk_size)
+
+
+def first_player_score(record):
+    """玩家一在这盘棋中的得分：1、0.5或0"""
+    if record["result"] == "1/2-1/2":
+        return 0.5
+    first_is_white = record["index"] % 2 == 0
+    return 1.0 if (record["result"] == "1-0") == first_is_white else 0.0
+
+
+def score_to_elo(fraction):
+    """得分率换算为Elo差，得分率为0或1时为负/正无穷"""
+    if fraction <= 0:
+        return -math.inf
+    if fraction >= 1:
+        return math.inf
+    return -400 * math.log10(1 / fraction - 1)
+
+
+def elo_difference(wins, draws, losses, z=1.96):
+    """由胜和负计算Elo差及95%区间，返回(elo, 下限, 上限)
+
+    区间为得分率的Wilson区间（和棋按半分计入，方差按二项分布估计，偏保守），
+    全胜或全负时仍有一端有限；没有棋局时区间为(-inf, inf)。
+    """
+    total = wins + draws + losses
+    if total == 0:
+        return 0.0, -math.inf, math.inf
+    score = (wins + 0.5 * draws) / total
+    denominator = 1 + z * z / total
+    center = (score + z * z / (2 * total)) / denominator
+    half = z * math.sqrt(score * (1 - score) / total + z * z / (4 * total * total)) / denominator
+    return score_to_elo(score), score_to_elo(center - half), score_to_elo(center + half)
+
+
+def format_elo(value):
+    if not math.isfinite(value):
+        return "+inf" if value > 0 else "-inf"
+    return "%+d" % round(value)
+
+
+def format_pgn(record, event="Tournament"):
+    """把记录格式化为一盘PGN棋谱"""
+    headers = [("Event", event), ("Site", "?"), ("Date", time.strftime("%Y.%m.%d")),
+               ("Round", str(record["index"] + 1)), ("White", record["white"]),
+               ("Black", record["black"]), ("Result", record["result"]),
+               ("Termination", record["termination"]), ("PlyCount", str(record["plies"]))]
+    lines = ['[%s "%s"]' % header for header in headers]
+    lines.append("")
+    tokens = []
+    for ply, san in enumerate(record["sans"]):
+        tokens.append("%d. %s" % (ply // 2 + 1, san) if ply % 2 == 0 else san)
+    tokens.append(record["result"])
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = token if not line else line + " " + token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面自对弈与比赛")
+    parser.add_argument("first", help="玩家一（random、depth=N、movetime=秒、nodes=N）")
+    parser.add_argument("second", help="玩家二")
+    parser.add_argument("--games", type=int, default=100, help="对局数（双方轮流执白）")
+    parser.add_argument("--workers", type=int, default=1, help="工作进程数")
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES,
+                        help="超过该半回合数判和")
+    parser.add_argument("--openings", help="开局文件，每行一条SAN走法序列")
+    parser.add_argument("--seed", type=int, default=0, help="随机玩家的种子")
+    parser.add_argument("--pgn", help="把棋谱写入PGN文件")
+    args = parser.parse_args(argv)
+
+    specs = (args.first, args.second)
+    for spec in specs:
+        try:
+            make_player(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    openings = None
+    if args.openings:
+        with open(args.openings, encoding="utf-8") as source:
+            try:
+                openings = read_openings(source)
+            except PGNError as error:
+                parser.error(str(error))
+
+    records = []
+    start = time.perf_counter()
+    for record in run_match(specs, args.games, args.workers, openings, args.seed,
+                            args.max_plies, record_san=bool(args.pgn)):
+        records.append(record)
+    elapsed = time.perf_counter() - start
+    records.sort(key=lambda record: record["index"])
+
+    if args.pgn:
+        with open(args.pgn, "w", encoding="utf-8") as output:
+            for record in records:
+                output.write(format_pgn(record, "%s vs %s" % specs))
+
+    scores = [first_player_score(record) for record in records]
+    wins, draws = scores.count(1.0), scores.count(0.5)
+    losses = len(scores) - wins - draws
+    plies = sum(record["plies"] for record in records)
+    terminations = {}
+    for record in records:
+        terminations[record["termination"]] = terminations.get(record["termination"], 0) + 1
+    elo, lower, upper = elo_difference(wins, draws, losses)
+    print("%s 对 %s：棋局 %d  用时 %.2fs  %.2f 盘/秒  %.0f 半回合/秒" % (
+        args.first, args.second, len(records), elapsed,
+        len(records) / elapsed if elapsed > 0 else 0.0, plies / elapsed if elapsed > 0 else 0.0))
+    print("胜 %d  和 %d  负 %d  Elo差 %s（95%%区间 %s ~ %s）" % (
+        wins, draws, losses, format_elo(elo), format_elo(lower), format_elo(upper)))
+    print("结束方式: " + "  ".join("%s %d" % item for item in sorted(terminations.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""置换表：按Zobrist键缓存搜索结果
+
+条目紧凑地存放在预先分配的array('Q')中，每个条目两个64位字：
+完整局面键，以及打包后的数据（走法、深度、边界类型、代数、分值）。
+表的大小在创建时按MB确定，之后不会再增长。
+
+每个桶有两个条目。写入时优先覆盖同一局面的条目，否则替换
+较旧搜索代数的条目，同代时替换深度较浅的条目（深度优先 + 老化）。
+"""
+from array import array
+
+BOUND_EXACT = 1  # 精确值
+BOUND_LOWER = 2  # 下界（发生beta剪枝）
+BOUND_UPPER = 3  # 上界（所有走法都未超过alpha）
+
+ENTRY_BYTES = 16  # 每个条目：键8字节 + 数据8字节
+BUCKET_SIZE = 2
+DEFAULT_SIZE_MB = 16
+
+# 数据字的位布局
+_MOVE_BITS = 15  # from(6) | to(6) | 升变类型+1(3)
+_DEPTH_SHIFT = 15
+_BOUND_SHIFT = 23
+_AGE_SHIFT = 25
+_SCORE_SHIFT = 33
+_SCORE_OFFSET = 1 << 19  # 分值以偏移量存储为20位无符号数
+_AGE_MASK = 0xFF
+
+
+def _pack_move(move):
+    if move is None:
+        return 0
+    from_sq, to_sq, promotion = move
+    return from_sq | (to_sq << 6) | ((0 if promotion is None else promotion + 1) << 12)
+
+
+def _unpack_move(bits):
+    if not bits:
+        return None
+    promotion = bits >> 12
+    return (bits & 63, (bits >> 6) & 63, promotion - 1 if promotion else None)
+
+
+# 置换表类
+class TranspositionTable:
+    def __init__(self, size_mb=DEFAULT_SIZE_MB):
+        self.generation = 0
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        """按给定MB数重新分配并清空表，桶数取不超过预算的最大2的幂"""
+        budget = max(int(size_mb * 1024 * 1024), ENTRY_BYTES * BUCKET_SIZE)
+        buckets = 1
+        while buckets * 2 * BUCKET_SIZE * ENTRY_BYTES <= budget:
+            buckets *= 2
+        self.size_mb = size_mb
+        self.bucket_mask = buckets - 1
+        self.entries = buckets * BUCKET_SIZE
+        self.table = array('Q', bytes(self.entries * ENTRY_BYTES))
+        self.reset_stats()
+
+    def clear(self):
+        """清空全部条目"""
+        self.table = array('Q', bytes(self.entries * ENTRY_BYTES))
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清零命中率统计"""
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        """开始新的一次搜索：推进代数，旧代条目优先被替换"""
+        self.generation = (self.generation + 1) & _AGE_MASK
+
+    @property
+    def nbytes(self):
+        """表实际占用的字节数"""
+        return self.entries * ENTRY_BYTES
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """统计信息快照"""
+        return {
+            "size_mb": self.size_mb,
+            "entries": self.entries,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hashfull": self.hashfull(),
+        }
+
+    def probe(self, key):
+        """查找局面，命中时返回(depth, score, bound, move)，否则返回None"""
+        self.probes += 1
+        table = self.table
+        index = (key & self.bucket_mask) * (BUCKET_SIZE * 2)
+        for slot in range(index, index + BUCKET_SIZE * 2, 2):
+            if table[slot] == key:
+                data = table[slot + 1]
+                if data:
+                    self.hits += 1
+                    return ((data >> _DEPTH_SHIFT) & 0xFF,
+                            (data >> _SCORE_SHIFT) - _SCORE_OFFSET,
+                            (data >> _BOUND_SHIFT) & 3,
+                            _unpack_move(data & ((1 << _MOVE_BITS) - 1)))
+        return None
+
+    def store(self, key, depth, score, bound, move=None):
+        """写入搜索结果；depth限制在0..255，score限制在±2^19以内"""
+        self.stores += 1
+        table = self.table
+        generation = self.generation
+        index = (key & self.bucket_mask) * (BUCKET_SIZE * 2)
+
+        # 同一局面的条目直接覆盖；没有新走法时保留原来的走法
+        victim = None
+        for slot in range(index, index + BUCKET_SIZE * 2, 2):
+            data = table[slot + 1]
+            if table[slot] == key and data:
+                victim = slot
+                if move is None:
+                    move = _unpack_move(data & ((1 << _MOVE_BITS) - 1))
+                break
+
+        if victim is None:
+            # 优先使用空条目，否则替换旧代条目，同代时替换深度较浅的条目
+            victim_rank = None
+            for slot in range(index, index + BUCKET_SIZE * 2, 2):
+                data = table[slot + 1]
+                if not data:
+                    victim = slot
+                    break
+                age = (generation - ((data >> _AGE_SHIFT) & _AGE_MASK)) & _AGE_MASK
+                rank = ((data >> _DEPTH_SHIFT) & 0xFF) - 8 * age
+                if victim is None or rank < victim_rank:
+                    victim = slot
+                    victim_rank = rank
+            else:
+                self.replacements += 1
+
+        depth = min(max(depth, 0), 0xFF)
+        score = min(max(score, 1 - _SCORE_OFFSET), _SCORE_OFFSET - 1)
+        table[victim] = key
+        table[victim + 1] = (_pack_move(move) |
+                             (depth << _DEPTH_SHIFT) |
+                             (bound << _BOUND_SHIFT) |
+                             (generation << _AGE_SHIFT) |
+                             ((score + _SCORE_OFFSET) << _SCORE_SHIFT))
+
+    def hashfull(self):
+        """抽样估计表的填充率（千分比），取前1000个条目中属于当前代的比例"""
+        table = self.table
+        sample = min(1000, self.entries)
+        used = 0
+        for slot in range(0, sample * 2, 2):
+            data = table[slot + 1]
+            if data and (data >> _AGE_SHIFT) & _AGE_MASK == self.generation:
+                used += 1
+        return used * 1000 // sample
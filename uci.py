@@ -0,0 +1,309 @@
+"""UCI协议入口：作为独立引擎进程通过标准输入输出与比赛管理器通信
+
+支持的命令：
+    uci / isready / ucinewgame / quit
+    position startpos|fen <FEN> [moves <走法>...]
+    go [depth N] [movetime 毫秒] [wtime 毫秒] [btime 毫秒] [winc 毫秒] [binc 毫秒]
+       [movestogo N] [nodes N] [infinite] [ponder]
+    stop / ponderhit
+    setoption name Hash value <MB> / setoption name Threads value <N>
+局面由规则核心GameState逐步走出，走法不合法时忽略其后的走法并在info string中说明。
+搜索在单独的线程中进行，主线程继续读取命令，stop会立即中断搜索。停止请求
+记在UCIEngine持有的threading.Event中，go启动搜索线程前清除，搜索器开始搜索时
+不会清除它，因此搜索线程真正开始搜索前收到的stop也不会丢失。
+infinite或ponder模式下搜索结束后也要等到stop或ponderhit才输出bestmove。
+
+Threads为1时使用单进程搜索器；大于1时在parallel.ParallelSearcher（根节点走法
+分发到多个进程）上逐层加深，等待工作进程时定时检查stop、时间与节点限制；
+ucinewgame同时清空各工作进程的置换表。
+本模块不导入pygame，可以在无界面环境下启动。
+
+用法：
+    python uci.py
+"""
+import sys
+import threading
+import time
+
+from bitboard import Move, move_to_uci
+from chess_core import GameState
+from engine import Searcher, SearchAborted, MATE_THRESHOLD, MAX_PLY, format_score
+from parallel import ParallelSearcher
+from tt import TranspositionTable, DEFAULT_SIZE_MB
+
+ENGINE_NAME = "PTGWong Chess"
+ENGINE_AUTHOR = "PTGWong"
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+MOVE_OVERHEAD = 0.05  # 每步为通信等开销预留的秒数
+DEFAULT_MOVES_TO_GO = 30  # 未给出movestogo时按剩余30步分配时间
+
+
+def allocate_time(remaining, increment=0.0, moves_to_go=None):
+    """按剩余时间和加秒分配这一步的思考时间（秒）"""
+    moves_to_go = moves_to_go or DEFAULT_MOVES_TO_GO
+    budget = remaining / moves_to_go + increment * 0.8
+    # 不超过剩余时间的一半，并预留通信开销
+    return max(min(budget, remaining / 2) - MOVE_OVERHEAD, 0.01)
+
+
+def parse_go(tokens):
+    """解析go命令的参数，返回参数字典（时间单位转换为秒）"""
+    options = {}
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in ("infinite", "ponder"):
+            options[token] = True
+            index += 1
+            continue
+        if index + 1 >= len(tokens):
+            break
+        value = tokens[index + 1]
+        try:
+            if token in ("depth", "nodes", "movestogo"):
+                options[token] = int(value)
+            elif token in ("movetime", "wtime", "btime", "winc", "binc"):
+                options[token] = int(value) / 1000.0
+        except ValueError:
+            pass
+        index += 2
+    return options
+
+
+# UCI引擎：主线程处理命令，搜索线程执行搜索
+class UCIEngine:
+    def __init__(self, output=None):
+        self.output = output or sys.stdout
+        self.hash_mb = DEFAULT_SIZE_MB
+        self.searcher = Searcher(TranspositionTable(self.hash_mb))
+        self.threads = 1
+        self.parallel = None  # Threads大于1时的多进程搜索器
+        self.game = GameState()
+        self.thread = None
+        self.lock = threading.Lock()  # 保护输出与以下三个状态
+        self.waiting = False  # infinite/ponder模式：结束后等待stop或ponderhit
+        self.pending_limit = None  # ponder模式下ponderhit后使用的时间预算
+        self.ponder_deadline = None  # ponderhit后的截止时间，由每次迭代报告时写入搜索器
+        self.released = threading.Event()
+        self.stop_event = threading.Event()  # 停止当前搜索，由go清除、stop设置
+
+    def send(self, line):
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line):
+        """执行一条命令，quit时返回False"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name %s" % ENGINE_NAME)
+            self.send("id author %s" % ENGINE_AUTHOR)
+            self.send("option name Hash type spin default %d min 1 max %d" % (DEFAULT_SIZE_MB, MAX_HASH_MB))
+            self.send("option name Threads type spin default 1 min 1 max %d" % MAX_THREADS)
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.searcher.tt.clear()
+            if self.parallel is not None:
+                self.parallel.clear()
+            self.game = GameState()
+        elif command == "setoption":
+            self.stop()
+            self.set_option(args)
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(parse_go(args))
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.replace("name", "", 1).strip().lower()
+        try:
+            number = int(value)
+        except ValueError:
+            self.send("info string 无效的选项值: %s" % text)
+            return
+        if name == "hash":
+            self.hash_mb = min(max(number, 1), MAX_HASH_MB)
+            self.searcher = Searcher(TranspositionTable(self.hash_mb))
+        elif name == "threads":
+            self.threads = min(max(number, 1), MAX_THREADS)
+        else:
+            self.send("info string 未知选项: %s" % name)
+            return
+        # 置换表大小或进程数变化后重建多进程搜索器
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        if self.threads > 1:
+            self.parallel = ParallelSearcher(self.threads, self.hash_mb)
+
+    def set_position(self, args):
+        game = GameState()
+        if args[:1] == ["fen"]:
+            end = args.index("moves") if "moves" in args else len(args)
+            try:
+                game.load_fen(" ".join(args[1:end]))
+            except ValueError as error:
+                self.send("info string 无效的FEN: %s" % error)
+                return
+            moves = args[end + 1:]
+        elif args[:1] == ["startpos"]:
+            moves = args[2:] if args[1:2] == ["moves"] else []
+        else:
+            self.send("info string 无效的position命令")
+            return
+        for text in moves:
+            try:
+                move = Move.from_uci(text)
+                if not game.legal_move_table().get(move.from_square, 0) >> move.to_square & 1:
+                    raise ValueError(text)
+                game.push(move)
+            except ValueError:
+                self.send("info string 非法走法: %s" % text)
+                break
+        self.game = game
+
+    def go(self, options):
+        position = self.game.current_position().copy()
+        movetime = options.get("movetime")
+        if movetime is None:
+            turn = "w" if position.turn == 0 else "b"
+            remaining = options.get(turn + "time")
+            if remaining is not None:
+                movetime = allocate_time(remaining, options.get(turn + "inc", 0.0),
+                                         options.get("movestogo"))
+        pondering = options.get("ponder", False)
+        with self.lock:
+            self.waiting = pondering or options.get("infinite", False)
+            self.pending_limit = movetime if pondering else None
+            self.ponder_deadline = None
+        self.released.clear()
+        self.stop_event.clear()
+        # ponder时先不限时，ponderhit后再设置截止时间
+        self.thread = threading.Thread(
+            target=self._search, daemon=True,
+            args=(position, options.get("depth"), None if pondering else movetime,
+                  options.get("nodes")))
+        self.thread.start()
+
+    def _search(self, position, depth, movetime, nodes):
+        def report(result):
+            self._apply_ponder_deadline()
+            seconds = max(result.seconds, 1e-6)
+            self.send("info depth %d score %s nodes %d nps %d time %d pv %s" % (
+                result.depth, format_score(result.score), result.nodes,
+                int(result.nodes / seconds), int(result.seconds * 1000),
+                " ".join(move_to_uci(move) for move in result.pv)))
+
+        if self.parallel is not None:
+            result = self._search_parallel(position, depth, movetime, nodes, report)
+        else:
+            result = self.searcher.search(position, depth=depth, movetime=movetime, nodes=nodes,
+                                          on_iteration=report, stop_event=self.stop_event)
+        with self.lock:
+            waiting = self.waiting
+        if waiting:
+            self.released.wait()
+        if result.best_move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) > 1:
+            self.send("bestmove %s ponder %s" % (move_to_uci(result.best_move), move_to_uci(result.pv[1])))
+        else:
+            self.send("bestmove %s" % move_to_uci(result.best_move))
+
+    def _search_parallel(self, position, depth, movetime, nodes, report):
+        """Threads大于1：在多进程搜索器上逐层加深，返回最后完成的一层的结果"""
+        parallel = self.parallel
+        start = time.perf_counter()
+        parallel.reset(None if movetime is None else start + movetime, self.stop_event)
+        self._apply_ponder_deadline()
+        result = None
+        total_nodes = 0
+        for current_depth in range(1, min(depth or MAX_PLY - 1, MAX_PLY - 1) + 1):
+            try:
+                iteration = parallel.search(position, current_depth,
+                                            None if nodes is None else nodes - total_nodes)
+            except SearchAborted:
+                break
+            total_nodes += iteration.nodes
+            elapsed = time.perf_counter() - start
+            result = iteration._replace(depth=current_depth, nodes=total_nodes, seconds=elapsed,
+                                        nps=int(total_nodes / elapsed) if elapsed > 0 else 0)
+            report(result)
+            if result.best_move is None or abs(result.score) >= MATE_THRESHOLD:
+                break
+            if nodes is not None and total_nodes >= nodes:
+                break
+            # 剩余时间不够完成下一层时提前结束
+            if parallel.deadline is not None and elapsed * 2 > parallel.deadline - start:
+                break
+        if result is None:
+            # 第一层都未完成：用单进程搜索器快速给出走法
+            result = self.searcher.search(position, depth=1)
+        return result
+
+    def _apply_ponder_deadline(self):
+        """把ponderhit设置的截止时间写入正在使用的搜索器
+
+        搜索开始时会重置截止时间，ponderhit可能早于此发生，因此每次迭代报告时再写入一次。
+        """
+        with self.lock:
+            deadline = self.ponder_deadline
+        if deadline is not None:
+            active = self.parallel if self.parallel is not None else self.searcher
+            active.deadline = deadline
+
+    def ponderhit(self):
+        """对手走了预想的着法：转为正常限时搜索"""
+        with self.lock:
+            limit = self.pending_limit
+            self.waiting = False
+            self.pending_limit = None
+            if limit is not None:
+                self.ponder_deadline = time.perf_counter() + limit
+        self._apply_ponder_deadline()
+        self.released.set()
+
+    def stop(self):
+        """中断当前搜索并等待bestmove输出"""
+        if self.thread is None:
+            return
+        with self.lock:
+            self.waiting = False
+        self.stop_event.set()
+        self.released.set()
+        self.thread.join()
+        self.thread = None
+
+
+def main(argv=None):
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+    if engine.parallel is not None:
+        engine.parallel.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())